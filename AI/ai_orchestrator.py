@@ -1,15 +1,26 @@
+import os
 import time
 import json
 import asyncio
 from typing import List, Dict, Any, AsyncGenerator
 from prompt_analyzer import analyze_prompt_async
-from web_search import search_and_extract
+from query_router import STREAM_SEARCH_INTENTS, RESPONSE_SEARCH_INTENTS
+from web_search import search_and_extract, retrieve_from_cache, compile_relevance_query, MAX_CONCURRENT_SCRAPES
+from search_utils import RelevanceQuery, keybert_encoder
+from passage_ranker import rank_passages, build_context
+from tracing import span, start_span, trace_summary
+from metrics import registry
+from log_config import get_logger
 from unified_stream import StreamEvent, EVENT_TYPES
+from answer_cache import AnswerCache, CachedAnswer, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SEMANTIC
+from llm_scheduler import llm_scheduler, LLMQueueFull, PRIORITY_STREAM, PRIORITY_RESPONSE
+from prompt_builder import grounded_messages, assistant_messages, ANSWER_MODEL, OLLAMA_KEEP_ALIVE
 import ollama  # Lightweight LLM interface
-from datetime import datetime
-today_date = datetime.now().strftime("%Y-%m-%d")
 
-# Global LLM client for reuse
+logger = get_logger(__name__)
+
+# Global LLM client for reuse (OLLAMA_HOST defaults to the local server)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
 _ollama_client = None
 
 # Simple circuit breaker implementation
@@ -43,33 +54,145 @@ class CircuitBreaker:
 _ollama_circuit_breaker = CircuitBreaker()
 _search_circuit_breaker = CircuitBreaker()
 
+# Number of generated search queries that are actually run
+MAX_QUERIES_PER_PROMPT = 3
+
+# Speculative generation: stream the answer as soon as the queries finished so
+# far give SPECULATIVE_MIN_PASSAGES ranked passages matching a keyword, instead
+# of after every query. The remaining queries are then cancelled ("ignore") or
+# awaited after the answer, which is regenerated ("refine") when they add at
+# least SPECULATIVE_REFINE_MIN_NEW passages to the context. "off" disables it.
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "off").lower()
+SPECULATIVE_MIN_PASSAGES = int(os.getenv("SPECULATIVE_MIN_PASSAGES", "4"))
+SPECULATIVE_REFINE_MIN_NEW = int(os.getenv("SPECULATIVE_REFINE_MIN_NEW", "2"))
+
+# Answers that report a failure instead of answering the prompt, never cached
+SEARCH_UNAVAILABLE_MESSAGE = "I'm sorry, but I'm having trouble accessing web search right now. Please try again later."
+CONTEXT_FALLBACK_PREFIX = "Based on my search, here's what I found:"
+GREETING_FALLBACK = "I'm here to help! What would you like to know?"
+LLM_BUSY_MESSAGE = "The assistant is busy right now, please try again shortly."
+
+# Answer generation and /stream metrics (see metrics, exposed on /metrics)
+LLM_TOKENS_PER_SECOND = registry.histogram("khoj_llm_tokens_per_second", "Generation speed of answers",
+                                           buckets=(1, 2.5, 5, 10, 20, 40, 80, 160))
+LLM_COMPLETION_TOKENS = registry.counter("khoj_llm_completion_tokens_total", "Tokens generated for answers")
+SSE_STREAM_DURATION = registry.histogram("khoj_sse_stream_duration_seconds",
+                                         "Duration of /stream responses by outcome "
+                                         "(completed, error, cached or disconnected)", ("outcome",))
+SSE_TIME_TO_FIRST_TOKEN = registry.histogram("khoj_sse_time_to_first_token_seconds",
+                                             "Time from the /stream request to the first answer token", ("cached",))
+
+# Full answers of recent prompts (ANSWER_CACHE_ENABLED, ANSWER_CACHE_TTL_SECONDS)
+answer_cache = AnswerCache(encoder=keybert_encoder if ANSWER_CACHE_SEMANTIC else None) \
+    if ANSWER_CACHE_ENABLED else None
+
+
+def get_ollama_client() -> ollama.AsyncClient:
+    """
+    Get or create a global async Ollama client for reuse.
 
-def get_ollama_client():
-    """Get or create a global Ollama client for reuse."""
+    Generation is awaited and streamed with async iteration, so concurrent
+    requests interleave on the event loop instead of blocking it.
+    """
     global _ollama_client
     if _ollama_client is None:
-        _ollama_client = ollama.Client()
+        _ollama_client = ollama.AsyncClient(host=OLLAMA_HOST)
     return _ollama_client
 
+
+async def search_queries_concurrently(search_queries: List[str], keyword_terms: List[str],
+                                     relevance_query: RelevanceQuery = None):
+    """
+    Run the search queries concurrently and yield (query, information) as each one finishes.
+
+    All queries share one scrape budget (MAX_CONCURRENT_SCRAPES), one set of
+    claimed URLs, so a page returned by several queries is scraped only once,
+    one cache-first retrieval, so a prompt answered from the cache searches the
+    web for none of its queries, and one RelevanceQuery, so their pages can be
+    ranked together afterwards.
+    The first exception raised by a query cancels the remaining ones and is re-raised.
+
+    The queries run in a task of their own under the "search" span, so a caller
+    that stops iterating early (speculative generation) is not left inside it.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+    seen_urls = set()
+    if relevance_query is None:
+        relevance_query = compile_relevance_query(keyword_terms)
+    finished = asyncio.Queue()
+
+    async def run_query(query, cached_pages):
+        logger.debug("Searching web for: %s", query)
+        information = await search_and_extract(query, keyword_terms, semaphore=semaphore, seen_urls=seen_urls,
+                                               relevance_query=relevance_query, cached_pages=cached_pages)
+        return query, information
+
+    async def run_queries():
+        with span("search", queries=len(search_queries)):
+            tasks = []
+            try:
+                # Without keywords each query looks up the cache with its own text
+                cached_pages = await retrieve_from_cache(keyword_terms) if keyword_terms else None
+                tasks = [asyncio.create_task(run_query(query, cached_pages)) for query in search_queries]
+                for next_done in asyncio.as_completed(tasks):
+                    finished.put_nowait((await next_done, None))
+            except Exception as e:
+                finished.put_nowait((None, e))
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    driver = asyncio.create_task(run_queries())
+    try:
+        for _ in search_queries:
+            result, error = await finished.get()
+            if error is not None:
+                raise error
+            yield result
+    finally:
+        driver.cancel()
+
+def is_cacheable_answer(answer: str) -> bool:
+    """Whether an answer came from the LLM, rather than a search or LLM failure fallback."""
+    return bool(answer.strip()) and not (
+        SEARCH_UNAVAILABLE_MESSAGE in answer or CONTEXT_FALLBACK_PREFIX in answer or GREETING_FALLBACK in answer)
+
+
 async def generate_response_with_web_search(prompt: str) -> str:
     """
     Generate a response using web search to augment the LLM's knowledge.
+
+    Prompts answered within ANSWER_CACHE_TTL_SECONDS are served from the answer cache.
+    The request is traced as a "generate_response" trace (see tracing).
     """
+    with span("generate_response") as request_span:
+        if answer_cache is not None:
+            cached = await answer_cache.get(prompt)
+            request_span.set_attribute("answer_cache_hit", cached is not None)
+            if cached:
+                return cached.answer
+
+        response = await _generate_response_with_web_search(prompt)
+        if answer_cache is not None and is_cacheable_answer(response):
+            await answer_cache.put(prompt, response)
+        return response
+
+
+async def _generate_response_with_web_search(prompt: str) -> str:
 
     # Step 1: Analyze the prompt
-    print(f"Analyzing prompt: {prompt}")
-    analysis = await analyze_prompt_async(prompt)
+    logger.info("Analyzing prompt: %s", prompt)
+    with span("analysis"):
+        analysis = await analyze_prompt_async(prompt)
 
     intents = analysis.get("intents", [])
     keywords = analysis.get("keywords", [])
     search_queries = analysis.get("search_queries", [])
 
-    print(f"Identified intents: {intents}")
-    print(f"Extracted keywords: {[k['term'] for k in keywords]}")
-    print(f"Generated search queries: {search_queries}")
+    logger.info("Identified intents: %s, keywords: %s, search queries: %s",
+                intents, [k['term'] for k in keywords], search_queries)
 
-    search_intents = ["web_search", "question", "explanation", "research", "question_answering", "planning"]
-    needs_search = any(intent in search_intents for intent in intents)
+    needs_search = any(intent in RESPONSE_SEARCH_INTENTS for intent in intents)
 
     unique_information = []
 
@@ -77,24 +200,23 @@ async def generate_response_with_web_search(prompt: str) -> str:
     if needs_search and search_queries:
         # Check circuit breaker for search
         if not _search_circuit_breaker.can_execute():
-            print("Circuit breaker is OPEN for search, skipping web search")
-            return "I'm sorry, but I'm having trouble accessing web search right now. Please try again later."
+            logger.warning("Circuit breaker is OPEN for search, skipping web search")
+            return SEARCH_UNAVAILABLE_MESSAGE
 
         all_information = []
         keyword_terms = [k['term'] for k in keywords]
+        relevance_query = compile_relevance_query(keyword_terms)
 
         try:
-            for query in search_queries[:3]:
-                print(f"Searching web for: {query}")
-                information = await search_and_extract(query, keyword_terms)
+            async for _, information in search_queries_concurrently(search_queries[:MAX_QUERIES_PER_PROMPT],
+                                                                    keyword_terms, relevance_query):
                 all_information.extend(information)
-                await asyncio.sleep(0.5)
             
             _search_circuit_breaker.on_success()
         except Exception as e:
-            print(f"Error during web search: {e}")
+            logger.error("Error during web search: %s", e)
             _search_circuit_breaker.on_failure()
-            return "I'm sorry, but I'm having trouble accessing web search right now. Please try again later."
+            return SEARCH_UNAVAILABLE_MESSAGE
 
         seen_urls = set()
         for info in all_information:
@@ -102,45 +224,123 @@ async def generate_response_with_web_search(prompt: str) -> str:
                 seen_urls.add(info["url"])
                 unique_information.append(info)
 
-        print(f"Found information from {len(unique_information)} sources")
+        logger.info("Found information from %d sources", len(unique_information))
+        unique_information, _ = rank_passages(unique_information, relevance_query)
 
     elif needs_search and not search_queries:
         # Check circuit breaker for search
         if not _search_circuit_breaker.can_execute():
-            print("Circuit breaker is OPEN for search, skipping web search")
-            return "I'm sorry, but I'm having trouble accessing web search right now. Please try again later."
+            logger.warning("Circuit breaker is OPEN for search, skipping web search")
+            return SEARCH_UNAVAILABLE_MESSAGE
 
-        print(f"Performing general web search for: {prompt}")
+        logger.info("Performing general web search for: %s", prompt)
         try:
-            information = await search_and_extract(prompt, [prompt])
-            unique_information.extend(information)
+            relevance_query = compile_relevance_query([prompt])
+            information = await search_and_extract(prompt, [prompt], relevance_query=relevance_query)
+            unique_information, _ = rank_passages(information, relevance_query)
             _search_circuit_breaker.on_success()
-            print(f"Found information from {len(unique_information)} sources")
+            logger.info("Found information from %d sources", len(information))
         except Exception as e:
-            print(f"Error during web search: {e}")
+            logger.error("Error during web search: %s", e)
             _search_circuit_breaker.on_failure()
-            return "I'm sorry, but I'm having trouble accessing web search right now. Please try again later."
+            return SEARCH_UNAVAILABLE_MESSAGE
 
     else:
-        print(f"Skipping web search for intents: {intents}")
+        logger.info("Skipping web search for intents: %s", intents)
 
     # Step 3: Generate response
     context = build_context_from_information(unique_information)
-    response = generate_coherent_response(prompt, context)
+    response = await generate_coherent_response(prompt, context)
     return response
 
 
 async def generate_unified_stream(prompt: str) -> AsyncGenerator[str, None]:
     """
     Generate a unified stream combining intent analysis, search, and response generation.
+
+    Prompts answered within ANSWER_CACHE_TTL_SECONDS are replayed from the answer
+    cache; complete answers are recorded for replay. The stream is traced as a
+    "generate_unified_stream" trace and its stage timings are sent with the
+    stream_complete event; its duration and time to first token are recorded
+    in SSE_STREAM_DURATION and SSE_TIME_TO_FIRST_TOKEN.
     """
+    start = time.perf_counter()
+    outcome = "disconnected"  # unless the stream runs to its end
+    try:
+        with span("generate_unified_stream") as request_span:
+            if answer_cache is not None:
+                cached = await answer_cache.get(prompt, streamed=True)
+                request_span.set_attribute("answer_cache_hit", cached is not None)
+                if cached:
+                    SSE_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, cached="true")
+                    for event in replay_cached_answer(cached):
+                        yield f"data: {event.to_json()}\n\n"
+                    outcome = "cached"
+                    return
+
+            events, tokens, failed = [], [], False
+            first_token_at = None
+            async for event in _unified_events(prompt):
+                if event.type == EVENT_TYPES["RESPONSE_TOKEN"]:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        SSE_TIME_TO_FIRST_TOKEN.observe(first_token_at - start, cached="false")
+                    tokens.append(event.data["token"])
+                elif event.type == EVENT_TYPES["RESPONSE_STARTED"] and event.data.get("refined"):
+                    tokens = []  # the refined answer replaces the speculative one
+                elif event.type == EVENT_TYPES["PROCESSING_ERROR"]:
+                    failed = True
+                elif event.type not in (EVENT_TYPES["RESPONSE_STARTED"], EVENT_TYPES["RESPONSE_COMPLETED"],
+                                        EVENT_TYPES["STREAM_COMPLETE"], EVENT_TYPES["QUEUE_POSITION"]):
+                    events.append({"type": event.type, "data": event.data})
+                yield f"data: {event.to_json()}\n\n"
+
+            answer = "".join(tokens)
+            request_span.set_attributes(failed=failed, answer_chars=len(answer))
+            if answer_cache is not None and not failed and is_cacheable_answer(answer):
+                await answer_cache.put(prompt, answer, events, tokens)
+            outcome = "error" if failed else "completed"
+    finally:
+        SSE_STREAM_DURATION.observe(time.perf_counter() - start, outcome=outcome)
+
+
+def replay_cached_answer(cached: CachedAnswer):
+    """The StreamEvents of a cached streamed answer, in the order they were first sent."""
+    for event in cached.events:
+        yield StreamEvent(event["type"], event["data"])
+    yield StreamEvent(EVENT_TYPES["RESPONSE_STARTED"], {"status": "started", "cached": True,
+                                                        "age": round(cached.age(), 1)})
+    for token in cached.tokens:
+        yield StreamEvent(EVENT_TYPES["RESPONSE_TOKEN"], {"token": token})
+    yield StreamEvent(EVENT_TYPES["RESPONSE_COMPLETED"], {"status": "completed"})
+    yield stream_complete_event()
+
+
+def stream_complete_event() -> StreamEvent:
+    """The stream_complete event, with the trace id and stage timings of the request (see tracing)."""
+    return StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {"timings": trace_summary()})
+
+
+async def _unified_events(prompt: str) -> AsyncGenerator[StreamEvent, None]:
+    """The StreamEvents of generate_unified_stream for a prompt that is not cached."""
+
+    # Reject before any work when the LLM queue is already full
+    try:
+        llm_scheduler.check_capacity()
+    except LLMQueueFull as e:
+        logger.warning("LLM queue full, rejecting stream: %s", e)
+        event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": LLM_BUSY_MESSAGE})
+        yield event
+        yield stream_complete_event()
+        return
 
     # Emit intent detection start event
     event = StreamEvent(EVENT_TYPES["INTENT_DETECTED"], {"status": "started"})
-    yield f"data: {event.to_json()}\n\n"
+    yield event
     
-    print(f"Analyzing prompt: {prompt}")
-    analysis = await analyze_prompt_async(prompt)
+    logger.info("Analyzing prompt: %s", prompt)
+    with span("analysis"):
+        analysis = await analyze_prompt_async(prompt)
     
     intents = analysis.get("intents", [])
     keywords = analysis.get("keywords", [])
@@ -153,59 +353,68 @@ async def generate_unified_stream(prompt: str) -> AsyncGenerator[str, None]:
         "keywords": keywords, 
         "search_queries": search_queries
     })
-    yield f"data: {event.to_json()}\n\n"
+    yield event
 
-    print(f"Identified intents: {intents}")
-    print(f"Extracted keywords: {[k['term'] for k in keywords]}")
-    print(f"Generated search queries: {search_queries}")
+    logger.info("Identified intents: %s, keywords: %s, search queries: %s",
+                intents, [k['term'] for k in keywords], search_queries)
 
-    search_intents = ["web_search", "question", "explanation", "research", "question_answering"]
-    needs_search = any(intent in search_intents for intent in intents)
+    needs_search = any(intent in STREAM_SEARCH_INTENTS for intent in intents)
 
     unique_information = []
+    context = ""
+    late_results = None
 
     if needs_search and search_queries:
         # Emit search start event
         event = StreamEvent(EVENT_TYPES["SEARCH_STARTED"], {"status": "started"})
-        yield f"data: {event.to_json()}\n\n"
+        yield event
             
         # Check circuit breaker for search
         if not _search_circuit_breaker.can_execute():
-            print("Circuit breaker is OPEN for search, skipping web search")
+            logger.warning("Circuit breaker is OPEN for search, skipping web search")
             event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": "Web search is temporarily unavailable"})
-            yield f"data: {event.to_json()}\n\n"
+            yield event
             
-            event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-            yield f"data: {event.to_json()}\n\n"
+            yield stream_complete_event()
             return
 
         all_information = []
         keyword_terms = [k['term'] for k in keywords]
+        relevance_query = compile_relevance_query(keyword_terms)
 
         try:
-            for i, query in enumerate(search_queries[:3]):
-                # Emit search progress event
+            queries = search_queries[:MAX_QUERIES_PER_PROMPT]
+            completed = 0
+            results = search_queries_concurrently(queries, keyword_terms, relevance_query)
+            async for query, information in results:
+                all_information.extend(information)
+                completed += 1
+                # Emit search progress event as each query finishes
                 event = StreamEvent(EVENT_TYPES["SEARCH_PROGRESS"], {
                     "query": query, 
-                    "current": i+1, 
-                    "total": min(len(search_queries), 3)
+                    "current": completed, 
+                    "total": len(queries),
+                    "sources": len(information),
+                    "retrieval": sorted({info.get("retrieval", "web") for info in information})
                 })
-                yield f"data: {event.to_json()}\n\n"
-                
-                print(f"Searching web for: {query}")
-                information = await search_and_extract(query, keyword_terms)
-                all_information.extend(information)
-                await asyncio.sleep(0.5)
+                yield event
+
+                if completed < len(queries) and is_speculative_context(all_information, relevance_query):
+                    logger.info("Speculative generation after %d of %d queries", completed, len(queries))
+                    if SPECULATIVE_GENERATION == "refine":
+                        late_results = results
+                    else:
+                        await results.aclose()  # cancels the remaining queries
+                    break
             
             _search_circuit_breaker.on_success()
         except Exception as e:
-            print(f"Error during web search: {e}")
+            logger.error("Error during web search: %s", e)
             _search_circuit_breaker.on_failure()
             event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": "Web search is temporarily unavailable"})
-            yield f"data: {event.to_json()}\n\n"
+            yield event
             
-            event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-            yield f"data: {event.to_json()}\n\n"
+            yield stream_complete_event()
             return
 
         seen_urls = set()
@@ -219,10 +428,16 @@ async def generate_unified_stream(prompt: str) -> AsyncGenerator[str, None]:
                     "url": info["url"]
                 })
 
-        print(f"Found information from {len(unique_information)} sources")
+        logger.info("Found information from %d sources", len(unique_information))
+        sources_found = len(unique_information)
+        unique_information, passage_stats = rank_passages(unique_information, relevance_query)
+        context = build_context(unique_information)
         # Emit search completion event with results
-        event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {"sources": len(unique_information)})
-        yield f"data: {event.to_json()}\n\n"
+        event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {"sources": sources_found,
+                                                              "passages": passage_stats["passages"],
+                                                              "context": passage_stats,
+                                                              "pending_queries": len(queries) - completed})
+        yield event
         
         # Emit individual search results
         for result in search_results[:5]:  # Limit to first 5 results
@@ -230,36 +445,39 @@ async def generate_unified_stream(prompt: str) -> AsyncGenerator[str, None]:
                 "title": result['title'],
                 "url": result['url']
             })
-            yield f"data: {event.to_json()}\n\n"
+            yield event
 
     elif needs_search and not search_queries:
         # Emit search start event
         event = StreamEvent(EVENT_TYPES["SEARCH_STARTED"], {"status": "started"})
-        yield f"data: {event.to_json()}\n\n"
+        yield event
             
         if not _search_circuit_breaker.can_execute():
-            print("Circuit breaker is OPEN for search, skipping web search")
+            logger.warning("Circuit breaker is OPEN for search, skipping web search")
             event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": "Web search is temporarily unavailable"})
-            yield f"data: {event.to_json()}\n\n"
+            yield event
             
-            event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-            yield f"data: {event.to_json()}\n\n"
+            yield stream_complete_event()
             return
 
-        print(f"Performing general web search for: {prompt}")
+        logger.info("Performing general web search for: %s", prompt)
         try:
-            information = await search_and_extract(prompt, [prompt])
-            unique_information.extend(information)
+            relevance_query = compile_relevance_query([prompt])
+            information = await search_and_extract(prompt, [prompt], relevance_query=relevance_query)
+            unique_information, passage_stats = rank_passages(information, relevance_query)
+            context = build_context(unique_information)
             _search_circuit_breaker.on_success()
-            print(f"Found information from {len(unique_information)} sources")
+            logger.info("Found information from %d sources", len(information))
             
             # Emit search completion event
-            event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {"sources": len(unique_information)})
-            yield f"data: {event.to_json()}\n\n"
+            event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {"sources": len(information),
+                                                                  "passages": passage_stats["passages"],
+                                                                  "context": passage_stats})
+            yield event
             
             # Emit individual search results
             search_results = []
-            for info in unique_information[:5]:  # Limit to first 5 results
+            for info in information[:5]:  # Limit to first 5 results
                 search_results.append({
                     "title": info.get("title", "Untitled"),
                     "url": info["url"]
@@ -270,261 +488,308 @@ async def generate_unified_stream(prompt: str) -> AsyncGenerator[str, None]:
                     "title": result['title'],
                     "url": result['url']
                 })
-                yield f"data: {event.to_json()}\n\n"
+                yield event
         except Exception as e:
-            print(f"Error during web search: {e}")
+            logger.error("Error during web search: %s", e)
             _search_circuit_breaker.on_failure()
             event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": "Web search is temporarily unavailable"})
-            yield f"data: {event.to_json()}\n\n"
+            yield event
             
-            event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-            yield f"data: {event.to_json()}\n\n"
+            yield stream_complete_event()
             return
 
     else:
-        print(f"Skipping web search for intents: {intents}")
+        logger.info("Skipping web search for intents: %s", intents)
         # Emit search skipped event
         event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {
             "status": "skipped", 
             "reason": f"Skipping web search for intents: {intents}"
         })
-        yield f"data: {event.to_json()}\n\n"
+        yield event
+
+    # Step 3: Stream response, from the retrieved context or (web search not
+    # required OR returned nothing) a plain answer, once an LLM slot is free
+    if context:
+        token_stream = generate_coherent_response_stream(prompt, context)
+    else:
+        token_stream = generate_fallback_response_stream(prompt.strip())
+
+    try:
+        async for event in _response_events(token_stream):
+            yield event
+    except LLMQueueFull as e:
+        logger.warning("LLM queue full, rejecting stream: %s", e)
+        event = StreamEvent(EVENT_TYPES["PROCESSING_ERROR"], {"message": LLM_BUSY_MESSAGE})
+        yield event
+        if late_results is not None:
+            await late_results.aclose()
+        yield stream_complete_event()
+        return
+
+    # Speculative answer: regenerate it if the remaining queries add to the context
+    if late_results is not None:
+        async for event in _refined_events(prompt, late_results, all_information, unique_information,
+                                           relevance_query, completed, len(queries)):
+            yield event
+
+    # Emit stream completion event
+    yield stream_complete_event()
+
+
+def unique_sources(information: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The first result of each URL, in order."""
+    seen_urls = set()
+    unique_information = []
+    for info in information:
+        if info["url"] not in seen_urls:
+            seen_urls.add(info["url"])
+            unique_information.append(info)
+    return unique_information
+
+
+def is_speculative_context(information: List[Dict[str, Any]], relevance_query: RelevanceQuery) -> bool:
+    """Whether the results so far are enough to start a speculative answer (SPECULATIVE_GENERATION)."""
+    if SPECULATIVE_GENERATION not in ("ignore", "refine"):
+        return False
+    ranked, _ = rank_passages(unique_sources(information), relevance_query)
+    matching = sum(1 for info in ranked for _, _, metadata in info["relevant_sentences"]
+                   if metadata.get("original_matches", 0) > 0)
+    return matching >= SPECULATIVE_MIN_PASSAGES
+
+
+async def _response_events(token_stream: AsyncGenerator[str, None], **started) -> AsyncGenerator[StreamEvent, None]:
+    """
+    The StreamEvents of one streamed answer: queue positions while waiting for
+    an LLM slot, then response_started (with `started` added to its data), the
+    tokens and response_completed.
+
+    Raises:
+        LLMQueueFull: before any event, if the LLM queue is full
+    """
+    ticket = llm_scheduler.submit(PRIORITY_STREAM)
+    queue_span = start_span("llm.queue", position=llm_scheduler.position(ticket))
+    try:
+        # Emit the queue position while waiting for a slot
+        async for position in ticket.positions():
+            event = StreamEvent(EVENT_TYPES["QUEUE_POSITION"], {
+                "position": position,
+                "queued": llm_scheduler.queued,
+                "estimated_wait_ms": round(llm_scheduler.estimated_wait_ms(position))
+            })
+            yield event
+        queue_span.end()
 
-    # Step 3: Stream response
-    # if unique_information:
-        context = build_context_from_information(unique_information)
         # Emit response generation start event
-        event = StreamEvent(EVENT_TYPES["RESPONSE_STARTED"], {"status": "started"})
-        yield f"data: {event.to_json()}\n\n"
+        event = StreamEvent(EVENT_TYPES["RESPONSE_STARTED"], {"status": "started", **started})
+        yield event
 
         # Stream the response token by token
-        for token in generate_coherent_response_stream(prompt, context):
+        async for token in token_stream:
             event = StreamEvent(EVENT_TYPES["RESPONSE_TOKEN"], {"token": token})
-            yield f"data: {event.to_json()}\n\n"
+            yield event
+    finally:
+        queue_span.end()
+        ticket.release()
+
+    # Emit response generation completion event
+    event = StreamEvent(EVENT_TYPES["RESPONSE_COMPLETED"], {"status": "completed"})
+    yield event
 
-        # Emit response generation completion event
-        event = StreamEvent(EVENT_TYPES["RESPONSE_COMPLETED"], {"status": "completed"})
-        yield f"data: {event.to_json()}\n\n"
 
-        # Emit stream completion event
-        event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-        yield f"data: {event.to_json()}\n\n"
+async def _refined_events(prompt: str, late_results, all_information: List[Dict[str, Any]],
+                          speculative_information: List[Dict[str, Any]], relevance_query: RelevanceQuery,
+                          completed: int, total: int) -> AsyncGenerator[StreamEvent, None]:
+    """
+    The StreamEvents of the queries still running after a speculative answer,
+    and of a refined answer (response_started with "refined": true) if they add
+    at least SPECULATIVE_REFINE_MIN_NEW passages to the context. A failing late
+    query leaves the speculative answer as the final one.
+    """
+    try:
+        with span("search.late", queries=total - completed):
+            async for query, information in late_results:
+                all_information.extend(information)
+                completed += 1
+                event = StreamEvent(EVENT_TYPES["SEARCH_PROGRESS"], {
+                    "query": query,
+                    "current": completed,
+                    "total": total,
+                    "sources": len(information),
+                    "retrieval": sorted({info.get("retrieval", "web") for info in information}),
+                    "late": True
+                })
+                yield event
+    except Exception as e:
+        logger.error("Error during late web search, keeping the speculative answer: %s", e)
         return
 
-    # Web search not required OR returned nothing
-    # Emit response generation start event
-    event = StreamEvent(EVENT_TYPES["RESPONSE_STARTED"], {"status": "started"})
-    yield f"data: {event.to_json()}\n\n"
+    unique_information = unique_sources(all_information)
+    ranked_information, passage_stats = rank_passages(unique_information, relevance_query)
+    known = {sentence for info in speculative_information for sentence, _, _ in info["relevant_sentences"]}
+    new_passages = sum(1 for info in ranked_information for sentence, _, _ in info["relevant_sentences"]
+                       if sentence not in known)
+    logger.info("Late queries added %d passages to the context", new_passages)
+    if new_passages < SPECULATIVE_REFINE_MIN_NEW:
+        return
 
-    # Stream fallback response token by token
-    for token in generate_fallback_response_stream(prompt.strip()):
-        event = StreamEvent(EVENT_TYPES["RESPONSE_TOKEN"], {"token": token})
-        yield f"data: {event.to_json()}\n\n"
-    
-    # Emit response generation completion event
-    event = StreamEvent(EVENT_TYPES["RESPONSE_COMPLETED"], {"status": "completed"})
-    yield f"data: {event.to_json()}\n\n"
-    
-    # Emit stream completion event
-    event = StreamEvent(EVENT_TYPES["STREAM_COMPLETE"], {})
-    yield f"data: {event.to_json()}\n\n"
+    context = build_context(ranked_information)
+    event = StreamEvent(EVENT_TYPES["SEARCH_COMPLETED"], {"sources": len(unique_information),
+                                                          "passages": passage_stats["passages"],
+                                                          "context": passage_stats,
+                                                          "pending_queries": 0,
+                                                          "refined": True})
+    yield event
+    try:
+        async for event in _response_events(generate_coherent_response_stream(prompt, context), refined=True):
+            yield event
+    except LLMQueueFull as e:
+        logger.warning("LLM queue full, keeping the speculative answer: %s", e)
 
 
 def build_context_from_information(information: List[Dict[str, Any]]) -> str:
-    context_parts = []
-
-    for info in information:
-        source_info = f"Source: {info['title']} ({info['url']})"
-        # Updated to handle the new format (sentence, score, metadata)
-        content_info = "\n".join([sentence for sentence, _, _ in info['relevant_sentences']])
-        context_parts.append(f"{source_info}\n{content_info}\n")
+    """LLM context of the sources kept by rank_passages (within CONTEXT_TOKEN_BUDGET)."""
+    return build_context(information)
 
-    return "\n---\n".join(context_parts)
 
-
-def generate_coherent_response(prompt: str, context: str) -> str:
+async def generate_coherent_response(prompt: str, context: str) -> str:
     # Check circuit breaker
     if not _ollama_circuit_breaker.can_execute():
-        print("Circuit breaker is OPEN for Ollama, using fallback response")
-        return f"Based on my search, here's what I found:\n\n{context}"
+        logger.warning("Circuit breaker is OPEN for Ollama, using fallback response")
+        return f"{CONTEXT_FALLBACK_PREFIX}\n\n{context}"
     
     try:
-        prompt_template = f"""
-You are KhojAI — a truthful, source-grounded AI search assistant running locally. 
-Your core directive is: **Never invent facts. Never guess. Never hallucinate.** 
-If something is not explicitly written in the "Retrieved Context" section below, you do **not** know it and must say so.
-
-### STRICT RULES — YOU WILL LOSE POINTS IF YOU BREAK ANY OF THESE:
-1. You **must** base your entire answer only on the "Retrieved Context" provided below.
-2. You **must not** add any information that is not present in the Retrieved Context.
-3. You **must not** use any prior knowledge, training data, or memory — only the context given in this message is valid.
-4. If the context does not contain enough information to answer the question fully, you **must** say exactly:  
-   "I'm sorry, but the retrieved web sources do not contain enough information to fully answer your question."
-5. If the context is completely irrelevant or empty, reply only with:  
-   "I'm sorry, but I couldn't find relevant information to answer your query."
-6. Do **not** make up dates, names, numbers, statistics, quotes, or events that are not verbatim in the context.
-7. Do **not** continue or speculate beyond what is explicitly written.
-8. You are allowed to rephrase and summarize, but every factual claim must be traceable to a sentence in the context.
-9. Always prefer being concise and admitting ignorance over guessing.
-10. Never apologize for following these rules — they are mandatory for correctness.
-
-### FORMATTING REQUIREMENTS:
-- Write naturally and conversationally.
-- Use markdown for clarity (bullet points, bold, tables when helpful).
-- At the end of your answer, add a "Sources" section listing the URLs or titles from the context that you actually used.
-- If you used no sources (because nothing was relevant), write: "Sources: None — no reliable information found."
-
-### TIME CONTEXT:
-All the context are of today's time which is {today_date}
-### USER QUESTION:
-{prompt}
-
-### RETRIEVED CONTEXT (this is the only truth you have):
-{context}
-
-Now think step-by-step before answering:
-1. Read the user question carefully.
-2. Scan the entire Retrieved Context.
-3. Identify sentences that directly relate to the question.
-4. If no sentence provides a clear, direct answer → use the exact "not enough information" response.
-5. If yes → synthesize a concise, natural answer using only those sentences.
-6. End with the Sources list.
-
-Begin your response now."""
         client = get_ollama_client()
-        response = client.generate(
-            model="gemma3:4b",
-            prompt=prompt_template,
-            stream=False
-        )
+        async with llm_scheduler.slot(PRIORITY_RESPONSE):
+            with span("llm.generate", model=ANSWER_MODEL, stream=False) as generate_span:
+                response = await client.chat(
+                    model=ANSWER_MODEL,
+                    messages=grounded_messages(prompt, context),
+                    stream=False,
+                    keep_alive=OLLAMA_KEEP_ALIVE
+                )
+                record_llm_stats(generate_span, response)
         _ollama_circuit_breaker.on_success()
-        return response['response'].strip()
+        return response['message']['content'].strip()
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
-        print(f"Error generating response with LLM: {e}")
+        logger.error("Error generating response with LLM: %s", e)
         _ollama_circuit_breaker.on_failure()
-        return f"Based on my search, here's what I found:\n\n{context}"
+        return f"{CONTEXT_FALLBACK_PREFIX}\n\n{context}"
 
-def generate_coherent_response_stream(prompt: str, context: str):
+async def generate_coherent_response_stream(prompt: str, context: str) -> AsyncGenerator[str, None]:
     """
     Generate a streamed response using the LLM with context.
     """
     # Check circuit breaker
     if not _ollama_circuit_breaker.can_execute():
-        print("Circuit breaker is OPEN for Ollama, using fallback response")
-        yield f"Based on my search, here's what I found:\n\n{context}"
+        logger.warning("Circuit breaker is OPEN for Ollama, using fallback response")
+        yield f"{CONTEXT_FALLBACK_PREFIX}\n\n{context}"
         return
     
     try:
-        prompt_template = f"""
-You are KhojAI — a truthful, source-grounded AI search assistant running locally. 
-Your core directive is: **Never invent facts. Never guess. Never hallucinate.** 
-If something is not explicitly written in the "Retrieved Context" section below, you do **not** know it and must say so.
-
-### STRICT RULES — YOU WILL LOSE POINTS IF YOU BREAK ANY OF THESE:
-1. You **must** base your entire answer only on the "Retrieved Context" provided below.
-2. You **must not** add any information that is not present in the Retrieved Context.
-3. You **must not** use any prior knowledge, training data, or memory — only the context given in this message is valid.
-4. If the context does not contain enough information to answer the question fully, you **must** say exactly:  
-   "I'm sorry, but the retrieved web sources do not contain enough information to fully answer your question."
-5. If the context is completely irrelevant or empty, reply only with:  
-   "I'm sorry, but I couldn't find relevant information to answer your query."
-6. Do **not** make up dates, names, numbers, statistics, quotes, or events that are not verbatim in the context.
-7. Do **not** continue or speculate beyond what is explicitly written.
-8. You are allowed to rephrase and summarize, but every factual claim must be traceable to a sentence in the context.
-9. Always prefer being concise and admitting ignorance over guessing.
-10. Never apologize for following these rules — they are mandatory for correctness.
-
-### FORMATTING REQUIREMENTS:
-- Write naturally and conversationally.
-- Use markdown for clarity (bullet points, bold, tables when helpful).
-- At the end of your answer, add a "Sources" section listing the URLs or titles from the context that you actually used.
-- If you used no sources (because nothing was relevant), write: "Sources: None — no reliable information found."
-
-### TIME CONTEXT:
-All the context are of today's time which is {today_date}
-### USER QUESTION:
-{prompt}
-
-### RETRIEVED CONTEXT (this is the only truth you have):
-{context}
-
-Now think step-by-step before answering:
-1. Read the user question carefully.
-2. Scan the entire Retrieved Context.
-3. Identify sentences that directly relate to the question.
-4. If no sentence provides a clear, direct answer → use the exact "not enough information" response.
-5. If yes → synthesize a concise, natural answer using only those sentences.
-6. End with the Sources list.
-
-Begin your response now."""
-        client = get_ollama_client()
-        response_stream = client.generate(
-            model="gemma3:4b",
-            prompt=prompt_template,
-            stream=True
-        )
-        
-        for chunk in response_stream:
-            if 'response' in chunk:
-                yield chunk['response']
-        
+        async for token in _chat_tokens(grounded_messages(prompt, context)):
+            yield token
         _ollama_circuit_breaker.on_success()
         
     except Exception as e:
-        print(f"Error generating response with LLM: {e}")
+        logger.error("Error generating response with LLM: %s", e)
         _ollama_circuit_breaker.on_failure()
-        yield f"Based on my search, here's what I found:\n\n{context}"
+        yield f"{CONTEXT_FALLBACK_PREFIX}\n\n{context}"
 
-def generate_fallback_response(prompt: str) -> str:
+async def _chat_tokens(messages: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
+    """
+    Stream the answer of a chat request, traced as an "llm.generate" span with
+    the server's token counts, split into "llm.prompt_eval" (until the first
+    token) and "llm.generation" child spans.
+    """
+    with span("llm.generate", model=ANSWER_MODEL, stream=True) as generate_span:
+        phase = start_span("llm.prompt_eval")
+        try:
+            client = get_ollama_client()
+            response_stream = await client.chat(
+                model=ANSWER_MODEL,
+                messages=messages,
+                stream=True,
+                keep_alive=OLLAMA_KEEP_ALIVE
+            )
+
+            async for chunk in response_stream:
+                if chunk.get('done'):
+                    record_llm_stats(generate_span, chunk)
+                if chunk.get('message'):
+                    if chunk['message']['content'] and phase.name == "llm.prompt_eval":
+                        phase.end()
+                        phase = start_span("llm.generation")
+                    yield chunk['message']['content']
+        finally:
+            phase.end()
+
+
+def record_llm_stats(llm_span, response) -> None:
+    """Token counts, server-side durations and generation speed of an Ollama response, as span attributes."""
+    prompt_eval_ns = response.get('prompt_eval_duration') or 0
+    eval_ns = response.get('eval_duration') or 0
+    eval_count = response.get('eval_count') or 0
+    if eval_ns:
+        LLM_TOKENS_PER_SECOND.observe(eval_count / (eval_ns / 1e9))
+    LLM_COMPLETION_TOKENS.inc(eval_count)
+    llm_span.set_attributes(
+        prompt_tokens=response.get('prompt_eval_count') or 0,
+        completion_tokens=eval_count,
+        server_prompt_eval_ms=round(prompt_eval_ns / 1e6, 1),
+        server_eval_ms=round(eval_ns / 1e6, 1),
+        tokens_per_second=round(eval_count / (eval_ns / 1e9), 1) if eval_ns else 0.0
+    )
+
+
+async def generate_fallback_response(prompt: str) -> str:
     # Check circuit breaker
     if not _ollama_circuit_breaker.can_execute():
-        print("Circuit breaker is OPEN for Ollama, using simple fallback response")
-        return "I'm here to help! What would you like to know?"
+        logger.warning("Circuit breaker is OPEN for Ollama, using simple fallback response")
+        return GREETING_FALLBACK
     
     try:
         client = get_ollama_client()
-        response = client.generate(
-            model="gemma3:4b",
-            prompt=f"You are a helpful AI assistant. Answer: {prompt}",
-            stream=False
-        )
+        async with llm_scheduler.slot(PRIORITY_RESPONSE):
+            with span("llm.generate", model=ANSWER_MODEL, stream=False) as generate_span:
+                response = await client.chat(
+                    model=ANSWER_MODEL,
+                    messages=assistant_messages(prompt),
+                    stream=False,
+                    keep_alive=OLLAMA_KEEP_ALIVE
+                )
+                record_llm_stats(generate_span, response)
         _ollama_circuit_breaker.on_success()
-        return response['response'].strip()
+        return response['message']['content'].strip()
+    except LLMQueueFull:
+        raise
     except Exception as e:
-        print(f"Error generating fallback response: {e}")
+        logger.error("Error generating fallback response: %s", e)
         _ollama_circuit_breaker.on_failure()
-        return "I'm here to help! What would you like to know?"
+        return GREETING_FALLBACK
 
 
-def generate_fallback_response_stream(prompt: str):
+async def generate_fallback_response_stream(prompt: str) -> AsyncGenerator[str, None]:
     """
     Generate a streamed fallback response using the LLM.
     """
     # Check circuit breaker
     if not _ollama_circuit_breaker.can_execute():
-        print("Circuit breaker is OPEN for Ollama, using simple fallback response")
-        yield "I'm here to help! What would you like to know?"
+        logger.warning("Circuit breaker is OPEN for Ollama, using simple fallback response")
+        yield GREETING_FALLBACK
         return
     
     try:
-        client = get_ollama_client()
-        response_stream = client.generate(
-            model="gemma3:4b",
-            prompt=f"You are a helpful AI assistant. Answer: {prompt}",
-            stream=True
-        )
-        
-        for chunk in response_stream:
-            if 'response' in chunk:
-                yield chunk['response']
-        
+        async for token in _chat_tokens(assistant_messages(prompt)):
+            yield token
         _ollama_circuit_breaker.on_success()
         
     except Exception as e:
-        print(f"Error generating fallback response: {e}")
+        logger.error("Error generating fallback response: %s", e)
         _ollama_circuit_breaker.on_failure()
-        yield "I'm here to help! What would you like to know?"
+        yield GREETING_FALLBACK
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+"""
+Cache of full answers for repeated prompts.
+
+Entries are keyed on the normalized prompt (case, whitespace and punctuation
+folded) and expire after a freshness TTL, since answers are built from web
+pages. With an encoder, a prompt that misses the exact key can still hit an
+entry whose prompt embedding is close enough (and mentions the same numbers,
+so "iPhone 14" never answers "iPhone 15"). Streamed answers keep the events
+sent before the response and the response tokens, so a hit is replayed
+through the same StreamEvent sequence.
+"""
+
+import os
+import re
+import time
+import asyncio
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+# Embedding match (ANSWER_CACHE_SEMANTIC=1, needs KeyBERT): minimum cosine similarity
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key of a prompt: NFKC, lowercase, punctuation dropped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", prompt).lower()
+    return " ".join(re.findall(r"\w+", text))
+
+
+class CachedAnswer:
+    """A cached answer; events and tokens are set for answers recorded from a stream."""
+
+    def __init__(self, prompt: str, answer: str, events: Optional[List[Dict[str, Any]]] = None,
+                 tokens: Optional[List[str]] = None, created_at: Optional[float] = None):
+        self.prompt = prompt
+        self.answer = answer
+        self.events = events
+        self.tokens = tokens
+        self.created_at = created_at if created_at is not None else time.time()
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+
+class AnswerCache:
+    """
+    In-process LRU cache of answers with a TTL and optional embedding lookup.
+
+    Args:
+        ttl: Seconds an answer stays fresh
+        max_entries: Entries kept, least recently used evicted first
+        encoder: Optional function returning one embedding per text
+        similarity: Minimum cosine similarity for an embedding match
+    """
+
+    def __init__(self, ttl: float = ANSWER_CACHE_TTL_SECONDS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.encoder = encoder
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._embeddings: Dict[str, np.ndarray] = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _embed(self, key: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray((await asyncio.to_thread(self.encoder, [key]))[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning("Answer cache: prompt embedding failed, using exact matches only: %s", e)
+            self.encoder = None
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expire(self) -> None:
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl]:
+            del self._entries[key]
+            self._embeddings.pop(key, None)
+
+    async def get(self, prompt: str, streamed: bool = False) -> Optional[CachedAnswer]:
+        """
+        Fresh cached answer for the prompt, or None.
+
+        Args:
+            prompt: User prompt
+            streamed: Only return answers recorded from a stream (replayable)
+        """
+        self._expire()
+        key = normalize_prompt(prompt)
+        entry = self._entries.get(key)
+        if entry is not None and (entry.events is not None or not streamed):
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            logger.info("Answer cache hit (%.0fs old)", entry.age())
+            return entry
+
+        if self.encoder and self._embeddings:
+            query = await self._embed(key)
+            numbers = re.findall(r"\d+", key)
+            candidates = [k for k in self._embeddings
+                          if k in self._entries and re.findall(r"\d+", k) == numbers and
+                          (self._entries[k].events is not None or not streamed)]
+            if query is not None and candidates:
+                similarities = np.stack([self._embeddings[k] for k in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity:
+                    self._entries.move_to_end(candidates[best])
+                    self.stats["semantic_hits"] += 1
+                    entry = self._entries[candidates[best]]
+                    logger.info("Answer cache hit for similar prompt '%s' (cosine %.3f, %.0fs old)",
+                                entry.prompt, similarities[best], entry.age())
+                    return entry
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, prompt: str, answer: str, events: Optional[List[Dict[str, Any]]] = None,
+                  tokens: Optional[List[str]] = None) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            prompt: User prompt
+            answer: Full answer text
+            events: For streamed answers, the {"type", "data"} events sent before the response
+            tokens: For streamed answers, the response tokens in order
+        """
+        key = normalize_prompt(prompt)
+        if not key or not answer:
+            return
+        existing = self._entries.get(key)
+        if existing is not None and existing.events is not None and events is None:
+            # Keep the replayable entry of the streaming path
+            return
+        self._entries[key] = CachedAnswer(prompt, answer, events, tokens)
+        self._entries.move_to_end(key)
+        if self.encoder and key not in self._embeddings:
+            vector = await self._embed(key)
+            if vector is not None:
+                self._embeddings[key] = vector
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._embeddings.pop(evicted, None)
@@ -1,13 +1,20 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 import uvicorn
+import os
 import json
 import asyncio
-import traceback
 from prompt_analyzer import analyze_prompt
+import ai_orchestrator
+import web_search
 from ai_orchestrator import generate_response_with_web_search, generate_unified_stream
+from llm_scheduler import LLMQueueFull, llm_scheduler
+from metrics import registry, monitor_event_loop_lag, CONTENT_TYPE
+from log_config import get_logger, dropped_records
+
+logger = get_logger(__name__)
 
 app = FastAPI(title="AI Prompt Analyzer", version="1.0.0")
 
@@ -21,9 +28,70 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# /generate-response limits: requests generating at once, requests allowed to
+# wait for a slot, and the time a request may take from arrival to answer
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4"))
+MAX_PENDING_GENERATIONS = int(os.getenv("MAX_PENDING_GENERATIONS", "16"))
+GENERATE_TIMEOUT_SECONDS = float(os.getenv("GENERATE_TIMEOUT_SECONDS", "120"))
+
+_generation_slots = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+_generations_in_progress = 0
+
+# Interval of the event-loop lag probe reported on /metrics
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+GENERATE_REQUESTS = registry.counter("khoj_generate_requests_total",
+                                     "/generate-response requests by HTTP status", ("status",))
+STREAM_REQUESTS = registry.counter("khoj_stream_requests_total", "/stream requests")
+
+
+def _pipeline_metrics():
+    """Metrics read from the pipeline's own state when /metrics is scraped."""
+    llm = llm_scheduler.stats()
+    yield "khoj_llm_slots", "gauge", "LLM calls allowed at once", [({}, llm["slots"])]
+    yield "khoj_llm_active", "gauge", "LLM calls holding a slot", [({}, llm["active"])]
+    yield "khoj_llm_queue_depth", "gauge", "LLM calls waiting for a slot", [({}, llm["queued"])]
+    yield ("khoj_llm_calls_total", "counter", "LLM calls submitted, rejected (queue full) and completed",
+           [({"event": event}, llm[event]) for event in ("submitted", "rejected", "completed")])
+    yield ("khoj_llm_queue_wait_avg_seconds", "gauge", "Moving average of the wait for an LLM slot",
+           [({}, llm["avg_wait_ms"] / 1000)])
+
+    breakers = {"ollama": ai_orchestrator._ollama_circuit_breaker, "search": ai_orchestrator._search_circuit_breaker}
+    yield ("khoj_circuit_breaker_state", "gauge", "1 for the current state of each circuit breaker",
+           [({"breaker": name, "state": state}, int(breaker.state == state))
+            for name, breaker in breakers.items() for state in ("CLOSED", "HALF_OPEN", "OPEN")])
+    yield ("khoj_circuit_breaker_failures", "gauge", "Consecutive failures counted by each circuit breaker",
+           [({"breaker": name}, breaker.failure_count) for name, breaker in breakers.items()])
+
+    yield ("khoj_page_cache_lookups_total", "counter", "DiskJsonCache page lookups by outcome (hit, miss, stale)",
+           [({"outcome": outcome}, count) for outcome, count in web_search.cache.lookups.items()])
+    if ai_orchestrator.answer_cache is not None:
+        yield ("khoj_answer_cache_lookups_total", "counter", "Answer cache lookups by outcome",
+               [({"outcome": outcome}, count) for outcome, count in ai_orchestrator.answer_cache.stats.items()])
+    yield ("khoj_generations_in_progress", "gauge", "/generate-response requests generating or waiting",
+           [({}, _generations_in_progress)])
+    yield ("khoj_log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+           [({}, dropped_records())])
+
+
+registry.add_collector(_pipeline_metrics)
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag(LOOP_LAG_INTERVAL_SECONDS))
+
+
+@app.on_event("shutdown")
+async def stop_loop_lag_monitor():
+    app.state.loop_lag_monitor.cancel()
+
 class PromptRequest(BaseModel):
     prompt: str
 
+class PromptResponse(BaseModel):
+    message: str
+
 # Alternative request model for more flexible handling
 class FlexiblePromptRequest(BaseModel):
     prompt: str = None
@@ -52,7 +120,8 @@ async def unified_stream(request: Request):
         if not prompt:
             raise HTTPException(status_code=400, detail="No prompt provided in request")
             
-        print(f"Received unified streaming request with prompt: {prompt}")
+        logger.info("Received unified streaming request with prompt: %s", prompt)
+        STREAM_REQUESTS.inc()
         
         return StreamingResponse(generate_unified_stream(prompt),
                                  media_type="text/event-stream",
@@ -65,8 +134,7 @@ async def unified_stream(request: Request):
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in request body")
     except Exception as e:
-        print(f"Error in unified_stream: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in unified_stream: %s", e)
         # Even in case of error, send a proper response
         error_message = json.dumps({"type": "error", "message": "An error occurred while processing your request"})
         return StreamingResponse(iter([f"data: {error_message}\n\n"]),
@@ -77,16 +145,59 @@ async def unified_stream(request: Request):
                                  "Access-Control-Allow-Origin": "*"
                                  })
 
+@app.get("/metrics")
+async def metrics():
+    """Pipeline metrics in the Prometheus text format."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+async def _generate_in_slot(prompt: str) -> str:
+    """Run the pipeline once one of the MAX_CONCURRENT_GENERATIONS slots is free."""
+    async with _generation_slots:
+        return await generate_response_with_web_search(prompt)
+
 @app.post("/generate-response", response_model=PromptResponse)
 async def generate_response(request: PromptRequest):
     """
     Generate a response using web search and LLM augmentation.
+
+    Requests beyond MAX_CONCURRENT_GENERATIONS wait for a slot; when
+    MAX_PENDING_GENERATIONS are already waiting the request is rejected with
+    503, and a request not answered within GENERATE_TIMEOUT_SECONDS (waiting
+    included) gets 504.
     """
     try:
-        response = generate_response_with_web_search(request.prompt)
+        response = await _generate_response(request)
+        GENERATE_REQUESTS.inc(status=200)
+        return response
+    except HTTPException as e:
+        GENERATE_REQUESTS.inc(status=e.status_code)
+        raise
+
+async def _generate_response(request: PromptRequest) -> PromptResponse:
+    global _generations_in_progress
+    if not request.prompt.strip():
+        raise HTTPException(status_code=400, detail="No prompt provided in request")
+    if _generations_in_progress >= MAX_CONCURRENT_GENERATIONS + MAX_PENDING_GENERATIONS:
+        raise HTTPException(status_code=503, detail="Too many requests in progress, please retry later",
+                            headers={"Retry-After": "5"})
+
+    _generations_in_progress += 1
+    try:
+        response = await asyncio.wait_for(_generate_in_slot(request.prompt), timeout=GENERATE_TIMEOUT_SECONDS)
         return PromptResponse(message=response)
+    except LLMQueueFull as e:
+        logger.warning("LLM queue full, rejecting request: %s", e)
+        raise HTTPException(status_code=503, detail="The assistant is busy right now, please retry later",
+                            headers={"Retry-After": "5"})
+    except asyncio.TimeoutError:
+        logger.warning("Response generation timed out after %.0fs", GENERATE_TIMEOUT_SECONDS)
+        raise HTTPException(status_code=504,
+                            detail=f"Response generation timed out after {GENERATE_TIMEOUT_SECONDS:.0f}s")
     except Exception as e:
+        logger.exception("Error in generate_response: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _generations_in_progress -= 1
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Load test of concurrent streamed LLM generations on one event loop.
+
+Runs --streams concurrent generate_coherent_response_stream calls against a
+fake Ollama server (benchmarks/fake_ollama.py, --parallel slots), with a probe
+measuring event-loop lag meanwhile. The same load is run with the previous
+implementation, a synchronous generator over ollama.Client iterated inside the
+coroutine, for comparison.
+
+Usage:
+    python benchmarks/bench_llm_concurrency.py [--streams 8] [--tokens 40] [--token-ms 20]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from statistics import median
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ollama
+import ai_orchestrator
+from benchmarks.fake_ollama import FakeOllama
+
+PROMPT = "What changed in the latest release?"
+CONTEXT = "Source: Example (https://example.com)\nThe latest release adds faster search."
+
+
+def blocking_stream(client, prompt, context):
+    """The previous generate_coherent_response_stream: a sync generator over ollama.Client."""
+    for chunk in client.generate(model="gemma3:4b", prompt=f"{prompt}\n{context}", stream=True):
+        if 'response' in chunk:
+            yield chunk['response']
+
+
+async def run_load(streams, make_stream, is_async):
+    lags = []
+    stop = asyncio.Event()
+
+    async def probe():
+        # Lag = how late a 10 ms sleep wakes up
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    async def consume():
+        start = time.perf_counter()
+        first = None
+        tokens = 0
+        if is_async:
+            async for _ in make_stream():
+                first = first or time.perf_counter()
+                tokens += 1
+        else:
+            for _ in make_stream():
+                first = first or time.perf_counter()
+                tokens += 1
+        return first - start, time.perf_counter() - start, tokens
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(consume() for _ in range(streams)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return wall, results, lags
+
+
+def report(name, wall, results, lags):
+    ttfts = sorted(r[0] for r in results)
+    tokens = sum(r[2] for r in results)
+    print(f"{name:<10}{wall:>8.2f}s{median(ttfts) * 1000:>10.0f}{ttfts[-1] * 1000:>10.0f}"
+          f"{tokens / wall:>10.0f}{max(lags) * 1000:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test concurrent LLM streams")
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--parallel", type=int, default=8, help="Fake server parallel slots")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    server = FakeOllama(tokens=args.tokens, token_ms=args.token_ms, parallel=args.parallel)
+    host = server.start()
+    ai_orchestrator._ollama_client = ollama.AsyncClient(host=host)
+    sync_client = ollama.Client(host=host)
+
+    print(f"{args.streams} concurrent streams, {args.tokens} tokens at {args.token_ms:.0f} ms, "
+          f"{args.parallel} server slots")
+    print(f"{'client':<10}{'wall':>9}{'ttft p50':>10}{'ttft max':>10}{'tok/s':>10}{'lag max':>10}  (ms)")
+    report("blocking", *asyncio.run(run_load(
+        args.streams, lambda: blocking_stream(sync_client, PROMPT, CONTEXT), is_async=False)))
+    report("async", *asyncio.run(run_load(
+        args.streams, lambda: ai_orchestrator.generate_coherent_response_stream(PROMPT, CONTEXT), is_async=True)))
+    server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
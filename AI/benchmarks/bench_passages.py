@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark of cross-page passage ranking on the cached pages.
+
+For queries made from cached page titles, the local search provider picks up
+to 5 pages per query. The context of the per-page top-5 sentences (the previous
+behaviour) is compared with the context chosen by rank_passages, in estimated
+LLM tokens, and the ranking stage is timed.
+
+Usage:
+    python benchmarks/bench_passages.py [--cache-dir cache] [--queries 40]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from statistics import mean
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from search_providers import LocalSearchProvider
+from search_utils import RelevanceQuery, extract_relevant_information
+from passage_ranker import rank_passages, estimate_tokens
+
+
+def context_tokens(information):
+    """Estimated tokens of build_context_from_information() output."""
+    return sum(
+        estimate_tokens(f"Source: {info['title']} ({info['url']})") +
+        sum(estimate_tokens(sentence) for sentence, _, _ in info['relevant_sentences'])
+        for info in information
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross-page passage ranking")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.dirname(__file__), '..', 'cache'))
+    parser.add_argument("--queries", type=int, default=40)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        provider = LocalSearchProvider(args.cache_dir)
+        titles = [page['title'] for page in provider.pages.values() if page['title'] != 'No title']
+
+        before, after, rank_times, passages = [], [], [], []
+        for title in titles[:args.queries]:
+            keywords = re.findall(r'[A-Za-z]{4,}', title)[:4]
+            urls = provider.search(" ".join(keywords), 5)
+            if not keywords or not urls:
+                continue
+            pages = [provider.get_page(url) for url in urls]
+
+            # Previous behaviour: top 5 sentences of every page, by page-local score
+            per_page = [{"url": p['url'], "title": p['title'],
+                         "relevant_sentences": extract_relevant_information(p['content'], keywords, top_n=5)}
+                        for p in pages]
+            before.append(context_tokens([info for info in per_page if info['relevant_sentences']]))
+
+            # Pooled candidates ranked across pages
+            query = RelevanceQuery(keywords)
+            pooled = [{"url": p['url'], "title": p['title'],
+                       "relevant_sentences": extract_relevant_information(p['content'], keywords, top_n=8,
+                                                                          query=query)}
+                      for p in pages]
+            start = time.perf_counter()
+            ranked, stats = rank_passages(pooled, query)
+            rank_times.append(time.perf_counter() - start)
+            after.append(context_tokens(ranked))
+            passages.append(stats['passages'])
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    print(f"Queries:               {len(before)}")
+    print(f"Context per-page top5: {mean(before):.0f} tokens (max {max(before)})")
+    print(f"Context ranked:        {mean(after):.0f} tokens (max {max(after)}, {mean(passages):.1f} passages)")
+    print(f"Reduction:             {1 - sum(after) / sum(before):.0%}")
+    print(f"rank_passages:         {mean(rank_times) * 1000:.2f} ms/query")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Pipeline benchmark suite on recorded pages, without network or model.
+
+The pages recorded in the cold cache are replayed as HTML by a fake web server
+that also answers Google PSE queries (benchmarks/fake_web.py), and a fake
+Ollama server (benchmarks/fake_ollama.py) answers query generation and
+streams answers. Each benchmark reports latency percentiles (ms) and throughput:
+
+    scrape     scrape_webpage on every recorded page (robots.txt, fetch, extraction)
+    relevance  extract_relevant_information per page, from raw content and
+               from the stored analyze_page() output
+    cache      DiskJsonCache get (hit and miss), set and search_hybrid with
+               1k/10k/100k entries (--cache-sizes)
+    e2e        generate_unified_stream for prompts about recorded pages: time to
+               first token, total time and per-stage timings, with an empty
+               page cache (cold) and a warmed one (warm, --concurrency streams)
+
+Results are saved as JSON (--output); with --baseline, p50 latencies are
+compared with an earlier run and regressions beyond --threshold are flagged.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--only scrape,relevance,cache,e2e] [--cache-sizes 1000,10000,100000]
+                                        [--output results.json] [--baseline previous.json]
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from collections import Counter, defaultdict
+from statistics import mean, median
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+# Per-page logging would be timed too
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.fake_web import FakeWeb
+
+BENCHMARKS = ("scrape", "relevance", "cache", "e2e")
+QUERY_GENERATION_PREFIX = "Generate search queries for: "
+
+
+def percentiles(samples):
+    """Count, mean and nearest-rank p50/p90/p99/max of durations in seconds, in ms."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def rank(p):
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)] * 1000
+
+    return {"count": len(ordered), "mean_ms": round(mean(ordered) * 1000, 3), "p50_ms": round(rank(50), 3),
+            "p90_ms": round(rank(90), 3), "p99_ms": round(rank(99), 3), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def summarize(samples, wall=None, **extra):
+    """percentiles() plus throughput per second over `wall` seconds (the summed samples by default)."""
+    wall = wall if wall is not None else sum(samples)
+    summary = percentiles(samples)
+    summary["throughput_per_s"] = round(len(samples) / wall, 2) if wall else 0.0
+    summary.update(extra)
+    return summary
+
+
+def title_topic(title):
+    """The part of a page title before the site name or subtitle."""
+    return re.split(r"\s[|:–-]\s", title)[0]
+
+
+def title_keywords(title):
+    """Up to four keywords from the topic of a page title."""
+    words = re.findall(r"[A-Za-z][\w'-]{3,}", title_topic(title))
+    return [word.lower() for word in words[:4]] or ["news"]
+
+
+def topic_prompts(pages, count):
+    """Questions about the titles of recorded pages."""
+    titled = [page for page in pages if page["title"] != "No title"]
+    return [f"What is {title_topic(page['title'])}?" for page in titled[:count]]
+
+
+def ollama_reply(body):
+    """JSON search queries for query-generation requests; other requests get the fake's default reply."""
+    for message in body.get("messages", []):
+        if message["content"].startswith(QUERY_GENERATION_PREFIX):
+            topic = message["content"][len(QUERY_GENERATION_PREFIX):]
+            return json.dumps({"search_queries": [topic, f"{topic} explained", f"{topic} latest news"]})
+    return None
+
+
+async def bench_scrape(web, concurrency, repeat):
+    from scrape_util import scrape_webpage
+
+    urls = web.page_urls() * repeat
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    methods = Counter()
+
+    async def scrape(url):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await scrape_webpage(url)
+            latencies.append(time.perf_counter() - start)
+            methods[result["method"] or "failed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(scrape(url) for url in urls))
+    return {"scrape_webpage": summarize(latencies, time.perf_counter() - start, concurrency=concurrency,
+                                        methods=dict(methods))}
+
+
+def bench_relevance(pages, repeat):
+    from search_utils import extract_relevant_information, analyze_page, RelevanceQuery
+
+    cases = [(page["content"], title_keywords(page["title"])) for page in pages]
+    analyses = [analyze_page(content) for content, _ in cases]
+    raw, analyzed = [], []
+    for _ in range(repeat):
+        for (content, keywords), analysis in zip(cases, analyses):
+            # Compiled once per prompt in the pipeline, so not timed
+            query = RelevanceQuery(keywords)
+            start = time.perf_counter()
+            extract_relevant_information(content, keywords, top_n=8, query=query)
+            raw.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            extract_relevant_information(content, keywords, top_n=8, query=query, analysis=analysis)
+            analyzed.append(time.perf_counter() - start)
+    return {"extract_relevant_information": summarize(raw),
+            "extract_relevant_information_analyzed": summarize(analyzed)}
+
+
+def entry_url(i):
+    return f"https://bench.example/articles/{i}"
+
+
+def populate_cache(cache, pages, count):
+    """
+    Write `count` entries in DiskJsonCache's on-disk layout: what as many set()
+    calls would leave (without page analysis), in a fraction of the time.
+    """
+    now = time.time()
+    hot_index = {}
+    with open(cache.bm25_dir / "documents.jsonl", "w", encoding="utf-8") as documents:
+        for i in range(count):
+            page = pages[i % len(pages)]
+            url = entry_url(i)
+            content = f"{page['content']} Entry {i}."
+            content_hash = cache._compute_hash(content)
+            url_hash = cache._compute_hash(cache._normalize_url(url))
+            cold_file = cache.cold_dir / f"{content_hash}.json"
+            timestamps = {"fetched_at": now, "cached_at": now, "expires_at": now + cache.SUCCESS_CACHE_DURATION,
+                          "last_accessed": now, "access_count": 1}
+            cache._write_json_file(cold_file, {
+                "url": url, "title": page["title"], "content": content, "method": "trafilatura",
+                "success": True, "error": None, "timestamps": timestamps,
+                "hashes": {"url_hash": url_hash, "content_hash": content_hash},
+            })
+            documents.write(json.dumps({"doc_id": content_hash, "title": page["title"], "content": content,
+                                        "url": url}) + "\n")
+            hot_index[url_hash] = {"content_hash": content_hash, "path": str(cold_file.relative_to(cache.cache_dir)),
+                                   "expires_at": timestamps["expires_at"], "last_accessed": now - count + i,
+                                   "access_count": 1}
+    # set() keeps the most recently written HOT_CACHE_MAX_ITEMS entries in the hot index
+    cache._write_hot_index(dict(list(hot_index.items())[-cache.HOT_CACHE_MAX_ITEMS:]))
+    cache._update_metadata(delta_items=count)
+
+
+async def bench_cache(pages, sizes, samples):
+    from cache.disk_cache import DiskJsonCache
+
+    random.seed(0)
+    queries = [" ".join(title_keywords(page["title"])) for page in pages]
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DiskJsonCache(cache_dir)
+            start = time.perf_counter()
+            populate_cache(cache, pages, size)
+            populate_s = time.perf_counter() - start
+
+            async def timed(calls):
+                latencies = []
+                for call in calls:
+                    start = time.perf_counter()
+                    await call()
+                    latencies.append(time.perf_counter() - start)
+                return latencies
+
+            hot = range(max(size - cache.HOT_CACHE_MAX_ITEMS, 0), size)
+            hits = random.sample(hot, min(samples, len(hot)))
+            get_hit = await timed(lambda url=entry_url(i): cache.get(url) for i in hits)
+            get_miss = await timed(lambda url=entry_url(size + i): cache.get(url) for i in range(samples))
+            start = time.perf_counter()
+            await cache.search_hybrid(queries[0])
+            index_build_s = time.perf_counter() - start
+            search = await timed(lambda query=random.choice(queries): cache.search_hybrid(query)
+                                 for _ in range(samples))
+            new_pages = [(entry_url(size + samples + i), pages[i % len(pages)]) for i in range(samples)]
+            set_new = await timed(lambda url=url, page=page: cache.set(url, {
+                "url": url, "title": page["title"], "content": f"{page['content']} New {url}."})
+                for url, page in new_pages)
+
+            results[str(size)] = {
+                "populate_s": round(populate_s, 2),
+                "get_hit": summarize(get_hit),
+                "get_miss": summarize(get_miss),
+                "set": summarize(set_new),
+                "search_index_build_ms": round(index_build_s * 1000, 1),
+                "search_hybrid": summarize(search),
+            }
+            print(f"  cache {size:>7,} entries: get p50 {results[str(size)]['get_hit']['p50_ms']:.2f} ms, "
+                  f"set p50 {results[str(size)]['set']['p50_ms']:.2f} ms, "
+                  f"search p50 {results[str(size)]['search_hybrid']['p50_ms']:.2f} ms")
+    return results
+
+
+async def bench_e2e(prompts, concurrency, rounds):
+    import web_search
+    import ai_orchestrator
+    from cache.disk_cache import DiskJsonCache
+    from search_utils import analyze_page
+
+    async def stream(prompt):
+        start = time.perf_counter()
+        ttft = None
+        stages = {}
+        async for line in ai_orchestrator.generate_unified_stream(prompt):
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "response_token" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif event["type"] == "stream_complete":
+                stages = (event["data"].get("timings") or {}).get("stages", {})
+        return ttft or 0.0, time.perf_counter() - start, stages
+
+    def report(runs, wall=None):
+        stage_ms = defaultdict(list)
+        for _, _, stages in runs:
+            for name, stage in stages.items():
+                stage_ms[name].append(stage["ms"])
+        return {"ttft": summarize([ttft for ttft, _, _ in runs], wall),
+                "total": summarize([total for _, total, _ in runs], wall),
+                "stages_p50_ms": {name: round(median(values), 1) for name, values in sorted(stage_ms.items())}}
+
+    with tempfile.TemporaryDirectory() as cache_root:
+        # Cold: every prompt starts from an empty page cache and scrapes its pages
+        cold = []
+        for i, prompt in enumerate(prompts):
+            web_search.cache = DiskJsonCache(os.path.join(cache_root, f"cold-{i}"), analyzer=analyze_page)
+            cold.append(await stream(prompt))
+
+        # Warm: one page cache shared by all prompts, filled by a first pass
+        web_search.cache = DiskJsonCache(os.path.join(cache_root, "warm"), analyzer=analyze_page)
+        for prompt in prompts:
+            await stream(prompt)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(prompt):
+            async with semaphore:
+                return await stream(prompt)
+
+        start = time.perf_counter()
+        warm = await asyncio.gather(*(limited(prompt) for _ in range(rounds) for prompt in prompts))
+        warm_wall = time.perf_counter() - start
+
+    return {"cold": report(cold), "warm": dict(report(warm, warm_wall), concurrency=concurrency)}
+
+
+def compare(results, baseline, threshold, path=""):
+    """Lines comparing the p50 latencies of two result trees; regressions beyond threshold are flagged."""
+    lines = []
+    for key, value in results.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if old is None:
+            continue
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and "p50_ms" in value and "p50_ms" in old:
+            ratio = value["p50_ms"] / old["p50_ms"] if old["p50_ms"] else 1.0
+            flag = "  REGRESSION" if ratio > 1 + threshold else ""
+            lines.append(f"{name:<60}{old['p50_ms']:>10.2f}{value['p50_ms']:>10.2f}{ratio:>8.2f}x{flag}")
+        elif isinstance(value, dict):
+            lines.extend(compare(value, old, threshold, name))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on recorded pages")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="Comma-separated benchmarks to run")
+    parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), '..', 'cache', 'cold'),
+                        help="Recorded pages (directory of JSON page records)")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the pages (scrape, relevance)")
+    parser.add_argument("--cache-sizes", default="1000,10000,100000")
+    parser.add_argument("--samples", type=int, default=200, help="Timed calls per cache operation")
+    parser.add_argument("--prompts", type=int, default=8, help="End-to-end prompts")
+    parser.add_argument("--rounds", type=int, default=2, help="Warm end-to-end passes over the prompts")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent scrapes and warm streams")
+    parser.add_argument("--search-ms", type=float, default=0, help="Fake PSE latency")
+    parser.add_argument("--page-ms", type=float, default=0, help="Fake page latency")
+    parser.add_argument("--tokens", type=int, default=40, help="Fake answer tokens")
+    parser.add_argument("--token-ms", type=float, default=10, help="Fake time per answer token")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument("--baseline", help="Earlier result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="p50 slowdown flagged as a regression")
+    args = parser.parse_args()
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    # The fakes must be up, and the pipeline pointed at them, before its modules are imported
+    web = FakeWeb(args.corpus, search_ms=args.search_ms, page_ms=args.page_ms)
+    web.start()
+    ollama_server = FakeOllama(tokens=args.tokens, token_ms=args.token_ms, prompt_eval_ms=20,
+                               parallel=args.concurrency, reply_for=ollama_reply)
+    os.environ.update({
+        "OLLAMA_HOST": ollama_server.start(),
+        "SEARCH_PROVIDER": "google", "GOOGLE_API_KEY": "bench", "GOOGLE_CX": "bench",
+        "GOOGLE_PSE_ENDPOINT": web.search_endpoint,
+        "ANSWER_CACHE_ENABLED": "0",
+    })
+    pages = web.recorded_pages()
+    print(f"{len(pages)} recorded pages from {args.corpus}")
+
+    results = {}
+    if "scrape" in selected:
+        print("scrape_webpage ...")
+        results["scrape"] = asyncio.run(bench_scrape(web, args.concurrency, args.repeat))
+    if "relevance" in selected:
+        print("extract_relevant_information ...")
+        results["relevance"] = bench_relevance(pages, args.repeat)
+    if "cache" in selected:
+        print("DiskJsonCache ...")
+        sizes = [int(size) for size in args.cache_sizes.split(",") if size.strip()]
+        results["cache"] = asyncio.run(bench_cache(pages, sizes, args.samples))
+    if "e2e" in selected:
+        print("generate_unified_stream ...")
+        results["e2e"] = asyncio.run(bench_e2e(topic_prompts(pages, args.prompts), args.concurrency, args.rounds))
+    web.stop()
+    ollama_server.stop()
+
+    for name, stats in (("scrape", results.get("scrape", {}).get("scrape_webpage")),
+                        ("relevance raw", results.get("relevance", {}).get("extract_relevant_information")),
+                        ("relevance analyzed",
+                         results.get("relevance", {}).get("extract_relevant_information_analyzed")),
+                        ("e2e cold ttft", results.get("e2e", {}).get("cold", {}).get("ttft")),
+                        ("e2e cold total", results.get("e2e", {}).get("cold", {}).get("total")),
+                        ("e2e warm ttft", results.get("e2e", {}).get("warm", {}).get("ttft")),
+                        ("e2e warm total", results.get("e2e", {}).get("warm", {}).get("total"))):
+        if stats:
+            print(f"{name:<20}p50 {stats['p50_ms']:>9.2f} ms  p90 {stats['p90_ms']:>9.2f} ms  "
+                  f"p99 {stats['p99_ms']:>9.2f} ms  {stats['throughput_per_s']:>8.1f}/s")
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results",
+                                         f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "platform": platform.platform(),
+                   "args": vars(args), "results": results}, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        print(f"\n{'p50 vs baseline':<60}{'before':>10}{'after':>10}{'ratio':>9}")
+        print("\n".join(compare(results, baseline, args.threshold)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for search_utils.extract_relevant_information.
+
+Replays every page in the cold cache through the vectorized scorer and through
+a reference implementation of the previous per-page rank_bm25.BM25Okapi scorer,
+checks that both return identical results, and reports timings. Pages are also
+scored from their stored analyze_page() output (sentence offsets and term
+statistics), the path cached pages take, and with a precompiled RelevanceQuery
+so the per-query work (expansion, NER, tokenized query, keyword matcher) and
+the per-page work are timed separately.
+
+Usage:
+    python benchmarks/bench_relevance.py [--cache-dir cache] [--repeat 3]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import orjson
+except ImportError:
+    import json as orjson
+
+from rank_bm25 import BM25Okapi
+
+import search_utils
+from search_utils import (
+    extract_relevant_information, analyze_page, bm25_scores, RelevanceQuery, split_sentences, tokenize_text,
+    expand_keywords_wordnet, extract_entities_from_keywords
+)
+
+
+def calculate_entity_overlap(sentence, keywords):
+    """The previous per-sentence NER: entities shared by the sentence and the keywords, 0 without spaCy."""
+    nlp = search_utils.get_spacy_nlp()
+    if nlp is None:
+        return 0
+
+    try:
+        sent_entities = {ent.text.lower() for ent in nlp(sentence).ents}
+        keyword_entities = {ent.text.lower() for ent in nlp(" ".join(keywords)).ents}
+        return len(sent_entities.intersection(keyword_entities))
+    except Exception:
+        return 0
+
+
+def reference_extract(content, keywords, top_n=5, expansion_weight=0.5, bm25_weight=1.0,
+                      keyword_weight=2.0, entity_weight=1.5):
+    """The previous implementation: BM25Okapi per page plus per-sentence Python loops."""
+    sentences = split_sentences(content)
+    if not sentences:
+        return []
+
+    original_keywords_set = set(kw.lower() for kw in keywords)
+    expanded_keywords = keywords.copy()
+    if search_utils.nltk_ready():
+        expanded_keywords = expand_keywords_wordnet(keywords, max_synonyms=2)
+    key_terms = keywords
+    if search_utils.spacy_available():
+        key_terms = extract_entities_from_keywords(keywords)
+
+    tokenized_sentences = [tokenize_text(sent) for sent in sentences]
+    all_search_terms = list(set(
+        [kw.lower() for kw in keywords] +
+        [kw.lower() for kw in expanded_keywords] +
+        [term.lower() for term in key_terms]
+    ))
+    tokenized_query = tokenize_text(" ".join(all_search_terms))
+
+    try:
+        bm25_scores = BM25Okapi(tokenized_sentences).get_scores(tokenized_query)
+    except Exception:
+        return []
+
+    results = []
+    for sentence, bm25_score in zip(sentences, bm25_scores):
+        sentence_lower = sentence.lower()
+        original_matches = sum(1 for kw in original_keywords_set if kw in sentence_lower)
+        expanded_matches = sum(
+            1 for kw in expanded_keywords
+            if kw.lower() not in original_keywords_set and kw.lower() in sentence_lower
+        )
+        entity_overlap = 0
+        if search_utils.spacy_available():
+            entity_overlap = calculate_entity_overlap(sentence, keywords)
+        final_score = (
+                bm25_score * bm25_weight +
+                original_matches * keyword_weight +
+                expanded_matches * expansion_weight +
+                entity_overlap * entity_weight
+        )
+        metadata = {
+            'bm25_score': round(bm25_score, 3),
+            'original_matches': original_matches,
+            'expanded_matches': expanded_matches,
+            'entity_overlap': entity_overlap,
+            'sentence_length': len(sentence.split())
+        }
+        results.append((sentence, final_score, metadata))
+
+    results.sort(key=lambda x: x[1], reverse=True)
+    return [r for r in results if r[1] > 0][:top_n]
+
+
+def load_corpus(cache_dir):
+    """Load (content, keywords) cases from the cold cache pages."""
+    cases = []
+    for file_path in sorted(Path(cache_dir, "cold").glob("*.json")):
+        with open(file_path, 'rb') as f:
+            page = orjson.loads(f.read())
+        content = page.get('content') or ''
+        if len(content) < 100:
+            continue
+        # Roughly what KeyBERT hands over: a few title words plus frequent content words
+        title_words = re.findall(r'[A-Za-z]{4,}', page.get('title', ''))[:4]
+        content_words = Counter(w.lower() for w in re.findall(r'[A-Za-z]{6,}', content))
+        keywords = title_words + [w for w, _ in content_words.most_common(6)]
+        cases.append((content, keywords))
+    return cases
+
+
+def timed(func, cases, repeat):
+    best = float('inf')
+    outputs = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [func(content, keywords, top_n=5) for content, keywords in cases]
+        best = min(best, time.perf_counter() - start)
+    return best, outputs
+
+
+def compile_queries(cases, repeat):
+    """Build one RelevanceQuery per case, timing the query-side work alone."""
+    best = float('inf')
+    queries = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queries = {content: RelevanceQuery(keywords) for content, keywords in cases}
+        best = min(best, time.perf_counter() - start)
+    return best, queries
+
+
+def bench_scoring_only(cases, repeat):
+    """Time BM25 scoring alone on pre-tokenized pages (tokenization is shared by both paths)."""
+    tokenized = []
+    for content, keywords in cases:
+        sentences = [tokenize_text(s) for s in split_sentences(content)]
+        if any(sentences):
+            tokenized.append((sentences, tokenize_text(" ".join(keywords).lower())))
+
+    results = {}
+    for name, score in (("BM25Okapi", lambda s, q: BM25Okapi(s).get_scores(q)), ("bm25_scores", bm25_scores)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = [score(sentences, query) for sentences, query in tokenized]
+            best = min(best, time.perf_counter() - start)
+        results[name] = (best, outputs)
+
+    identical = all((a == b).all() for a, b in zip(results["BM25Okapi"][1], results["bm25_scores"][1]))
+    return results["BM25Okapi"][0], results["bm25_scores"][0], identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sentence relevance scoring")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.dirname(__file__), '..', 'cache'))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = load_corpus(args.cache_dir)
+
+    # Silence the per-page progress prints while timing
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        reference_time, reference = timed(reference_extract, cases, args.repeat)
+        vectorized_time, vectorized = timed(extract_relevant_information, cases, args.repeat)
+        analyses = {content: analyze_page(content) for content, _ in cases}
+        analyzed_time, analyzed = timed(
+            lambda content, keywords, top_n: extract_relevant_information(
+                content, keywords, top_n=top_n, analysis=analyses[content]),
+            cases, args.repeat)
+        compile_time, queries = compile_queries(cases, args.repeat)
+        per_page_time, per_page = timed(
+            lambda content, keywords, top_n: extract_relevant_information(
+                content, keywords, top_n=top_n, analysis=analyses[content], query=queries[content]),
+            cases, args.repeat)
+        okapi_time, scorer_time, scores_identical = bench_scoring_only(cases, args.repeat)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+
+    mismatches = sum(1 for a, b in zip(reference, vectorized) if a != b)
+    mismatches += sum(1 for a, b in zip(reference, analyzed) if a != b)
+    mismatches += sum(1 for a, b in zip(reference, per_page) if a != b)
+
+    print(f"Pages:          {len(cases)}")
+    print(f"Reference:      {reference_time * 1000:.1f} ms ({reference_time * 1000 / len(cases):.2f} ms/page)")
+    print(f"Vectorized:     {vectorized_time * 1000:.1f} ms ({vectorized_time * 1000 / len(cases):.2f} ms/page)")
+    print(f"Speedup:        {reference_time / vectorized_time:.2f}x")
+    print(f"Analyzed pages: {analyzed_time * 1000:.1f} ms ({reference_time / analyzed_time:.2f}x)")
+    print("Compiled RelevanceQuery:")
+    print(f"  Query side:   {compile_time * 1000:.1f} ms ({compile_time * 1000 / len(cases):.2f} ms/query)")
+    print(f"  Page side:    {per_page_time * 1000:.1f} ms ({per_page_time * 1000 / len(cases):.2f} ms/page, analyzed)")
+    print(f"Mismatches:     {mismatches}")
+    print("BM25 scoring only:")
+    print(f"  BM25Okapi:    {okapi_time * 1000:.1f} ms")
+    print(f"  bm25_scores:  {scorer_time * 1000:.1f} ms ({okapi_time / scorer_time:.2f}x)")
+    print(f"  Identical:    {scores_identical}")
+    return 1 if mismatches or not scores_identical else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
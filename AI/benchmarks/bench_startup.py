@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the NLP profiles of search_utils.
+
+For every KHOJ_NLP_PROFILE, runs fresh interpreters that import a module and
+reports how long the import takes, how long the background NLP warm-up takes
+to finish and how long the first extract_relevant_information call takes.
+
+Usage:
+    python benchmarks/bench_startup.py [--module search_utils] [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs in the child interpreter, prints one JSON line with the timings in ms
+CHILD = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+import search_utils
+search_utils.wait_until_ready()
+ready = time.perf_counter()
+search_utils.extract_relevant_information(
+    "Apple released the iPhone 15 in 2023. The camera is better. Battery life improved.",
+    ["iPhone 15", "camera"], top_n=3)
+first_call = time.perf_counter()
+print(json.dumps({{
+    "import": (imported - start) * 1000,
+    "ready": (ready - start) * 1000,
+    "first_call": (first_call - ready) * 1000,
+    "nltk": search_utils.nltk_ready(),
+    "spacy": search_utils.spacy_available(),
+}}))
+"""
+
+
+def run_child(module, profile):
+    env = dict(os.environ, KHOJ_NLP_PROFILE=profile, SEARCH_PROVIDER=os.getenv("SEARCH_PROVIDER", "local"))
+    result = subprocess.run([sys.executable, "-c", CHILD.format(module=module)], cwd=AI_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search_utils startup per NLP profile")
+    parser.add_argument("--module", default="search_utils", help="Module to import (e.g. web_search)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Importing {args.module} ({args.repeat} runs, median ms)")
+    print(f"{'profile':<10}{'import':>10}{'ready':>10}{'1st call':>10}  backends")
+    for profile in ("minimal", "nltk", "full"):
+        runs = [run_child(args.module, profile) for _ in range(args.repeat)]
+        backends = ", ".join(name for name in ("nltk", "spacy") if runs[-1][name]) or "none"
+        print(f"{profile:<10}"
+              f"{median(r['import'] for r in runs):>10.1f}"
+              f"{median(r['ready'] for r in runs):>10.1f}"
+              f"{median(r['first_call'] for r in runs):>10.1f}  {backends}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-token of the answer prompt layouts.
+
+Sends --requests questions about cached pages, one at a time, with the
+previous layout (one /api/generate prompt, instructions around the question
+and context) and with prompt_builder's layout (byte-stable system message,
+variable parts last, via /api/chat), and reports TTFT per layout. Against a
+real server (--host) this measures Ollama's prefix cache; without --host a
+fake server emulates it (benchmarks/fake_ollama.py, --ms-per-kchar of prompt
+evaluation for characters outside the cached prefix) and also reports how
+many prompt characters had to be evaluated.
+
+Usage:
+    python benchmarks/bench_ttft.py [--host http://127.0.0.1:11434] [--requests 10]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from statistics import median
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ollama
+from prompt_builder import GROUNDED_SYSTEM_PROMPT, grounded_messages, today, ANSWER_MODEL, OLLAMA_KEEP_ALIVE
+from search_providers import LocalSearchProvider
+from benchmarks.fake_ollama import FakeOllama
+
+
+def legacy_prompt(prompt, context):
+    """The previous single-string template: rules, date, question, context, then the steps."""
+    rules, steps = GROUNDED_SYSTEM_PROMPT.split("\n\nThink step-by-step before answering:")
+    return (f"\n{rules}\n\n### TIME CONTEXT:\nAll the context are of today's time which is {today()}\n"
+            f"### USER QUESTION:\n{prompt}\n\n### RETRIEVED CONTEXT (this is the only truth you have):\n"
+            f"{context}\n\nNow think step-by-step before answering:{steps}\n\nBegin your response now.")
+
+
+async def first_token(call):
+    """Seconds until the first non-empty chunk; the rest of the stream is drained."""
+    start = time.perf_counter()
+    elapsed = None
+    async for chunk in await call:
+        text = chunk.get('response') or (chunk.get('message') or {}).get('content')
+        if text and elapsed is None:
+            elapsed = time.perf_counter() - start
+    return elapsed
+
+
+async def run_layout(client, model, questions, layout):
+    ttfts = []
+    for question, context in questions:
+        if layout == "legacy":
+            call = client.generate(model=model, prompt=legacy_prompt(question, context), stream=True)
+        else:
+            call = client.chat(model=model, messages=grounded_messages(question, context), stream=True,
+                               keep_alive=OLLAMA_KEEP_ALIVE)
+        ttfts.append(await first_token(call))
+    return ttfts
+
+
+async def measure(host, model, questions, layout, server=None):
+    client = ollama.AsyncClient(host=host)
+    # Warm-up request so the model is loaded and its cache holds this layout
+    await run_layout(client, model, questions[-1:], layout)
+    if server:
+        server.evaluated_chars = 0
+    return await run_layout(client, model, questions[:-1], layout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-token per prompt layout")
+    parser.add_argument("--host", help="Ollama server (default: a fake server emulating the prefix cache)")
+    parser.add_argument("--model", default=ANSWER_MODEL)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--ms-per-kchar", type=float, default=100, help="Fake prompt evaluation cost")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.dirname(__file__), '..', 'cache'))
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, 'w')
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        provider = LocalSearchProvider(args.cache_dir)
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+    pages = [page for page in provider.pages.values() if page['title'] != 'No title'][:args.requests]
+    questions = [(f"What does '{page['title']}' say?",
+                  f"Source: {page['title']} ({page['url']})\n{page['content'][:2000]}") for page in pages]
+
+    print(f"{len(questions) - 1} sequential requests after a warm-up, model {args.model}")
+    print(f"{'layout':<10}{'ttft p50':>10}{'ttft max':>10}{'evaluated chars':>18}")
+    for layout in ("legacy", "chat"):
+        server = None
+        host = args.host
+        if not host:
+            server = FakeOllama(tokens=5, token_ms=5, prompt_eval_ms=10, parallel=1,
+                                prompt_ms_per_kchar=args.ms_per_kchar)
+            host = server.start()
+        ttfts = asyncio.run(measure(host, args.model, questions, layout, server))
+        evaluated = f"{server.evaluated_chars:>18,}" if server else f"{'n/a':>18}"
+        print(f"{layout:<10}{median(ttfts) * 1000:>9.0f}ms{max(ttfts) * 1000:>8.0f}ms{evaluated}")
+        if server:
+            server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Minimal stand-in for the Ollama HTTP API, for benchmarks.
+
+Serves /api/generate and /api/chat, streamed (NDJSON) or not, with a fixed
+prompt-eval delay and a fixed token rate, so LLM-bound code paths can be load
+tested without a model. Like a real server it only runs `parallel` requests at
+a time, the others wait. With prompt_ms_per_kchar, prompt evaluation also costs
+time per character not covered by the longest prefix shared with one of the
+last `parallel` prompts, like the per-slot KV cache of the real server. With
+reply_for, a function of the request body, requests it returns text for are
+answered with that text (e.g. JSON for search-query generation) instead. The
+server runs on its own event loop in a daemon thread, so it keeps answering
+even when the client blocks its loop.
+
+Usage:
+    server = FakeOllama(tokens=40, token_ms=20)
+    host = server.start()            # "http://127.0.0.1:<port>"
+    client = ollama.AsyncClient(host=host)
+"""
+
+import os
+import re
+import json
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from aiohttp import web
+
+
+class FakeOllama:
+    def __init__(self, tokens: int = 40, token_ms: float = 20, prompt_eval_ms: float = 100,
+                 parallel: int = 4, reply: str = "word", prompt_ms_per_kchar: float = 0,
+                 reply_for: Optional[Callable[[Dict], Optional[str]]] = None):
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.prompt_eval_ms = prompt_eval_ms
+        self.parallel = parallel
+        self.reply = reply
+        self.prompt_ms_per_kchar = prompt_ms_per_kchar
+        self.reply_for = reply_for
+        self.evaluated_chars = 0
+        self._recent_prompts = []
+        self.requests = 0
+        self.max_active = 0
+        self._active = 0
+        self._loop = None
+        self._runner = None
+
+    def _chunk(self, body, text, done):
+        chunk = {"model": body.get("model", "fake"), "created_at": datetime.now(timezone.utc).isoformat(),
+                 "done": done}
+        if "messages" in body:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        if done:
+            chunk.update(done_reason="stop", prompt_eval_count=len(json.dumps(body)) // 4,
+                         eval_count=self.tokens, eval_duration=int(self.tokens * self.token_ms * 1e6))
+        return chunk
+
+    def _uncached_chars(self, body):
+        if "messages" in body:
+            text = "".join(f"<{m['role']}>{m['content']}" for m in body["messages"])
+        else:
+            text = f"<system>{body.get('system', '')}<user>{body.get('prompt', '')}"
+        cached = max((len(os.path.commonprefix([text, recent])) for recent in self._recent_prompts), default=0)
+        self._recent_prompts = (self._recent_prompts + [text])[-self.parallel:]
+        return len(text) - cached
+
+    async def _handle(self, request):
+        body = await request.json()
+        self.requests += 1
+        async with self._slots:
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+            try:
+                uncached = self._uncached_chars(body)
+                self.evaluated_chars += uncached
+                await asyncio.sleep((self.prompt_eval_ms + uncached / 1000 * self.prompt_ms_per_kchar) / 1000)
+                text = self.reply_for(body) if self.reply_for else None
+                tokens = re.findall(r"\S+\s*", text) if text else [f"{self.reply}{i} " for i in range(self.tokens)]
+                if not body.get("stream", True):
+                    await asyncio.sleep(len(tokens) * self.token_ms / 1000)
+                    return web.json_response(self._chunk(body, "".join(tokens), True))
+
+                response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+                await response.prepare(request)
+                for token in tokens:
+                    await asyncio.sleep(self.token_ms / 1000)
+                    await response.write((json.dumps(self._chunk(body, token, False)) + "\n").encode())
+                await response.write((json.dumps(self._chunk(body, "", True)) + "\n").encode())
+                await response.write_eof()
+                return response
+            finally:
+                self._active -= 1
+
+    def start(self) -> str:
+        """Start the server in a background thread and return its base URL."""
+        started = threading.Event()
+        address = {}
+
+        async def serve():
+            self._slots = asyncio.Semaphore(self.parallel)
+            app = web.Application()
+            app.router.add_post("/api/generate", self._handle)
+            app.router.add_post("/api/chat", self._handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            address["port"] = site._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return f"http://127.0.0.1:{address['port']}"
+
+    def stop(self) -> None:
+        """Stop the server thread."""
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
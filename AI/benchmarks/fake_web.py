@@ -0,0 +1,129 @@
+"""
+Minimal stand-in for Google PSE and the web, for benchmarks.
+
+Replays the pages recorded in the cold cache: each one is served as an HTML
+article at /page/<url hash> (title, paragraphs, and the navigation, ads,
+sidebar and footer a real page carries, so extraction has noise to remove),
+/robots.txt allows everything, and /customsearch/v1 answers like the Custom
+Search JSON API, ranking the recorded pages with LocalSearchProvider and
+returning their local URLs. Optional delays emulate network latency. Like
+fake_ollama.py, the server runs on its own event loop in a daemon thread.
+
+Usage:
+    web = FakeWeb("cache/cold", search_ms=80, page_ms=30)
+    base = web.start()               # "http://127.0.0.1:<port>"
+    GoogleSearchProvider(api_key="bench", cx="bench", endpoint=web.search_endpoint)
+"""
+
+import re
+import html
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List
+
+from aiohttp import web
+
+from search_providers import LocalSearchProvider
+
+NOISE_TOP = """<nav class="site-nav"><a href="/">Home</a> <a href="/news">News</a> <a href="/about">About</a></nav>
+<div class="advertisement ad-container">Advertisement: Save 50% on premium plans today!</div>
+<div class="cookie-banner">We use cookies to improve your experience. <button>Accept</button></div>"""
+
+NOISE_BOTTOM = """<aside class="sidebar"><h3>Popular posts</h3><ul><li><a href="/p1">Ten tips you missed</a></li>
+<li><a href="/p2">Trending now: what readers like</a></li></ul></aside>
+<div class="newsletter-signup">Subscribe to our newsletter for weekly updates.</div>
+<footer class="site-footer">Copyright 2025. All rights reserved. <a href="/privacy">Privacy</a></footer>
+<script>window.dataLayer = window.dataLayer || []; function track() {}</script>"""
+
+
+def render_html(page: Dict) -> str:
+    """A recorded page as an HTML article, three sentences per paragraph, between typical page noise."""
+    sentences = re.split(r'(?<=[.!?])\s+', page["content"].strip())
+    paragraphs = "\n".join(f"<p>{html.escape(' '.join(sentences[i:i + 3]))}</p>"
+                           for i in range(0, len(sentences), 3))
+    title = html.escape(page["title"])
+    return (f"<!DOCTYPE html><html><head><title>{title}</title>"
+            f'<meta name="description" content="{title}"></head><body>\n{NOISE_TOP}\n'
+            f'<main><article class="post-content"><h1>{title}</h1>\n{paragraphs}\n</article></main>\n'
+            f"{NOISE_BOTTOM}\n</body></html>")
+
+
+class FakeWeb:
+    def __init__(self, corpus_path: str, search_ms: float = 0, page_ms: float = 0):
+        self.corpus = LocalSearchProvider(corpus_path)
+        self.search_ms = search_ms
+        self.page_ms = page_ms
+        self.base = ""
+        self.searches = 0
+        self.page_requests = 0
+        # Recorded URL -> page id, and page id -> rendered HTML
+        self._ids = {url: hashlib.md5(url.encode()).hexdigest()[:16] for url in self.corpus.pages}
+        self._html = {page_id: render_html(self.corpus.pages[url]) for url, page_id in self._ids.items()}
+        self._loop = None
+        self._runner = None
+
+    @property
+    def search_endpoint(self) -> str:
+        return f"{self.base}/customsearch/v1"
+
+    def page_urls(self) -> List[str]:
+        """Local URLs of every recorded page."""
+        return [f"{self.base}/page/{page_id}" for page_id in self._ids.values()]
+
+    def recorded_pages(self) -> List[Dict]:
+        """The recorded pages (url, title, content)."""
+        return list(self.corpus.pages.values())
+
+    async def _search(self, request):
+        self.searches += 1
+        await asyncio.sleep(self.search_ms / 1000)
+        num = min(int(request.query.get("num", 10)), 10)
+        urls = self.corpus.search(request.query.get("q", ""), num)
+        items = [{"link": f"{self.base}/page/{self._ids[url]}", "title": self.corpus.pages[url]["title"]}
+                 for url in urls]
+        return web.json_response({"items": items} if items else {})
+
+    async def _page(self, request):
+        self.page_requests += 1
+        await asyncio.sleep(self.page_ms / 1000)
+        body = self._html.get(request.match_info["page_id"])
+        if body is None:
+            return web.Response(status=404, text="Not found")
+        return web.Response(text=body, content_type="text/html")
+
+    async def _robots(self, request):
+        return web.Response(text="User-agent: *\nAllow: /\n")
+
+    def start(self) -> str:
+        """Start the server in a background thread and return its base URL."""
+        started = threading.Event()
+        address = {}
+
+        async def serve():
+            app = web.Application()
+            app.router.add_get("/customsearch/v1", self._search)
+            app.router.add_get("/page/{page_id}", self._page)
+            app.router.add_get("/robots.txt", self._robots)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            address["port"] = site._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(serve())
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        self.base = f"http://127.0.0.1:{address['port']}"
+        return self.base
+
+    def stop(self) -> None:
+        """Stop the server thread."""
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
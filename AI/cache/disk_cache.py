@@ -6,13 +6,17 @@ as JSON files on disk with deduplication, full-text search, and hybrid hot/cold
 """
 
 import os
+import re
+import math
 import time
 import fcntl
 import asyncio
 import aiofiles
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Callable
 from pathlib import Path
 
+import numpy as np
+
 # Handle optional dependencies
 try:
     import orjson
@@ -27,6 +31,311 @@ try:
 except ImportError:
     XXHASH_AVAILABLE = False
 
+# Structured logging when used from the AI package, standard logging otherwise
+try:
+    from log_config import get_logger
+except ImportError:
+    import logging
+    get_logger = logging.getLogger
+
+logger = get_logger(__name__)
+
+# Pipeline tracing when used from the AI package, no-op otherwise
+try:
+    from tracing import traced, current_span
+    TRACING_AVAILABLE = True
+except ImportError:
+    TRACING_AVAILABLE = False
+
+    def traced(name=None):
+        return lambda func: func
+
+    def current_span():
+        return _NoopSpan()
+
+    class _NoopSpan:
+        def set_attribute(self, key, value):
+            pass
+
+class _BM25Index:
+    """
+    In-memory BM25 inverted index over bm25_index/documents.jsonl.
+
+    The index remembers how many bytes of the file it has consumed and only
+    parses appended lines on refresh, so documents written by set() (from this
+    or another process) become searchable without a full rebuild. If the file
+    shrinks (e.g. reindex-bm25 in maintenance.py) the index is rebuilt.
+    """
+
+    K1 = 1.5
+    B = 0.75
+    TOKEN_RE = re.compile(r'\w+')
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._reset()
+
+    def _reset(self) -> None:
+        self.offset = 0
+        self.doc_ids: List[str] = []
+        self.doc_lens: List[int] = []
+        self.total_len = 0
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._known: Dict[str, int] = {}
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls.TOKEN_RE.findall(text.lower())
+
+    def refresh(self) -> None:
+        """Index lines appended to the documents file since the last refresh."""
+        if not self.path.exists():
+            self._reset()
+            return
+        size = self.path.stat().st_size
+        if size < self.offset:
+            self._reset()
+        if size == self.offset:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        # Only consume complete lines; a partially written line is picked up next time
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                try:
+                    self._add(orjson.loads(line))
+                except Exception:
+                    continue
+        self.offset += end
+
+    def _add(self, doc: Dict) -> None:
+        doc_id = doc.get('doc_id')
+        content = doc.get('content', '')
+        if not doc_id or not content or doc_id in self._known:
+            return
+
+        tokens = self.tokenize(f"{doc.get('title', '')} {content}")
+        idx = len(self.doc_ids)
+        self._known[doc_id] = idx
+        self.doc_ids.append(doc_id)
+        self.doc_lens.append(len(tokens))
+        self.total_len += len(tokens)
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[idx] = tf
+
+    def score(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        Rank documents for the query.
+
+        Returns:
+            (doc_id, score) pairs, best first. Scores are BM25 divided by the
+            largest score any document could reach for this query, so they
+            fall in [0, 1] and are comparable between queries.
+        """
+        n_docs = len(self.doc_ids)
+        terms = set(self.tokenize(query))
+        if not n_docs or not terms:
+            return []
+
+        avgdl = self.total_len / n_docs
+        scores: Dict[int, float] = {}
+        max_score = 0.0
+        for term in terms:
+            posting = self.postings.get(term)
+            df = len(posting) if posting else 0
+            idf = math.log((n_docs - df + 0.5) / (df + 0.5) + 1)
+            max_score += idf * (self.K1 + 1)
+            if not posting:
+                continue
+            for idx, tf in posting.items():
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lens[idx] / avgdl)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(self.doc_ids[idx], score / max_score) for idx, score in ranked]
+
+
+class _VectorIndex:
+    """
+    On-disk nearest-neighbour index over page embeddings in vector_index/<model>/.
+
+    vectors.f16 holds L2-normalized float16 rows (read through a memory map),
+    ids.txt the doc_id of each row and meta.json the dimension. Rows are only
+    appended, by add() under the cache lock, and refresh() maps rows written by
+    other processes. Search is an exact scan of the memory map until train()
+    has built an IVF layout (k-means centroids in ivf.npy, the list of every row
+    in lists.i32); rows added afterwards are assigned to their nearest list, and
+    searches scan only the nprobe lists closest to the query.
+    """
+
+    SCAN_CHUNK = 65536
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.vectors_file = path / "vectors.f16"
+        self.ids_file = path / "ids.txt"
+        self.lists_file = path / "lists.i32"
+        self.centroids_file = path / "ivf.npy"
+        self.meta_file = path / "meta.json"
+        self._reset()
+
+    def _reset(self) -> None:
+        self.dim = 0
+        self.doc_ids: List[str] = []
+        self._known: Dict[str, int] = {}
+        self._ids_offset = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.lists: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self._centroids_mtime = 0
+
+    def __len__(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def refresh(self) -> None:
+        """Map rows appended since the last refresh (by this or another process)."""
+        if not self.meta_file.exists() or not self.ids_file.exists():
+            self._reset()
+            return
+        size = self.ids_file.stat().st_size
+        if size < self._ids_offset:
+            self._reset()
+        if not self.dim:
+            with open(self.meta_file, 'rb') as f:
+                self.dim = int(orjson.loads(f.read())['dim'])
+
+        if size > self._ids_offset:
+            with open(self.ids_file, 'rb') as f:
+                f.seek(self._ids_offset)
+                chunk = f.read(size - self._ids_offset)
+            end = chunk.rfind(b'\n') + 1
+            for line in chunk[:end].decode('utf-8').splitlines():
+                self._known.setdefault(line, len(self.doc_ids))
+                self.doc_ids.append(line)
+            self._ids_offset += end
+
+        # Pick up centroids trained (or retrained) by maintenance
+        centroids_mtime = self.centroids_file.stat().st_mtime_ns if self.centroids_file.exists() else 0
+        retrained = centroids_mtime != self._centroids_mtime
+        if retrained:
+            self.centroids = np.load(self.centroids_file) if centroids_mtime else None
+            self._centroids_mtime = centroids_mtime
+
+        # Rows are complete once their vector, id (and list, with IVF) are all written
+        rows = min(len(self.doc_ids), self.vectors_file.stat().st_size // (self.dim * 2))
+        if self.centroids is not None:
+            rows = min(rows, self.lists_file.stat().st_size // 4 if self.lists_file.exists() else 0)
+        if rows != len(self) or retrained:
+            self.vectors = np.memmap(self.vectors_file, dtype=np.float16, mode='r',
+                                     shape=(rows, self.dim)) if rows else None
+            self.lists = np.memmap(self.lists_file, dtype=np.int32, mode='r', shape=(rows,)) \
+                if rows and self.centroids is not None else None
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._known
+
+    def add(self, doc_id: str, vector: np.ndarray) -> bool:
+        """
+        Append the embedding of a document (callers hold the cache lock).
+
+        Returns:
+            False if the document is already indexed or the vector is unusable
+        """
+        self.refresh()
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if doc_id in self._known or not norm or (self.dim and len(vector) != self.dim):
+            return False
+
+        if not self.dim:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.dim = len(vector)
+            with open(self.meta_file, 'wb') as f:
+                meta = {'dim': self.dim}
+                f.write(orjson.dumps(meta) if ORJSON_AVAILABLE else orjson.dumps(meta).encode('utf-8'))
+        vector = vector / norm
+
+        with open(self.vectors_file, 'ab') as f:
+            f.write(vector.astype(np.float16).tobytes())
+        if self.centroids is not None:
+            with open(self.lists_file, 'ab') as f:
+                f.write(np.int32(np.argmax(self.centroids @ vector)).tobytes())
+        with open(self.ids_file, 'ab') as f:
+            f.write(f"{doc_id}\n".encode('utf-8'))
+        self.refresh()
+        return True
+
+    def search(self, query_vector: np.ndarray, limit: int, nprobe: int = 8) -> List[Tuple[str, float]]:
+        """
+        Nearest documents to a query embedding.
+
+        Returns:
+            (doc_id, cosine similarity) pairs, best first
+        """
+        self.refresh()
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if not len(self) or not norm or len(query) != self.dim:
+            return []
+        query = query / norm
+
+        if self.centroids is not None and self.lists is not None:
+            probes = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.flatnonzero(np.isin(self.lists, probes))
+            scores = self.vectors[rows].astype(np.float32) @ query
+        else:
+            rows = np.arange(len(self))
+            scores = np.concatenate([
+                self.vectors[start:start + self.SCAN_CHUNK].astype(np.float32) @ query
+                for start in range(0, len(self), self.SCAN_CHUNK)
+            ])
+
+        top = np.argsort(-scores, kind='stable')[:limit]
+        return [(self.doc_ids[rows[i]], float(scores[i])) for i in top]
+
+    def train(self, nlist: int, iterations: int = 10, sample: int = 100_000) -> None:
+        """
+        Cluster the indexed vectors into nlist IVF lists (k-means on a sample of
+        at most sample rows) and assign every row to its nearest centroid.
+        Callers hold the cache lock.
+        """
+        self.refresh()
+        if len(self) < nlist:
+            return
+        rng = np.random.RandomState(0)
+        training = self.vectors[np.sort(rng.choice(len(self), min(sample, len(self)), replace=False))]
+        training = training.astype(np.float32)
+        centroids = training[rng.choice(len(training), nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(training @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = training[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        lists = np.concatenate([
+            np.argmax(self.vectors[start:start + self.SCAN_CHUNK].astype(np.float32) @ centroids.T, axis=1)
+            for start in range(0, len(self), self.SCAN_CHUNK)
+        ]).astype(np.int32)
+        # Lists first, then the centroids that make readers use them
+        tmp_path = self.lists_file.with_suffix(f".{os.getpid()}.tmp")
+        lists.tofile(tmp_path)
+        os.replace(tmp_path, self.lists_file)
+        tmp_path = self.centroids_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, centroids.astype(np.float32))
+        os.replace(tmp_path, self.centroids_file)
+        self.refresh()
+
+
 class DiskJsonCache:
     """A disk-based JSON cache with hot/cold storage, deduplication, and full-text search."""
 
@@ -36,17 +345,35 @@ class DiskJsonCache:
     HOT_CACHE_MAX_ITEMS = 10_000
     HOT_CACHE_MAX_AGE_DAYS = 30              # Move to cold-only after 30 days
     
-    def __init__(self, cache_dir: str = "cache"):
+    # Characters of a page (after its title) embedded for the vector index
+    VECTOR_TEXT_CHARS = 2000
+    # Reciprocal rank fusion constant: score = sum of 1 / (RRF_K + rank)
+    RRF_K = 60
+
+    def __init__(self, cache_dir: str = "cache", analyzer: Optional[Callable[[str], Optional[Dict]]] = None,
+                 embedder: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 embedding_model: str = "default"):
         """
         Initialize the cache system.
         
         Args:
             cache_dir: Base directory for cache storage
+            analyzer: Optional function run on the content of new pages in set();
+                its result is stored in the cold record under "analysis" so
+                readers can reuse it instead of re-parsing the page
+            embedder: Optional function returning one embedding per text; new
+                pages are embedded in set() and added to the vector index
+            embedding_model: Name of the embedder's model, the vector index
+                lives in vector_index/<embedding_model>/
         """
         self.cache_dir = Path(cache_dir).resolve()
+        self.analyzer = analyzer
+        self.embedder = embedder
         self.hot_dir = self.cache_dir / "hot"
         self.cold_dir = self.cache_dir / "cold"
         self.bm25_dir = self.cache_dir / "bm25_index"
+        self.embeddings_dir = self.cache_dir / "embeddings"
+        self.vector_dir = self.cache_dir / "vector_index" / re.sub(r'[^\w.-]', '_', embedding_model)
         self.lock_file = self.cache_dir / "lock.file"
         self.metadata_file = self.cache_dir / "metadata.json"
         
@@ -59,6 +386,13 @@ class DiskJsonCache:
         
         # Counter for automatic cleanup
         self.write_counter = 0
+        # Outcomes of get() since startup: hit, miss, or stale (expired entry)
+        self.lookups = {"hit": 0, "miss": 0, "stale": 0}
+
+        # Lazily built BM25 index over bm25_index/documents.jsonl
+        self._bm25_index = _BM25Index(self.bm25_dir / "documents.jsonl")
+        # Page embeddings, appended to by set() when an embedder is configured
+        self._vector_index = _VectorIndex(self.vector_dir)
         
     def _initialize_metadata(self) -> None:
         """Initialize metadata file if it doesn't exist."""
@@ -78,13 +412,10 @@ class DiskJsonCache:
         Returns:
             File descriptor of the lock file
         """
-        # Create lock file if it doesn't exist
-        if not self.lock_file.exists():
-            self.lock_file.touch()
-            
-        lock_fd = open(self.lock_file, 'w')
-        fcntl.flock(lock_fd.fileno(), fcntl.LOCK_EX)
-        return lock_fd.fileno()
+        # Keep a raw descriptor: a file object would close (and unlock) when collected
+        lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        return lock_fd
     
     def _release_lock(self, fd: int) -> None:
         """
@@ -137,7 +468,7 @@ class DiskJsonCache:
             Hex digest of the hash
         """
         if XXHASH_AVAILABLE:
-            return xxhash.xxh64(data).hexdigest()
+            return xxhash.xxh64(data.encode('utf-8')).hexdigest()
         else:
             # Fallback to Python's built-in hash functions
             import hashlib
@@ -231,6 +562,7 @@ class DiskJsonCache:
         metadata['last_updated'] = time.time()
         self._write_json_file(self.metadata_file, metadata)
     
+    @traced("cache.get")
     async def get(self, url: str) -> Optional[Dict]:
         """
         Retrieve cached data for a URL.
@@ -248,6 +580,7 @@ class DiskJsonCache:
         # Check hot index
         hot_index = self._read_hot_index()
         if url_hash not in hot_index:
+            self._count_lookup("miss")
             return None
             
         entry = hot_index[url_hash]
@@ -258,6 +591,7 @@ class DiskJsonCache:
             # Expired entry, remove from index
             del hot_index[url_hash]
             self._write_hot_index(hot_index)
+            self._count_lookup("stale")
             return None
         
         # Update access statistics
@@ -274,10 +608,17 @@ class DiskJsonCache:
             # Inconsistent state - remove from hot index
             del hot_index[url_hash]
             self._write_hot_index(hot_index)
+            self._count_lookup("miss")
             return None
             
+        self._count_lookup("hit")
         return self._read_json_file(cold_file)
+
+    def _count_lookup(self, outcome: str) -> None:
+        self.lookups[outcome] += 1
+        current_span().set_attribute("outcome", outcome)
     
+    @traced("cache.set")
     async def set(self, url: str, data: Dict, success: bool = True) -> None:
         """
         Store data in cache.
@@ -306,6 +647,7 @@ class DiskJsonCache:
         # Check if content already exists
         cold_file = self.cold_dir / f"{content_hash}.json"
         is_new_content = not cold_file.exists()
+        current_span().set_attribute("new_content", is_new_content)
         
         # Update hot index
         hot_index = self._read_hot_index()
@@ -336,6 +678,15 @@ class DiskJsonCache:
             data.setdefault('timestamps', {})['expires_at'] = expires_at
             data.setdefault('timestamps', {})['last_accessed'] = current_time
             data.setdefault('timestamps', {})['access_count'] = 1
+
+            # Store the page analysis (computed off the event loop)
+            if self.analyzer and content:
+                try:
+                    analysis = await asyncio.to_thread(self.analyzer, content)
+                    if analysis:
+                        data['analysis'] = analysis
+                except Exception as e:
+                    logger.warning("Page analysis failed for %s: %s", url, e)
             
             # Write to cold storage
             self._write_json_file(cold_file, data)
@@ -355,6 +706,9 @@ class DiskJsonCache:
                     import json
                     await f.write(json.dumps(bm25_entry) + '\n')
             
+            if self.embedder and content:
+                await self.index_vector(content_hash, data.get('title', ''), content)
+
             # Update metadata
             file_size = cold_file.stat().st_size
             self._update_metadata(delta_items=1, delta_size=file_size)
@@ -420,6 +774,155 @@ class DiskJsonCache:
         
         return results
     
+    async def search_ranked(self, query: str, limit: int = 10) -> List[Tuple[Dict, float]]:
+        """
+        Rank cached documents against a query with BM25.
+
+        Args:
+            query: Search terms (e.g. the extracted keywords joined by spaces)
+            limit: Maximum number of results to return
+
+        Returns:
+            List of (full cached document, score) tuples, best first. Scores are
+            normalized to [0, 1] (see _BM25Index.score). Documents without
+            content (failed scrapes) are never returned.
+        """
+        self._bm25_index.refresh()
+
+        results = []
+        for doc_id, score in self._bm25_index.score(query, limit):
+            full_doc = self._read_json_file(self.cold_dir / f"{doc_id}.json")
+            if full_doc:
+                results.append((full_doc, score))
+        return results
+
+    @traced("cache.index_vector")
+    async def index_vector(self, doc_id: str, title: str, content: str) -> bool:
+        """
+        Embed a page with the configured embedder (off the event loop) and add
+        it to the vector index.
+
+        Returns:
+            True if the page was added, False if it was already indexed or failed
+        """
+        text = f"{title}\n{content[:self.VECTOR_TEXT_CHARS]}"
+        try:
+            vectors = await asyncio.to_thread(self.embedder, [text])
+        except Exception as e:
+            logger.warning("Page embedding failed for %s: %s", doc_id, e)
+            return False
+
+        # flock blocks while `maintenance index-vectors` holds the lock (e.g.
+        # training IVF lists), so wait for it and write in a worker thread
+        return await asyncio.to_thread(self._add_vector_locked, doc_id, np.asarray(vectors)[0])
+
+    def _add_vector_locked(self, doc_id: str, vector: np.ndarray) -> bool:
+        lock_fd = self._acquire_lock()
+        try:
+            return self._vector_index.add(doc_id, vector)
+        finally:
+            self._release_lock(lock_fd)
+
+    async def search_vector(self, query_vector: np.ndarray, limit: int = 10) -> List[Tuple[Dict, float]]:
+        """
+        Nearest cached pages to a query embedding.
+
+        Returns:
+            List of (full cached document, cosine similarity) tuples, best first
+        """
+        results = []
+        for doc_id, similarity in self._vector_index.search(query_vector, limit):
+            full_doc = self._read_json_file(self.cold_dir / f"{doc_id}.json")
+            if full_doc:
+                results.append((full_doc, similarity))
+        return results
+
+    @traced("cache.search_hybrid")
+    async def search_hybrid(self, query: str, query_vector: Optional[np.ndarray] = None,
+                            limit: int = 10) -> List[Tuple[Dict, Dict[str, float]]]:
+        """
+        Rank cached documents by reciprocal rank fusion of BM25 and vector search.
+
+        Args:
+            query: Search terms for BM25
+            query_vector: Query embedding (same model as the index); without it,
+                or with an empty index, only BM25 contributes
+            limit: Maximum number of results to return
+
+        Returns:
+            List of (full cached document, scores) tuples, best first. scores has
+            "rrf" (the fused score), "bm25" (normalized, see _BM25Index.score)
+            and "cosine"; a document missing from one ranking gets 0 for it.
+        """
+        depth = max(limit * 4, 20)
+        self._bm25_index.refresh()
+        rankings = {"bm25": self._bm25_index.score(query, depth)}
+        if query_vector is not None:
+            rankings["cosine"] = self._vector_index.search(query_vector, depth)
+
+        fused: Dict[str, Dict[str, float]] = {}
+        for name, ranking in rankings.items():
+            for rank, (doc_id, score) in enumerate(ranking, start=1):
+                scores = fused.setdefault(doc_id, {"rrf": 0.0, "bm25": 0.0, "cosine": 0.0})
+                scores["rrf"] += 1.0 / (self.RRF_K + rank)
+                scores[name] = score
+
+        results = []
+        for doc_id, scores in sorted(fused.items(), key=lambda x: x[1]["rrf"], reverse=True):
+            full_doc = self._read_json_file(self.cold_dir / f"{doc_id}.json")
+            if full_doc:
+                results.append((full_doc, scores))
+                if len(results) == limit:
+                    break
+        return results
+
+    def _embeddings_path(self, content: str, model_name: str) -> Path:
+        model_dir = re.sub(r'[^\w.-]', '_', model_name)
+        return self.embeddings_dir / model_dir / f"{self._compute_hash(content)}.npz"
+
+    def get_sentence_embeddings(self, content: str, model_name: str) -> Dict[int, np.ndarray]:
+        """
+        Get the cached sentence embeddings of a page.
+
+        Args:
+            content: Page content (embeddings are stored per content hash)
+            model_name: Embedding model the vectors were computed with
+
+        Returns:
+            {sentence index: float16 vector}, empty if nothing is cached
+        """
+        path = self._embeddings_path(content, model_name)
+        if not path.exists():
+            return {}
+        try:
+            with np.load(path) as stored:
+                return dict(zip(stored['ids'].tolist(), stored['vectors']))
+        except Exception:
+            return {}
+
+    def set_sentence_embeddings(self, content: str, model_name: str, embeddings: Dict[int, np.ndarray]) -> None:
+        """
+        Add sentence embeddings of a page to the cache, stored as float16.
+
+        Args:
+            content: Page content (embeddings are stored per content hash)
+            model_name: Embedding model the vectors were computed with
+            embeddings: {sentence index: vector}, merged with the cached ones
+        """
+        if not embeddings:
+            return
+        merged = self.get_sentence_embeddings(content, model_name)
+        merged.update(embeddings)
+
+        path = self._embeddings_path(content, model_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ids = sorted(merged)
+        # Write to a temporary file and rename so readers never see a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, ids=np.array(ids, dtype=np.int32),
+                 vectors=np.stack([merged[i] for i in ids]).astype(np.float16))
+        os.replace(tmp_path, path)
+
     async def invalidate(self, url: str) -> None:
         """
         Manually invalidate a cached URL.
@@ -479,11 +982,14 @@ class DiskJsonCache:
         """
         metadata = self._read_json_file(self.metadata_file) or {}
         hot_index = self._read_hot_index()
+        self._vector_index.refresh()
         
         return {
             'total_items': metadata.get('total_items', 0),
             'total_size': metadata.get('total_size', 0),
             'hot_items': len(hot_index),
+            'vector_items': len(self._vector_index),
+            'lookups': dict(self.lookups),
             'last_cleanup': metadata.get('last_cleanup', 0),
             'created_at': metadata.get('created_at', 0)
         }
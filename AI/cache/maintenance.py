@@ -91,6 +91,113 @@ def show_stats(cache_dir: str = "cache") -> None:
     print(f"  Created At: {stats['created_at']}")
 
 
+def analyze_pages(cache_dir: str = "cache") -> None:
+    """Store the current search_utils.analyze_page() output in cold records that lack it."""
+    from search_utils import analyze_page, tokenizer_name, ANALYSIS_VERSION
+
+    print("Analyzing cached pages...")
+    cache = DiskJsonCache(cache_dir)
+    cold_dir = Path(cache_dir) / "cold"
+
+    count = 0
+    for file_path in cold_dir.glob("*.json"):
+        data = cache._read_json_file(file_path)
+        if not data or not data.get('content'):
+            continue
+        stored = data.get('analysis', {})
+        if stored.get('version') == ANALYSIS_VERSION and stored.get('tokenizer') == tokenizer_name():
+            continue
+        try:
+            analysis = analyze_page(data['content'])
+        except Exception as e:
+            print(f"Warning: Could not analyze {file_path}: {e}")
+            continue
+        if analysis:
+            data['analysis'] = analysis
+            cache._write_json_file(file_path, data)
+            count += 1
+
+    print(f"Analyzed {count} pages.")
+
+
+def build_synonym_table(cache_dir: str = "cache", output: str = None, limit: int = 8) -> None:
+    """
+    Precompute WordNet synonyms for every term of the cached pages and write them
+    as a JSON table for KHOJ_SYNONYM_TABLE (terms without synonyms map to []).
+    """
+    from search_utils import nltk_ready, wordnet_synonyms, tokenize_text
+
+    if not nltk_ready():
+        print("Error: NLTK WordNet is required to build the synonym table.")
+        sys.exit(1)
+
+    print("Building synonym table...")
+    cache = DiskJsonCache(cache_dir)
+    cold_dir = Path(cache_dir) / "cold"
+
+    terms = set()
+    for file_path in cold_dir.glob("*.json"):
+        data = cache._read_json_file(file_path)
+        if not data:
+            continue
+        vocab = data.get('analysis', {}).get('vocab')
+        terms.update(vocab if vocab is not None else tokenize_text(data.get('content') or ''))
+
+    table = {term: wordnet_synonyms(term, limit) for term in sorted(terms)}
+    output = output or str(Path(cache_dir) / "synonyms.json")
+    with open(output, 'wb') as f:
+        f.write(orjson.dumps(table) if ORJSON_AVAILABLE else orjson.dumps(table).encode('utf-8'))
+
+    with_synonyms = sum(1 for synonyms in table.values() if synonyms)
+    print(f"Wrote {len(table)} terms ({with_synonyms} with synonyms) to {output}")
+
+
+def index_vectors(cache_dir: str = "cache", nlist: int = 0, batch_size: int = 32) -> None:
+    """
+    Add the cached pages missing from the vector index (embedded with the
+    search_utils embedding model) and, with nlist > 0, cluster the index into
+    nlist IVF lists so searches scan only part of it (about sqrt(pages) lists).
+    """
+    from search_utils import keybert_encoder, EMBEDDING_MODEL
+
+    print("Indexing page embeddings...")
+    cache = DiskJsonCache(cache_dir, embedder=keybert_encoder, embedding_model=EMBEDDING_MODEL)
+    index = cache._vector_index
+    index.refresh()
+    cold_dir = Path(cache_dir) / "cold"
+
+    pending = []
+    for file_path in cold_dir.glob("*.json"):
+        data = cache._read_json_file(file_path)
+        doc_id = (data or {}).get('hashes', {}).get('content_hash')
+        if doc_id and data.get('content') and doc_id not in index:
+            text = f"{data.get('title', '')}\n{data['content'][:cache.VECTOR_TEXT_CHARS]}"
+            pending.append((doc_id, text))
+
+    count = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        try:
+            vectors = keybert_encoder([text for _, text in batch])
+        except Exception as e:
+            print(f"Error: Could not embed pages: {e}")
+            sys.exit(1)
+        lock_fd = cache._acquire_lock()
+        try:
+            count += sum(index.add(doc_id, vector) for (doc_id, _), vector in zip(batch, vectors))
+        finally:
+            cache._release_lock(lock_fd)
+    print(f"Indexed {count} pages ({len(index)} in {cache.vector_dir}).")
+
+    if nlist:
+        lock_fd = cache._acquire_lock()
+        try:
+            index.train(nlist)
+        finally:
+            cache._release_lock(lock_fd)
+        print(f"Trained {nlist} IVF lists.")
+
+
 def vacuum_cache(cache_dir: str = "cache") -> None:
     """Perform full cache optimization."""
     print("Vacuuming cache...")
@@ -104,7 +211,7 @@ def main():
     parser = argparse.ArgumentParser(description="Cache maintenance utilities")
     parser.add_argument(
         "command",
-        choices=["cleanup", "reindex-bm25", "vacuum", "stats"],
+        choices=["cleanup", "reindex-bm25", "analyze", "synonyms", "index-vectors", "vacuum", "stats"],
         help="Maintenance command to execute"
     )
     parser.add_argument(
@@ -112,6 +219,16 @@ def main():
         default="cache",
         help="Cache directory path (default: cache)"
     )
+    parser.add_argument(
+        "--output",
+        help="Output path for the synonyms command (default: <cache-dir>/synonyms.json)"
+    )
+    parser.add_argument(
+        "--nlist",
+        type=int,
+        default=0,
+        help="IVF lists to train for the index-vectors command (default: 0, exact search)"
+    )
     
     args = parser.parse_args()
     
@@ -119,6 +236,12 @@ def main():
         cleanup_cache(args.cache_dir)
     elif args.command == "reindex-bm25":
         rebuild_bm25_index(args.cache_dir)
+    elif args.command == "analyze":
+        analyze_pages(args.cache_dir)
+    elif args.command == "synonyms":
+        build_synonym_table(args.cache_dir, args.output)
+    elif args.command == "index-vectors":
+        index_vectors(args.cache_dir, args.nlist)
     elif args.command == "vacuum":
         vacuum_cache(args.cache_dir)
     elif args.command == "stats":
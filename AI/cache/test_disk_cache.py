@@ -7,6 +7,7 @@ import sys
 import tempfile
 import asyncio
 import pytest
+import numpy as np
 from pathlib import Path
 
 # Add the parent directory to sys.path to enable importing cache modules
@@ -188,6 +189,180 @@ async def test_search(cache):
     assert "Python" in results[0]["content"] or "Python" in results[0]["title"]
 
 
+@pytest.mark.asyncio
+async def test_search_ranked(cache):
+    """Test BM25-ranked search."""
+    await cache.set("https://example.com/python", {
+        "url": "https://example.com/python",
+        "title": "Python Programming",
+        "content": "Python is a programming language. Python code is readable.",
+        "metadata": {}
+    })
+    await cache.set("https://example.com/js", {
+        "url": "https://example.com/js",
+        "title": "JavaScript",
+        "content": "JavaScript is a programming language for browsers",
+        "metadata": {}
+    })
+    await cache.set("https://example.com/failed", {
+        "url": "https://example.com/failed",
+        "title": "",
+        "content": "",
+        "metadata": {}
+    }, success=False)
+
+    results = await cache.search_ranked("python programming", limit=5)
+
+    # Best match first, both matching pages returned, empty pages skipped
+    assert [doc["url"] for doc, _ in results] == ["https://example.com/python", "https://example.com/js"]
+    assert 0 < results[1][1] < results[0][1] <= 1
+
+    # No overlap, no results
+    assert await cache.search_ranked("kubernetes", limit=5) == []
+
+
+@pytest.mark.asyncio
+async def test_search_ranked_sees_new_documents(cache):
+    """Test that documents added after the first search are indexed incrementally."""
+    await cache.set("https://example.com/a", {
+        "url": "https://example.com/a", "title": "A", "content": "alpha content", "metadata": {}
+    })
+    assert len(await cache.search_ranked("beta", limit=5)) == 0
+
+    await cache.set("https://example.com/b", {
+        "url": "https://example.com/b", "title": "B", "content": "beta content", "metadata": {}
+    })
+    results = await cache.search_ranked("beta", limit=5)
+    assert [doc["url"] for doc, _ in results] == ["https://example.com/b"]
+
+
+@pytest.mark.asyncio
+async def test_analyzer_output_is_stored(temp_cache_dir):
+    """Test that the analyzer hook result is stored with new pages."""
+    calls = []
+
+    def analyzer(content):
+        calls.append(content)
+        return {"version": 1, "words": len(content.split())}
+
+    cache = DiskJsonCache(temp_cache_dir, analyzer=analyzer)
+    url = "https://example.com/analyzed"
+    await cache.set(url, {"url": url, "title": "A", "content": "four words of content", "metadata": {}})
+    await cache.set(url + "/copy", {"url": url + "/copy", "title": "A", "content": "four words of content", "metadata": {}})
+
+    retrieved = await cache.get(url)
+    assert retrieved["analysis"] == {"version": 1, "words": 4}
+    # Deduplicated content is analyzed once
+    assert len(calls) == 1
+
+
+def test_sentence_embeddings_roundtrip(cache):
+    """Test that sentence embeddings are stored as float16 per content and merged."""
+    content = "First sentence. Second sentence."
+    assert cache.get_sentence_embeddings(content, "model") == {}
+
+    cache.set_sentence_embeddings(content, "model", {1: np.array([0.5, 0.25, 1.0])})
+    cache.set_sentence_embeddings(content, "model", {0: np.array([1.0, 0.0, 0.0])})
+
+    stored = cache.get_sentence_embeddings(content, "model")
+    assert sorted(stored) == [0, 1]
+    assert stored[1].dtype == np.float16
+    assert stored[1].tolist() == [0.5, 0.25, 1.0]
+    assert cache.get_sentence_embeddings(content, "other-model") == {}
+    assert cache.get_sentence_embeddings("Other content.", "model") == {}
+
+
+# Fake embedder: words of the same topic share a dimension
+TOPICS = {"car": 0, "automobile": 0, "engine": 0, "banana": 1, "fruit": 1, "python": 2, "code": 2}
+
+
+def topic_embedder(texts):
+    vectors = np.full((len(texts), 4), 0.01)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, TOPICS.get(word.strip(".,"), 3)] += 1
+    return vectors
+
+
+@pytest.mark.asyncio
+async def test_vector_index_hybrid_search(temp_cache_dir):
+    """Test that set() indexes page embeddings and hybrid search fuses them with BM25."""
+    cache = DiskJsonCache(temp_cache_dir, embedder=topic_embedder, embedding_model="topics")
+    pages = {
+        "https://example.com/cars": "The automobile engine of this car is quiet.",
+        "https://example.com/fruit": "A banana is a fruit.",
+        "https://example.com/code": "Python code is readable.",
+    }
+    for url, content in pages.items():
+        await cache.set(url, {"url": url, "title": "Page", "content": content, "metadata": {}})
+    # Duplicate content is embedded once
+    await cache.set("https://example.com/cars2", {"url": "https://example.com/cars2", "title": "Page",
+                                                  "content": pages["https://example.com/cars"], "metadata": {}})
+    assert (Path(temp_cache_dir) / "vector_index" / "topics" / "vectors.f16").exists()
+
+    # Another instance (e.g. another worker) reads the same index
+    reader = DiskJsonCache(temp_cache_dir, embedding_model="topics")
+    assert reader.stats()["vector_items"] == 3
+    nearest = await reader.search_vector(topic_embedder(["fruit"])[0], limit=1)
+    assert nearest[0][0]["url"] == "https://example.com/fruit"
+    assert nearest[0][1] > 0.4
+
+    # "vehicle" matches no page lexically, the embedding still finds the car page
+    ranked = await reader.search_hybrid("car vehicle", topic_embedder(["car"])[0], limit=2)
+    assert ranked[0][0]["url"] == "https://example.com/cars"
+    assert ranked[0][1]["bm25"] > 0 and ranked[0][1]["cosine"] > 0.4
+    ranked = await reader.search_hybrid("vehicle", topic_embedder(["automobile"])[0], limit=2)
+    assert ranked[0][0]["url"] == "https://example.com/cars"
+    assert ranked[0][1]["bm25"] == 0
+
+    # Without a query vector only BM25 ranks
+    ranked = await reader.search_hybrid("banana", limit=5)
+    assert [page["url"] for page, _ in ranked] == ["https://example.com/fruit"]
+
+
+@pytest.mark.asyncio
+async def test_index_vector_waits_for_lock_off_the_event_loop(temp_cache_dir):
+    """Test that indexing waits for a lock held by maintenance without blocking the event loop."""
+    import threading
+    import time
+
+    cache = DiskJsonCache(temp_cache_dir, embedder=topic_embedder, embedding_model="topics")
+    lock_fd = cache._acquire_lock()  # e.g. `maintenance index-vectors` training IVF lists
+    threading.Timer(0.3, cache._release_lock, (lock_fd,)).start()
+
+    indexing = asyncio.create_task(cache.index_vector("doc", "Page", "A banana is a fruit."))
+    longest_gap, last = 0.0, time.perf_counter()
+    while not indexing.done():
+        await asyncio.sleep(0.01)
+        now = time.perf_counter()
+        longest_gap, last = max(longest_gap, now - last), now
+    assert indexing.result()
+    assert longest_gap < 0.15
+    assert cache.stats()["vector_items"] == 1
+
+
+def test_vector_index_ivf(temp_cache_dir):
+    """Test that IVF search finds the same neighbours as the exact scan and covers new rows."""
+    from cache.disk_cache import _VectorIndex
+
+    rng = np.random.RandomState(0)
+    centers = rng.normal(size=(4, 16))
+    index = _VectorIndex(Path(temp_cache_dir) / "vectors")
+    for i in range(200):
+        index.add(f"doc{i}", centers[i % 4] + rng.normal(scale=0.1, size=16))
+    assert not index.add("doc0", centers[0])
+    query = centers[1] + rng.normal(scale=0.1, size=16)
+    exact = index.search(query, 5)
+
+    index.train(nlist=4)
+    assert index.search(query, 5, nprobe=4) == exact
+    assert all(int(doc[3:]) % 4 == 1 for doc, _ in index.search(query, 5, nprobe=1))
+
+    index.add("new", centers[2])
+    assert index.search(centers[2], 1, nprobe=1)[0][0] == "new"
+    assert len(_VectorIndex(Path(temp_cache_dir) / "vectors").search(centers[2], 1)) == 1
+
+
 @pytest.mark.asyncio
 async def test_invalidate(cache):
     """Test manual cache invalidation."""
@@ -0,0 +1,205 @@
+"""
+In-process scheduler for LLM calls.
+
+Ollama runs a limited number of requests per model in parallel and queues the
+rest internally, first come first served, so a burst of query-generation calls
+delays every answer being streamed. Calls here take one of LLM_SLOTS slots
+(match the server's OLLAMA_NUM_PARALLEL) and wait in a priority queue:
+streamed answers first, then non-streamed answers, then the query-generation
+calls of prompt_analyzer_llm. When LLM_MAX_QUEUE calls are already waiting,
+new ones are rejected at once with LLMQueueFull instead of timing out later.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from typing import AsyncIterator, Dict, Optional
+
+LLM_SLOTS = int(os.getenv("LLM_SLOTS", os.getenv("OLLAMA_NUM_PARALLEL", "4")))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+
+# Lower runs first
+PRIORITY_STREAM = 0
+PRIORITY_RESPONSE = 1
+PRIORITY_QUERY_GENERATION = 2
+
+
+class LLMQueueFull(Exception):
+    """Raised when a call is submitted while LLM_MAX_QUEUE calls are waiting."""
+
+
+class LLMTicket:
+    """A call's place in the scheduler: queued, then holding a slot until released."""
+
+    def __init__(self, scheduler: "LLMScheduler", priority: int, seq: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.seq = seq
+        self.submitted_at = time.perf_counter()
+        self.granted_at: Optional[float] = None
+        self.released = False
+        self._wake = asyncio.Event()
+
+    def __lt__(self, other: "LLMTicket") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    @property
+    def granted(self) -> bool:
+        return self.granted_at is not None
+
+    async def wait(self) -> None:
+        """Wait until the ticket holds a slot."""
+        while not self.granted:
+            self._wake.clear()
+            await self._wake.wait()
+
+    async def positions(self) -> AsyncIterator[int]:
+        """Yield the 1-based queue position whenever it changes, until a slot is granted."""
+        last = None
+        while not self.granted:
+            self._wake.clear()
+            position = self.scheduler.position(self)
+            if position != last:
+                last = position
+                yield position
+                continue
+            await self._wake.wait()
+
+    def release(self) -> None:
+        """Free the slot, or leave the queue if still waiting (idempotent)."""
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self)
+
+
+class LLMScheduler:
+    """
+    Priority queue in front of a fixed number of LLM slots.
+
+    Args:
+        slots: Calls allowed to run at once
+        max_queue: Calls allowed to wait, further submissions raise LLMQueueFull
+    """
+
+    def __init__(self, slots: int = LLM_SLOTS, max_queue: int = LLM_MAX_QUEUE):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._counters = {"submitted": 0, "rejected": 0, "completed": 0}
+        self._avg_wait_ms = 0.0
+        self._avg_service_ms = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def is_full(self) -> bool:
+        """Whether a call submitted now would be rejected."""
+        return self.active >= self.slots and len(self._queue) >= self.max_queue
+
+    def position(self, ticket: LLMTicket) -> int:
+        """1-based position of a waiting ticket (0 once it holds a slot)."""
+        if ticket.granted:
+            return 0
+        return sum(1 for other in self._queue if other < ticket) + 1
+
+    def estimated_wait_ms(self, position: int) -> float:
+        """Rough wait for a queue position from the average call duration."""
+        return position * self._avg_service_ms / max(self.slots, 1)
+
+    def check_capacity(self) -> None:
+        """
+        Reject early, e.g. before doing the work that leads to an LLM call.
+
+        Raises:
+            LLMQueueFull: if max_queue calls are already waiting (counted as a rejection)
+        """
+        if self.is_full():
+            self._counters["rejected"] += 1
+            raise LLMQueueFull(f"{len(self._queue)} LLM calls already waiting")
+
+    def submit(self, priority: int) -> LLMTicket:
+        """
+        Queue a call. The ticket holds a slot right away if one is free.
+
+        Raises:
+            LLMQueueFull: if max_queue calls are already waiting
+        """
+        self.check_capacity()
+        self._counters["submitted"] += 1
+        ticket = LLMTicket(self, priority, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        self._grant()
+        return ticket
+
+    def slot(self, priority: int) -> "_Slot":
+        """Context manager holding a slot: `async with scheduler.slot(PRIORITY_...):`."""
+        return _Slot(self, priority)
+
+    def _grant(self) -> None:
+        changed = False
+        while self._queue and self.active < self.slots:
+            ticket = heapq.heappop(self._queue)
+            ticket.granted_at = time.perf_counter()
+            wait_ms = (ticket.granted_at - ticket.submitted_at) * 1000
+            self._avg_wait_ms = 0.9 * self._avg_wait_ms + 0.1 * wait_ms
+            self.active += 1
+            ticket._wake.set()
+            changed = True
+        if changed:
+            # Positions moved up
+            for ticket in self._queue:
+                ticket._wake.set()
+
+    def _release(self, ticket: LLMTicket) -> None:
+        if ticket.granted:
+            self.active -= 1
+            self._counters["completed"] += 1
+            service_ms = (time.perf_counter() - ticket.granted_at) * 1000
+            self._avg_service_ms = service_ms if not self._avg_service_ms else (
+                0.9 * self._avg_service_ms + 0.1 * service_ms)
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            for other in self._queue:
+                other._wake.set()
+        self._grant()
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and counters, for logs and metrics."""
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            **self._counters,
+            "avg_wait_ms": round(self._avg_wait_ms, 1),
+            "avg_service_ms": round(self._avg_service_ms, 1),
+        }
+
+
+class _Slot:
+    def __init__(self, scheduler: LLMScheduler, priority: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.ticket = None
+
+    async def __aenter__(self) -> LLMTicket:
+        self.ticket = self.scheduler.submit(self.priority)
+        try:
+            await self.ticket.wait()
+        except BaseException:
+            self.ticket.release()
+            raise
+        return self.ticket
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.ticket.release()
+
+
+# Shared by ai_orchestrator and prompt_analyzer_llm
+llm_scheduler = LLMScheduler()
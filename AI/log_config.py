@@ -0,0 +1,187 @@
+"""
+Structured, non-blocking logging for the pipeline.
+
+Modules log through get_logger(__name__) with %-style arguments, so messages
+below a logger's level cost one level check and are never formatted. Records
+that pass are put on an in-memory queue and written by a background thread
+(logging.handlers.QueueListener): a request never waits on stdout. When the
+queue is full, records are dropped and counted instead of blocking.
+
+Configured from the environment:
+    LOG_LEVEL=INFO                            default level
+    LOG_LEVELS=scrape_util=DEBUG,web_search=WARNING  per-module levels
+    LOG_FORMAT=text                           or json, one object per line
+    LOG_QUEUE_SIZE=10000                      records waiting to be written
+
+Keyword fields passed as extra={...} are rendered as key=value pairs (text) or
+JSON keys, and records logged inside a traced span carry its trace id.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from tracing import current_span
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Libraries that log every HTTP request or extraction at INFO; LOG_LEVELS overrides these
+DEFAULT_LEVELS = "httpx=WARNING,httpcore=WARNING,urllib3=WARNING,trafilatura=WARNING"
+
+# Attributes of every LogRecord; anything else on a record came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+
+def _level_number(name: str) -> Optional[int]:
+    level = logging.getLevelName(name.strip().upper())
+    return level if isinstance(level, int) else None
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """
+    Parse per-module levels.
+
+    Args:
+        spec: Comma-separated logger=LEVEL pairs, e.g. "scrape_util=DEBUG,cache=WARNING"
+
+    Returns:
+        Dict of logger name to level number, invalid entries skipped
+    """
+    levels = {}
+    for entry in spec.split(","):
+        name, _, level = entry.partition("=")
+        level_number = _level_number(level)
+        if name.strip() and level_number is not None:
+            levels[name.strip()] = level_number
+    return levels
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """`time LEVEL logger: message key=value ...`"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if getattr(record, "trace_id", None):
+            fields["trace_id"] = record.trace_id
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, extra fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them and without
+    ever blocking: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener formats the record; only the caller's trace context is captured here
+        trace = current_span().trace
+        record.trace_id = trace.trace_id if trace else None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_setup_lock = threading.RLock()
+
+
+def setup_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT,
+                  stream=None) -> None:
+    """
+    Route the root logger through the queue to stdout; calling it again reconfigures.
+
+    Args:
+        level: Default level name
+        levels: Per-module levels, see parse_levels()
+        fmt: "text" or "json"
+        stream: Where the listener writes (default sys.stdout)
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        root = logging.getLogger()
+        if _listener is not None:
+            _listener.stop()
+            root.removeHandler(_queue_handler)
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _listener = QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+
+        root.addHandler(_queue_handler)
+        root.setLevel(_level_number(level) or logging.INFO)
+        for name, module_level in parse_levels(f"{DEFAULT_LEVELS},{levels}").items():
+            logging.getLogger(name).setLevel(module_level)
+
+
+def flush_logging() -> None:
+    """Write every queued record and stop the listener thread (called at exit)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().removeHandler(_queue_handler)
+
+
+def dropped_records() -> int:
+    """Records dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    """The logger for a module, setting up logging on first use."""
+    if _listener is None:
+        with _setup_lock:
+            if _listener is None:
+                setup_logging()
+    return logging.getLogger(name)
+
+
+atexit.register(flush_logging)
@@ -0,0 +1,240 @@
+"""
+Cross-page passage ranking for the LLM context.
+
+search_and_extract ranks sentences with each page's own BM25 statistics, so
+scores from different pages are not comparable. The ranker pools the candidate
+sentences of every source found for a prompt and rescores them with BM25 over
+corpus-level statistics (all sentences of all pages scored against the shared
+RelevanceQuery). It then drops near-duplicate passages with MinHash and keeps
+the best passages that fit CONTEXT_TOKEN_BUDGET (sized for the model's context
+window, source headers and separators included). build_context renders the
+kept passages as the LLM context.
+"""
+
+import os
+import re
+import math
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import xxhash
+
+from search_utils import RelevanceQuery, tokenize_text, semantic_boost
+from tracing import traced
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# Passages handed to the LLM
+MAX_PASSAGES = int(os.getenv("MAX_PASSAGES", "12"))
+# Estimated Jaccard similarity of word shingles above which passages are duplicates
+DEDUP_THRESHOLD = float(os.getenv("PASSAGE_DEDUP_THRESHOLD", "0.7"))
+# Approximate token budget of the whole rendered context (headers and separators included)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+SOURCE_SEPARATOR = "\n---\n"
+
+# MinHash: h(x) = (a * x + b) mod p over 32-bit shingle hashes, fixed seed so
+# signatures are stable across processes
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 3
+_MINHASH_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(1)
+_MINHASH_A = _rng.randint(1, 1 << 31, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+_MINHASH_B = _rng.randint(0, 1 << 31, size=MINHASH_PERMUTATIONS).astype(np.uint64)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap LLM token estimate (about 4 characters per token for English text)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of the word shingles of a passage."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) > SHINGLE_SIZE:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    else:
+        shingles = {" ".join(words)}
+    hashes = np.fromiter((xxhash.xxh32_intdigest(shingle.encode("utf-8")) for shingle in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    return ((hashes[:, None] * _MINHASH_A + _MINHASH_B) % _MINHASH_PRIME).min(axis=0)
+
+
+def estimated_jaccard(signature_a: np.ndarray, signature_b: np.ndarray) -> float:
+    """Jaccard similarity estimated from two MinHash signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+
+def pool_passages(information: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Flatten the relevant sentences of every source into passage records."""
+    passages = []
+    for info in information:
+        for sentence, score, metadata in info['relevant_sentences']:
+            passages.append({
+                "sentence": sentence,
+                "page_score": float(score),
+                "metadata": metadata,
+                "source": info
+            })
+    return passages
+
+
+def corpus_bm25(passages: List[Dict[str, Any]], query: RelevanceQuery,
+                k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """
+    BM25 of each passage with IDF and average length taken from the corpus
+    statistics collected by the query, or from the passages themselves if the
+    query has not scored any page.
+    """
+    tokenized = [tokenize_text(passage["sentence"]) for passage in passages]
+
+    if query.corpus_sentences:
+        n_sentences = query.corpus_sentences
+        avgdl = query.corpus_tokens / n_sentences
+        doc_freqs = query.corpus_doc_freqs
+    else:
+        n_sentences = len(tokenized)
+        avgdl = sum(len(tokens) for tokens in tokenized) / max(n_sentences, 1)
+        doc_freqs = Counter(term for tokens in tokenized for term in set(tokens))
+
+    # Smoothed IDF, always positive (terms in most sentences still count a little)
+    idf = {
+        term: math.log(1 + (n_sentences - doc_freqs.get(term, 0) + 0.5) / (doc_freqs.get(term, 0) + 0.5))
+        for term in set(query.tokenized_query)
+    }
+
+    scores = np.zeros(len(passages))
+    for i, tokens in enumerate(tokenized):
+        counts = Counter(tokens)
+        length_norm = k1 * (1 - b + b * len(tokens) / avgdl) if avgdl else k1
+        for term in query.tokenized_query:
+            tf = counts.get(term)
+            if tf:
+                scores[i] += idf[term] * tf * (k1 + 1) / (tf + length_norm)
+    return scores
+
+
+@traced("passages.rank")
+def rank_passages(
+        information: List[Dict[str, Any]],
+        query: RelevanceQuery,
+        max_passages: int = MAX_PASSAGES,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+        bm25_weight: float = 1.0,
+        keyword_weight: float = 2.0,
+        expansion_weight: float = 0.5,
+        entity_weight: float = 1.5
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Pick the best passages across all sources for the LLM context.
+
+    Passages are scored like extract_relevant_information, with the page-local
+    BM25 replaced by corpus-level BM25 (and the semantic boost, if the page was
+    reranked, recomputed on the pooled scores), then taken greedily in score order,
+    skipping near-duplicates of passages already taken and passages whose text
+    (plus their source's header and separator, for a source's first passage)
+    no longer fits the token budget. This is the only deduplication and
+    budget stage: build_context renders what is kept as is.
+
+    Args:
+        information: search_and_extract results (url, title, relevant_sentences, ...)
+        query: The RelevanceQuery the pages were scored against
+        max_passages: Maximum number of passages to keep
+        token_budget: Approximate token budget (see estimate_tokens) of the rendered context
+        dedup_threshold: Estimated Jaccard similarity above which a passage is a duplicate
+
+    Returns:
+        (information, stats): the sources of the kept passages, ordered by their
+        best passage, each with its kept passages as relevant_sentences in rank
+        order; stats with budget, candidates, passages, tokens, duplicates,
+        trimmed_sentences and trimmed_tokens (the estimated tokens left out)
+    """
+    passages = pool_passages(information)
+    stats = {"budget": token_budget, "candidates": len(passages), "passages": 0, "tokens": 0,
+             "duplicates": 0, "trimmed_sentences": 0, "trimmed_tokens": 0}
+    if not passages:
+        return [], stats
+
+    global_bm25 = corpus_bm25(passages, query)
+    lexical_scores = np.array([
+        global_bm25[i] * bm25_weight +
+        passage["metadata"].get("original_matches", 0) * keyword_weight +
+        passage["metadata"].get("expanded_matches", 0) * expansion_weight +
+        passage["metadata"].get("entity_overlap", 0) * entity_weight
+        for i, passage in enumerate(passages)
+    ])
+    # Passages the semantic reranker scored keep their boost, on the pooled scale
+    similarities = np.array([passage["metadata"].get("semantic_score", 0.0) for passage in passages])
+    final_scores = lexical_scores + semantic_boost(lexical_scores, similarities)
+
+    selected = []
+    signatures = []
+    sources_used = set()
+    used_tokens = 0
+    for i in np.argsort(-final_scores, kind='stable'):
+        if len(selected) >= max_passages:
+            break
+        passage = passages[i]
+
+        signature = minhash_signature(passage["sentence"])
+        if any(estimated_jaccard(signature, kept) >= dedup_threshold for kept in signatures):
+            stats["duplicates"] += 1
+            continue
+
+        source = passage["source"]
+        cost = estimate_tokens(passage["sentence"])
+        if source["url"] not in sources_used:
+            cost += estimate_tokens(f"Source: {source['title']} ({source['url']})")
+            if sources_used:
+                cost += estimate_tokens(SOURCE_SEPARATOR)
+        if used_tokens + cost > token_budget:
+            stats["trimmed_sentences"] += 1
+            stats["trimmed_tokens"] += estimate_tokens(passage["sentence"])
+            continue
+
+        used_tokens += cost
+        sources_used.add(source["url"])
+        signatures.append(signature)
+        metadata = dict(passage["metadata"], corpus_bm25=round(float(global_bm25[i]), 3))
+        selected.append((source, (passage["sentence"], float(final_scores[i]), metadata)))
+
+    # Regroup by source, sources ordered by their best passage
+    ranked_information = []
+    by_url = {}
+    for source, passage in selected:
+        if source["url"] not in by_url:
+            by_url[source["url"]] = dict(source, relevant_sentences=[])
+            ranked_information.append(by_url[source["url"]])
+        by_url[source["url"]]["relevant_sentences"].append(passage)
+
+    stats["passages"] = len(selected)
+    stats["tokens"] = used_tokens
+    logger.info("Passage ranking: kept %d of %d passages (~%d of %d tokens, %d duplicates, %d trimmed)",
+                stats['passages'], stats['candidates'], used_tokens, token_budget, stats['duplicates'],
+                stats['trimmed_sentences'])
+    return ranked_information, stats
+
+
+def build_context(information: List[Dict[str, Any]]) -> str:
+    """
+    Render ranked sources and their relevant sentences as LLM context.
+
+    Sources and sentences are rendered in their given order, which for
+    rank_passages output is relevance order within CONTEXT_TOKEN_BUDGET:
+
+        Source: <title> (<url>)
+        <sentence>
+        ...
+        ---
+        Source: ...
+
+    Args:
+        information: Sources with url, title and relevant_sentences (sentence, score, metadata)
+    """
+    context_parts = []
+    for info in information:
+        sentences = "\n".join(sentence for sentence, _, _ in info['relevant_sentences'])
+        context_parts.append(f"Source: {info['title']} ({info['url']})\n{sentences}\n")
+    return SOURCE_SEPARATOR.join(context_parts)
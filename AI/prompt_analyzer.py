@@ -17,6 +17,10 @@ from typing import List, Dict, Any
 from colorama import Fore, Style, init
 import threading
 
+from tracing import span
+from log_config import get_logger
+from query_router import generate_search_queries
+
 # ------------------------------------------------------------
 # Optional: pre-initialize CUDA (non-blocking)
 # ------------------------------------------------------------
@@ -38,6 +42,8 @@ try:
 except Exception:
     patterns = {}
 
+logger = get_logger(__name__)
+
 # Define intents that require web search
 SEARCH_REQUIRED_INTENTS = ["web_search", "question_answering", "explanation", "research", "translation"]
 
@@ -97,9 +103,10 @@ def _debug(msg: str, colour: str = Fore.CYAN) -> None:
 
 def _time_step(label: str, func, *args, **kwargs):
     start = time.perf_counter()
-    result = func(*args, **kwargs)
+    with span("analysis.step", step=label):
+        result = func(*args, **kwargs)
     duration = (time.perf_counter() - start) * 1000
-    print(Fore.YELLOW + f"⏱ {label}: {duration:.2f} ms" + Style.RESET_ALL)
+    logger.debug("%s: %.2f ms", label, duration)
     return result
 
 
@@ -187,65 +194,7 @@ def analyze_legacy(prompt: str, debug: bool = False) -> Dict[str, Any]:
     # --------------------------------------------------------------
     # 5. Generate search queries (based only on the cleaned prompt)
     # --------------------------------------------------------------
-    search_queries = []
-    # Generate more effective search queries
-    keyword_terms = [k["term"] for k in keywords[:5]]
-    
-    # For question answering, create more targeted queries
-    if "question_answering" in intents:
-        # Create specific queries focused on the key information needed
-        if keyword_terms:
-            # Try combinations that are more likely to find specific answers
-            search_queries.append(" ".join(keyword_terms[:3]))  # e.g., "chief advisor bangladesh government"
-            search_queries.append(f"who is {' '.join(keyword_terms[:2])}")  # e.g., "who is chief advisor bangladesh"
-            search_queries.append(f"{keyword_terms[0]} {keyword_terms[2]}")  # e.g., "July Revolution chief advisor"
-            
-        # Add the original question without the "Tell me" part for better search results
-        if cleaned_prompt.lower().startswith("tell me"):
-            search_queries.append(cleaned_prompt[8:])  # Remove "Tell me "
-        else:
-            search_queries.append(cleaned_prompt)
-    elif "translation" in intents:
-        # For translation tasks, focus on language pairs and context
-        if keyword_terms:
-            search_queries.append(" ".join(keyword_terms[:3]))
-            search_queries.append(f"translate {' '.join(keyword_terms[:3])}")
-            search_queries.append(f"meaning {' '.join(keyword_terms[:2])}")
-            
-        # Add the original prompt
-        search_queries.append(cleaned_prompt)
-    else:
-        # Add the original prompt as the first query
-        search_queries.append(cleaned_prompt)
-        
-        # Add keyword combinations
-        if keyword_terms:
-            # Add a simple combination of top keywords
-            search_queries.append(" ".join(keyword_terms[:3]))
-            
-            # Add individual important keywords
-            for term in keyword_terms[:3]:
-                if term not in search_queries:
-                    search_queries.append(term)
-        
-        # Add intent-based queries for non-question intents
-        for intent in intents[:2]:
-            if intent not in ["question_answering", "translation"] and keyword_terms:  # Skip for question answering and translation
-                intent_query = f"{intent} {' '.join(keyword_terms[:3])}"
-                if len(intent_query) < 100:  # Only add if not too long
-                    search_queries.append(intent_query)
-    
-    # Deduplicate while preserving order and reasonable length
-    seen_queries = set()
-    unique_queries = []
-    for q in search_queries:
-        # Check if query is valid (not empty, not too long)
-        if q and len(q.strip()) > 0 and len(q) < 150:
-            clean_q = q.strip()
-            if clean_q not in seen_queries:
-                seen_queries.add(clean_q)
-                unique_queries.append(clean_q)
-    search_queries = unique_queries[:5]
+    search_queries = generate_search_queries(cleaned_prompt, intents, keywords)
 
     total_time = (time.perf_counter() - total_start) * 1000
     if debug:
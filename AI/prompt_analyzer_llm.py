@@ -14,6 +14,14 @@ from keybert import KeyBERT
 import spacy
 from spacy.matcher import Matcher
 
+from llm_scheduler import llm_scheduler, PRIORITY_QUERY_GENERATION
+from tracing import span
+from log_config import get_logger
+from query_router import (route_prompt, record_route, generate_search_queries,
+                          ROUTE_SKIP, ROUTE_DETERMINISTIC)
+
+logger = get_logger(__name__)
+
 # Try importing user-defined intent patterns
 try:
     from patterns import patterns  # dict: intent_name -> list[pattern]
@@ -39,6 +47,7 @@ INTENT_LIST = [
 
 # —————————————————— LAZY SINGLETONS (no double init!) ——————————————————
 _ollama_client = None
+_ollama_async_client = None
 _kw_model = None
 _nlp = None
 _matcher = None
@@ -60,6 +69,13 @@ def get_ollama():
                     _ollama_client = None
     return _ollama_client
 
+def get_ollama_async():
+    """Async client for generation calls, once get_ollama() has reached the server."""
+    global _ollama_async_client
+    if _ollama_async_client is None and get_ollama() is not None:
+        _ollama_async_client = ollama.AsyncClient()
+    return _ollama_async_client
+
 def get_keybert():
     global _kw_model
     if _kw_model is None:
@@ -94,51 +110,10 @@ def _hash_prompt(prompt: str, keywords: List[Dict], intents: List[str]) -> str:
     content = f"{prompt}|{json.dumps(keywords)}|{json.dumps(intents)}"
     return hashlib.md5(content.encode()).hexdigest()
 
-# ———————————————————————— MAIN ANALYZER ————————————————————————
-async def analyze_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
-    start_time = time.perf_counter()
-
-    # Clean prompt
-    cleaned = prompt.strip()
-    if cleaned.lower().startswith(("user:", "ai:")):
-        cleaned = cleaned.split(":", 1)[1].strip()
-
-    # 1. Intent detection using spaCy patterns (legacy approach) and KeyBERT keywords (fast & deterministic)
-    # Run both operations concurrently for better performance
-    
-    async def get_spacy_results():
-        nlp, matcher = get_spacy_pipeline()
-        doc = nlp(cleaned.lower())
-        matches = matcher(doc)
-        intents = list({nlp.vocab.strings[mid] for mid, _, _ in matches}) or ["casual_chat"]
-        return nlp, doc, intents
-    
-    async def get_keybert_results():
-        kw_model = get_keybert()
-        if kw_model:
-            raw_kws = kw_model.extract_keywords(
-                cleaned,
-                keyphrase_ngram_range=(1, 3),
-                stop_words="english",
-                use_mmr=True,
-                diversity=0.5,
-                top_n=20
-            )
-            keywords = [{"term": k, "score": round(s, 4)} for k, s in raw_kws][:TOP_KEYWORDS]
-            return keywords
-        else:
-            return []
-    
-    # Run both operations concurrently
-    spacy_task = get_spacy_results()
-    keybert_task = get_keybert_results()
-    
-    # Wait for results
-    nlp, doc, intents = await spacy_task
-    keywords = await keybert_task
-
-    # 3. LLM call for search queries only (single, safe, no double client)
-    client = get_ollama()
+async def _generate_llm_queries(cleaned: str, keywords: List[Dict], intents: List[str],
+                                debug: bool = False) -> Dict[str, Any]:
+    """Ask the LLM for search queries (single, safe, no double client), with a prompt-keyed cache."""
+    client = get_ollama_async()
     if not client:
         raise RuntimeError("Ollama not available")
 
@@ -166,17 +141,20 @@ CRITICAL INSTRUCTIONS:
 Respond ONLY with the JSON object:'''
 
         try:
-            response = client.chat(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user",   "content": f"Generate search queries for: {cleaned}"}
-                ],
-                options={
-                    "temperature": 0.0,
-                    "num_predict": 500,
-                }
-            )
+            # Lowest LLM priority: streamed answers go first
+            async with llm_scheduler.slot(PRIORITY_QUERY_GENERATION):
+                with span("llm.query_generation", model=MODEL_NAME):
+                    response = await client.chat(
+                        model=MODEL_NAME,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user",   "content": f"Generate search queries for: {cleaned}"}
+                        ],
+                        options={
+                            "temperature": 0.0,
+                            "num_predict": 500,
+                        }
+                    )
             raw_json = response["message"]["content"].strip()
 
             # Clean possible markdown
@@ -205,6 +183,67 @@ Respond ONLY with the JSON object:'''
                 "search_queries": [cleaned] if len(cleaned.split()) > 3 else [f"what is {cleaned}"]
             }
 
+    return data
+
+# ———————————————————————— MAIN ANALYZER ————————————————————————
+async def analyze_prompt(prompt: str, debug: bool = False) -> Dict[str, Any]:
+    start_time = time.perf_counter()
+
+    # Clean prompt
+    cleaned = prompt.strip()
+    if cleaned.lower().startswith(("user:", "ai:")):
+        cleaned = cleaned.split(":", 1)[1].strip()
+
+    # 1. Intent detection using spaCy patterns (legacy approach) and KeyBERT keywords (fast & deterministic)
+    # Run both operations concurrently for better performance
+    
+    async def get_spacy_results():
+        nlp, matcher = get_spacy_pipeline()
+        doc = nlp(cleaned.lower())
+        matches = matcher(doc)
+        intents = list({nlp.vocab.strings[mid] for mid, _, _ in matches}) or ["casual_chat"]
+        return nlp, doc, intents
+    
+    async def get_keybert_results():
+        kw_model = get_keybert()
+        if kw_model:
+            raw_kws = kw_model.extract_keywords(
+                cleaned,
+                keyphrase_ngram_range=(1, 3),
+                stop_words="english",
+                use_mmr=True,
+                diversity=0.5,
+                top_n=20
+            )
+            keywords = [{"term": k, "score": round(s, 4)} for k, s in raw_kws][:TOP_KEYWORDS]
+            return keywords
+        else:
+            return []
+    
+    # Run both operations concurrently
+    spacy_task = get_spacy_results()
+    keybert_task = get_keybert_results()
+    
+    # Wait for results
+    with span("analysis.intents"):
+        nlp, doc, intents = await spacy_task
+    with span("analysis.keywords"):
+        keywords = await keybert_task
+
+    # 3. Search queries: skipped without a search intent, deterministic when
+    #    the intents are confident, otherwise generated by the LLM
+    route, confidence = route_prompt(cleaned, intents, keywords)
+    record_route(route)
+    with span("analysis.route", route=route, confidence=round(confidence, 2)):
+        if route == ROUTE_SKIP:
+            search_queries = []
+        elif route == ROUTE_DETERMINISTIC:
+            search_queries = generate_search_queries(cleaned, intents, keywords, MAX_SEARCH_QUERIES)
+        else:
+            data = await _generate_llm_queries(cleaned, keywords, intents, debug)
+            search_queries = data.get("search_queries", [cleaned])[:MAX_SEARCH_QUERIES]
+    logger.debug("Query route: %s (confidence %.2f, intents %s)", route, confidence, intents)
+
     # Generate goals using rule-based approach (similar to legacy)
     goals = []
     for sent in doc.sents:
@@ -244,7 +283,8 @@ Respond ONLY with the JSON object:'''
         "intents": intents,
         "keywords": keywords or [{"term": w, "score": 1.0} for w in cleaned.split()[:8]],
         "goals": goals,
-        "search_queries": data.get("search_queries", [cleaned])[:MAX_SEARCH_QUERIES],
+        "search_queries": search_queries,
+        "query_route": route,
         "message": f"**Intent:** {intents}\n"
                   f"**Keywords:** {', '.join(k['term'] for k in keywords)}\n"
                   f"**Goals:** {goals}"
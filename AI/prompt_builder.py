@@ -0,0 +1,86 @@
+"""
+Prompt layout of the answer-generation LLM calls.
+
+The instructions are a byte-stable system message, identical for every
+request, and everything that varies (the date, the retrieved context, the
+question) follows in the user message. Ollama keeps the KV cache of the last
+prompts evaluated in each slot and only evaluates what follows the longest
+shared prefix, so the rules (~700 tokens) are evaluated once per loaded model
+instead of once per request. OLLAMA_KEEP_ALIVE keeps the model, and with it
+that cache, loaded between requests.
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+ANSWER_MODEL = os.getenv("ANSWER_MODEL", "gemma3:4b")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Must not change between requests: no dates, ids or formatting of variable data
+GROUNDED_SYSTEM_PROMPT = """You are KhojAI — a truthful, source-grounded AI search assistant running locally.
+Your core directive is: **Never invent facts. Never guess. Never hallucinate.**
+If something is not explicitly written in the "Retrieved Context" section of the user's message, you do **not** know it and must say so.
+
+### STRICT RULES — YOU WILL LOSE POINTS IF YOU BREAK ANY OF THESE:
+1. You **must** base your entire answer only on the "Retrieved Context" provided in the user's message.
+2. You **must not** add any information that is not present in the Retrieved Context.
+3. You **must not** use any prior knowledge, training data, or memory — only the context given in the user's message is valid.
+4. If the context does not contain enough information to answer the question fully, you **must** say exactly:
+   "I'm sorry, but the retrieved web sources do not contain enough information to fully answer your question."
+5. If the context is completely irrelevant or empty, reply only with:
+   "I'm sorry, but I couldn't find relevant information to answer your query."
+6. Do **not** make up dates, names, numbers, statistics, quotes, or events that are not verbatim in the context.
+7. Do **not** continue or speculate beyond what is explicitly written.
+8. You are allowed to rephrase and summarize, but every factual claim must be traceable to a sentence in the context.
+9. Always prefer being concise and admitting ignorance over guessing.
+10. Never apologize for following these rules — they are mandatory for correctness.
+
+### FORMATTING REQUIREMENTS:
+- Write naturally and conversationally.
+- Use markdown for clarity (bullet points, bold, tables when helpful).
+- At the end of your answer, add a "Sources" section listing the URLs or titles from the context that you actually used.
+- If you used no sources (because nothing was relevant), write: "Sources: None — no reliable information found."
+
+Think step-by-step before answering:
+1. Read the user question carefully.
+2. Scan the entire Retrieved Context.
+3. Identify sentences that directly relate to the question.
+4. If no sentence provides a clear, direct answer → use the exact "not enough information" response.
+5. If yes → synthesize a concise, natural answer using only those sentences.
+6. End with the Sources list."""
+
+ASSISTANT_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+
+def today(now: Optional[datetime] = None) -> str:
+    """The current date, computed per request (the process may run for days)."""
+    return (now or datetime.now()).strftime("%Y-%m-%d")
+
+
+def grounded_messages(prompt: str, context: str, now: Optional[datetime] = None) -> List[Dict[str, str]]:
+    """
+    Chat messages answering a question from retrieved context.
+
+    Args:
+        prompt: User question
+        context: build_context_from_information() output
+        now: Time of the request (defaults to now)
+    """
+    user_message = (
+        f"### TIME CONTEXT:\nAll the context is of today's time which is {today(now)}\n\n"
+        f"### RETRIEVED CONTEXT (this is the only truth you have):\n{context}\n\n"
+        f"### USER QUESTION:\n{prompt}"
+    )
+    return [
+        {"role": "system", "content": GROUNDED_SYSTEM_PROMPT},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def assistant_messages(prompt: str) -> List[Dict[str, str]]:
+    """Chat messages answering a prompt without retrieved context."""
+    return [
+        {"role": "system", "content": ASSISTANT_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
@@ -0,0 +1,161 @@
+"""
+Routing of search-query generation before the LLM is asked.
+
+The Matcher intents from patterns.py already tell whether a prompt will be
+searched at all. Prompts with no search intent (greetings, thanks, creative
+writing) get no queries and no LLM call. Short prompts whose intents are all
+search intents get queries from the deterministic generator that
+analyze_legacy uses. Only long or mixed-intent prompts, where rewriting the
+request helps, go to the LLM. How often each route is taken is counted in
+route_stats and on /metrics.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+from metrics import registry
+
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "1") == "1"
+# Minimum confidence for deterministic queries, lower goes to the LLM
+QUERY_ROUTER_CONFIDENCE = float(os.getenv("QUERY_ROUTER_CONFIDENCE", "0.8"))
+# Prompts longer than this lose confidence in proportion (compound requests)
+QUERY_ROUTER_MAX_WORDS = int(os.getenv("QUERY_ROUTER_MAX_WORDS", "12"))
+
+# Intents each orchestrator endpoint searches the web for: /stream, and
+# /generate-response, which also searches planning prompts
+STREAM_SEARCH_INTENTS = {"web_search", "question", "explanation", "research", "question_answering"}
+RESPONSE_SEARCH_INTENTS = STREAM_SEARCH_INTENTS | {"planning"}
+# Intents that get search queries: those searched on either endpoint
+SEARCH_INTENTS = STREAM_SEARCH_INTENTS | RESPONSE_SEARCH_INTENTS
+
+ROUTE_SKIP = "skip"
+ROUTE_DETERMINISTIC = "deterministic"
+ROUTE_LLM = "llm"
+
+route_stats = {ROUTE_SKIP: 0, ROUTE_DETERMINISTIC: 0, ROUTE_LLM: 0}
+
+QUERY_ROUTES = registry.counter("khoj_query_routes_total",
+                                "Search-query generation by route (skip, deterministic, llm)", ("route",))
+
+
+def route_confidence(prompt: str, intents: List[str]) -> float:
+    """
+    Confidence that deterministic queries serve the prompt as well as the LLM's.
+
+    It is the share of matched intents that are search intents, scaled down
+    for prompts longer than QUERY_ROUTER_MAX_WORDS words.
+    """
+    matched = set(intents)
+    if not matched:
+        return 0.0
+    share = len(matched & SEARCH_INTENTS) / len(matched)
+    words = len(prompt.split())
+    return share * min(1.0, QUERY_ROUTER_MAX_WORDS / max(words, 1))
+
+
+def route_prompt(prompt: str, intents: List[str], keywords: List[Dict]) -> Tuple[str, float]:
+    """
+    Pick how search queries are generated for a prompt.
+
+    Args:
+        prompt: Cleaned prompt
+        intents: Intents matched by the patterns.py Matcher
+        keywords: Extracted keywords ({"term", "score"})
+
+    Returns:
+        (route, confidence), route being ROUTE_SKIP when no search intent
+        matched, ROUTE_DETERMINISTIC when the confidence reaches
+        QUERY_ROUTER_CONFIDENCE and there are keywords to build queries
+        from, ROUTE_LLM otherwise (always when QUERY_ROUTER_ENABLED=0).
+    """
+    if not QUERY_ROUTER_ENABLED:
+        return ROUTE_LLM, 0.0
+    if not SEARCH_INTENTS.intersection(intents):
+        return ROUTE_SKIP, 1.0
+    confidence = route_confidence(prompt, intents)
+    if keywords and confidence >= QUERY_ROUTER_CONFIDENCE:
+        return ROUTE_DETERMINISTIC, confidence
+    return ROUTE_LLM, confidence
+
+
+def record_route(route: str) -> None:
+    """Count a routing decision."""
+    route_stats[route] += 1
+    QUERY_ROUTES.inc(route=route)
+
+
+def route_hit_rates() -> Dict[str, float]:
+    """Share of prompts that took each route so far."""
+    total = sum(route_stats.values())
+    return {route: count / total if total else 0.0 for route, count in route_stats.items()}
+
+
+def generate_search_queries(prompt: str, intents: List[str], keywords: List[Dict],
+                            max_queries: int = 5) -> List[str]:
+    """
+    Deterministic search queries from the prompt, its intents and keywords.
+
+    Question answering and translation get targeted keyword combinations
+    followed by the prompt; other intents get the prompt first, then keyword
+    combinations and intent-prefixed queries. Queries are deduplicated and
+    kept under 150 characters.
+    """
+    search_queries = []
+    keyword_terms = [k["term"] for k in keywords[:5]]
+
+    # For question answering, create more targeted queries
+    if "question_answering" in intents:
+        # Create specific queries focused on the key information needed
+        if keyword_terms:
+            # Try combinations that are more likely to find specific answers
+            search_queries.append(" ".join(keyword_terms[:3]))  # e.g., "chief advisor bangladesh government"
+            search_queries.append(f"who is {' '.join(keyword_terms[:2])}")  # e.g., "who is chief advisor bangladesh"
+            if len(keyword_terms) > 2:
+                search_queries.append(f"{keyword_terms[0]} {keyword_terms[2]}")  # e.g., "July Revolution chief advisor"
+
+        # Add the original question without the "Tell me" part for better search results
+        if prompt.lower().startswith("tell me"):
+            search_queries.append(prompt[8:])  # Remove "Tell me "
+        else:
+            search_queries.append(prompt)
+    elif "translation" in intents:
+        # For translation tasks, focus on language pairs and context
+        if keyword_terms:
+            search_queries.append(" ".join(keyword_terms[:3]))
+            search_queries.append(f"translate {' '.join(keyword_terms[:3])}")
+            search_queries.append(f"meaning {' '.join(keyword_terms[:2])}")
+
+        # Add the original prompt
+        search_queries.append(prompt)
+    else:
+        # Add the original prompt as the first query
+        search_queries.append(prompt)
+
+        # Add keyword combinations
+        if keyword_terms:
+            # Add a simple combination of top keywords
+            search_queries.append(" ".join(keyword_terms[:3]))
+
+            # Add individual important keywords
+            for term in keyword_terms[:3]:
+                if term not in search_queries:
+                    search_queries.append(term)
+
+        # Add intent-based queries for non-question intents
+        for intent in intents[:2]:
+            if intent not in ["question_answering", "translation"] and keyword_terms:  # Skip for question answering and translation
+                intent_query = f"{intent} {' '.join(keyword_terms[:3])}"
+                if len(intent_query) < 100:  # Only add if not too long
+                    search_queries.append(intent_query)
+
+    # Deduplicate while preserving order and reasonable length
+    seen_queries = set()
+    unique_queries = []
+    for q in search_queries:
+        # Check if query is valid (not empty, not too long)
+        if q and len(q.strip()) > 0 and len(q) < 150:
+            clean_q = q.strip()
+            if clean_q not in seen_queries:
+                seen_queries.add(clean_q)
+                unique_queries.append(clean_q)
+    return unique_queries[:max_queries]
@@ -48,7 +48,9 @@ With Web Framework (FastAPI example):
 
 import re
 import json
+import time
 import asyncio
+import logging
 from typing import Dict, List, Optional, Tuple, Callable, Awaitable
 from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
@@ -57,11 +59,24 @@ import aiohttp
 from bs4 import BeautifulSoup, Comment
 import trafilatura
 
+from tracing import span
+from metrics import registry
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+SCRAPE_DURATION = registry.histogram("khoj_scrape_duration_seconds",
+                                     "Duration of scrape_webpage by extraction method and outcome",
+                                     ("method", "outcome"))
+
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
+# Frame of the start and end progress messages of a scrape
+BANNER = '=' * 60
+
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
 
 # Comprehensive ad/promo/noise selectors
@@ -195,17 +210,25 @@ BOILERPLATE_PATTERNS = [
 # HELPER FUNCTIONS
 # ============================================================================
 
-async def progress_log(message: str, callback: Optional[Callable[[str], Awaitable[None]]] = None):
-    """Log progress message and call callback if provided."""
-    print(message)
+async def progress_log(callback: Optional[Callable[[str], Awaitable[None]]], message: str, *args):
+    """
+    Log a progress message at DEBUG and pass it to the callback, if provided.
+
+    The message is %-formatted with args only when used: without a callback and
+    with DEBUG off for this module, nothing is formatted.
+    """
+    if callback is None and not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug(message, *args)
     if callback:
         try:
+            text = message % args if args else message
             if asyncio.iscoroutinefunction(callback):
-                await callback(message)
+                await callback(text)
             else:
-                callback(message)
+                callback(text)
         except Exception as e:
-            print(f"Progress callback error: {e}")
+            logger.warning("Progress callback error: %s", e)
 
 
 async def check_robots_txt(url: str, timeout: int = 10) -> bool:
@@ -236,10 +259,10 @@ async def check_robots_txt(url: str, timeout: int = 10) -> bool:
         return result
     except asyncio.TimeoutError:
         # Log timeout but allow scraping to continue
-        print(f"⚠️  Robots.txt check timed out for {url}, continuing anyway")
+        logger.warning("Robots.txt check timed out for %s, continuing anyway", url)
         return True  # Allow if robots.txt check times out
     except Exception as e:
-        print(f"⚠️  Robots.txt check failed for {url}: {e}, continuing anyway")
+        logger.warning("Robots.txt check failed for %s: %s, continuing anyway", url, e)
         return True  # Allow if robots.txt check fails
 
 
@@ -265,7 +288,7 @@ async def fetch_page(
     }
 
     try:
-        await progress_log(f"🌐 Fetching URL: {url}", callback)
+        await progress_log(callback, "🌐 Fetching URL: %s", url)
 
         timeout_obj = aiohttp.ClientTimeout(total=timeout)
         async with aiohttp.ClientSession(timeout=timeout_obj) as session:
@@ -274,16 +297,16 @@ async def fetch_page(
 
                 # Check for common error status codes
                 if status_code == 403:
-                    await progress_log("⚠️  Access forbidden (403) - possible anti-scraping measure", callback)
+                    await progress_log(callback, "⚠️  Access forbidden (403) - possible anti-scraping measure")
                     return None, 403
                 elif status_code == 429:
-                    await progress_log("⚠️  Rate limited (429) - too many requests", callback)
+                    await progress_log(callback, "⚠️  Rate limited (429) - too many requests")
                     return None, 429
                 elif status_code == 503:
-                    await progress_log("⚠️  Service unavailable (503) - server error", callback)
+                    await progress_log(callback, "⚠️  Service unavailable (503) - server error")
                     return None, 503
                 elif status_code >= 400:
-                    await progress_log(f"⚠️  HTTP error {status_code}", callback)
+                    await progress_log(callback, "⚠️  HTTP error %d", status_code)
                     return None, status_code
 
                 html = await response.text()
@@ -293,17 +316,17 @@ async def fetch_page(
                 captcha_indicators = ['captcha', 'recaptcha', 'hcaptcha', 'cloudflare']
                 if any(indicator in content_lower for indicator in captcha_indicators):
                     if 'complete the captcha' in content_lower or 'verify you are human' in content_lower:
-                        await progress_log("⚠️  CAPTCHA detected - page requires human verification", callback)
+                        await progress_log(callback, "⚠️  CAPTCHA detected - page requires human verification")
                         return None, 403
 
-                await progress_log(f"✅ Fetched {len(html)} bytes", callback)
+                await progress_log(callback, "✅ Fetched %d bytes", len(html))
                 return html, status_code
 
     except asyncio.TimeoutError:
-        await progress_log(f"⚠️  Request timeout after {timeout} seconds", callback)
+        await progress_log(callback, "⚠️  Request timeout after %s seconds", timeout)
         return None, 408
     except aiohttp.ClientError as e:
-        await progress_log(f"⚠️  Request failed: {e}", callback)
+        await progress_log(callback, "⚠️  Request failed: %s", e)
         return None, None
 
 
@@ -366,7 +389,7 @@ async def extract_json_ld(soup: BeautifulSoup, callback: Optional[Callable[[str]
                 data = next((item for item in data if item.get('@type') == 'Article'), data[0] if data else {})
 
             if data.get('@type') in ['Article', 'NewsArticle', 'BlogPosting']:
-                await progress_log("📄 Found JSON-LD structured data", callback)
+                await progress_log(callback, "📄 Found JSON-LD structured data")
                 return {
                     'title': data.get('headline', ''),
                     'content': data.get('articleBody', ''),
@@ -674,7 +697,32 @@ async def scrape_webpage(
 ) -> Dict[str, any]:
     """
     Ultimate async web scraping function with real-time progress tracking.
+
+    Traced as a "scrape" span with the extraction method and outcome, and child
+    spans for the robots.txt check, fetch, parsing and extraction; the duration
+    is recorded in SCRAPE_DURATION.
     """
+    start = time.perf_counter()
+    with span("scrape", url=url) as scrape_span:
+        result = await _scrape_webpage(url, max_content_length, respect_robots, min_content_length,
+                                       extract_sentences_flag, progress_callback)
+        scrape_span.set_attributes(method=result['method'] or "none", success=result['success'],
+                                   chars=len(result['content']))
+        if result['error']:
+            scrape_span.set_attribute("error", result['error'])
+    SCRAPE_DURATION.observe(time.perf_counter() - start, method=result['method'] or "none",
+                            outcome="success" if result['success'] else "failure")
+    return result
+
+
+async def _scrape_webpage(
+    url: str,
+    max_content_length: int,
+    respect_robots: bool,
+    min_content_length: int,
+    extract_sentences_flag: bool,
+    progress_callback: Optional[Callable[[str], Awaitable[None]]]
+) -> Dict[str, any]:
     result = {
         'url': url,
         'title': '',
@@ -685,22 +733,24 @@ async def scrape_webpage(
     }
 
     # Use progress_callback (not callback)
-    await progress_log(f"\n{'='*60}", progress_callback)
-    await progress_log(f"🔍 Starting scrape: {url}", progress_callback)
-    await progress_log(f"{'='*60}", progress_callback)
+    await progress_log(progress_callback, "\n%s\n🔍 Starting scrape: %s\n%s", BANNER, url, BANNER)
 
     # Check robots.txt
     if respect_robots:
-        await progress_log("🤖 Checking robots.txt...", progress_callback)
-        allowed = await check_robots_txt(url, timeout=10)
+        await progress_log(progress_callback, "🤖 Checking robots.txt...")
+        with span("scrape.robots"):
+            allowed = await check_robots_txt(url, timeout=10)
         if not allowed:
             result['error'] = 'Blocked by robots.txt'
-            await progress_log(f"❌ {result['error']}", progress_callback)
+            await progress_log(progress_callback, "❌ %s", result['error'])
             return result
-        await progress_log("✅ Robots.txt check passed", progress_callback)
+        await progress_log(progress_callback, "✅ Robots.txt check passed")
 
     # Fetch page
-    fetch_result = await fetch_page(url, callback=progress_callback)
+    with span("scrape.fetch") as fetch_span:
+        fetch_result = await fetch_page(url, callback=progress_callback)
+        if fetch_result:
+            fetch_span.set_attribute("status_code", fetch_result[1] or 0)
     if not fetch_result or fetch_result[0] is None:
         html, status_code = fetch_result if fetch_result else (None, None)
         if status_code == 403:
@@ -715,62 +765,65 @@ async def scrape_webpage(
             result['error'] = f'HTTP error {status_code}'
         else:
             result['error'] = 'Failed to fetch page'
-        await progress_log(f"❌ {result['error']}", progress_callback)
+        await progress_log(progress_callback, "❌ %s", result['error'])
         return result
 
     html, status_code = fetch_result
 
-    await progress_log("🔨 Parsing HTML...", progress_callback)
-    soup = BeautifulSoup(html, 'html.parser')
+    await progress_log(progress_callback, "🔨 Parsing HTML...")
+    with span("scrape.parse", bytes=len(html)):
+        soup = BeautifulSoup(html, 'html.parser')
 
-    # Check if it's an error page
-    page_text = soup.get_text()
+        # Check if it's an error page
+        page_text = soup.get_text()
     if is_error_page(soup, page_text):
         result['error'] = 'Error page detected (404, 403, CAPTCHA, or maintenance)'
-        await progress_log(f"❌ {result['error']}", progress_callback)
+        await progress_log(progress_callback, "❌ %s", result['error'])
         return result
 
     # Extract title
     title_tag = soup.find('title')
     result['title'] = title_tag.get_text(strip=True) if title_tag else 'No title'
-    await progress_log(f"📌 Page title: {result['title'][:60]}...", progress_callback)
+    await progress_log(progress_callback, "📌 Page title: %.60s...", result['title'])
 
     # ========================================================================
     # STRATEGY 1: Try Trafilatura (specialized extraction library)
     # ========================================================================
     try:
-        await progress_log("🔍 Strategy 1: Trying Trafilatura extraction...", progress_callback)
+        await progress_log(progress_callback, "🔍 Strategy 1: Trying Trafilatura extraction...")
 
         loop = asyncio.get_event_loop()
-        content = await asyncio.wait_for(
-            loop.run_in_executor(
-                None,
-                lambda: trafilatura.extract(
-                    html,
-                    include_comments=False,
-                    include_tables=True,
-                    no_fallback=False
-                )
-            ),
-            timeout=30
-        )
+        with span("scrape.extract", method="trafilatura"):
+            content = await asyncio.wait_for(
+                loop.run_in_executor(
+                    None,
+                    lambda: trafilatura.extract(
+                        html,
+                        include_comments=False,
+                        include_tables=True,
+                        no_fallback=False
+                    )
+                ),
+                timeout=30
+            )
 
         if content and len(content) >= min_content_length:
             result['content'] = content
             result['method'] = 'trafilatura'
             result['success'] = True
-            await progress_log(f"✅ Trafilatura success: {len(content)} chars extracted", progress_callback)
+            await progress_log(progress_callback, "✅ Trafilatura success: %d chars extracted", len(content))
         else:
-            await progress_log(f"⚠️  Trafilatura insufficient: {len(content) if content else 0} chars", progress_callback)
+            await progress_log(progress_callback, "⚠️  Trafilatura insufficient: %d chars", len(content or ''))
     except Exception as e:
-        await progress_log(f"⚠️  Trafilatura failed: {e}", progress_callback)
+        await progress_log(progress_callback, "⚠️  Trafilatura failed: %s", e)
 
     # ========================================================================
     # STRATEGY 2: JSON-LD Structured Data
     # ========================================================================
     if not result['success']:
-        await progress_log("🔍 Strategy 2: Trying JSON-LD extraction...", progress_callback)
-        json_ld_data = await asyncio.wait_for(extract_json_ld(soup, progress_callback), timeout=10)
+        await progress_log(progress_callback, "🔍 Strategy 2: Trying JSON-LD extraction...")
+        with span("scrape.extract", method="json-ld"):
+            json_ld_data = await asyncio.wait_for(extract_json_ld(soup, progress_callback), timeout=10)
 
         if json_ld_data and json_ld_data.get('content'):
             content = json_ld_data['content']
@@ -779,23 +832,24 @@ async def scrape_webpage(
                 result['title'] = json_ld_data.get('title') or result['title']
                 result['method'] = 'json-ld'
                 result['success'] = True
-                await progress_log(f"✅ JSON-LD success: {len(content)} chars extracted", progress_callback)
+                await progress_log(progress_callback, "✅ JSON-LD success: %d chars extracted", len(content))
             else:
-                await progress_log(f"⚠️  JSON-LD insufficient: {len(content)} chars", progress_callback)
+                await progress_log(progress_callback, "⚠️  JSON-LD insufficient: %d chars", len(content))
         else:
-            await progress_log("⚠️  No valid JSON-LD data found", progress_callback)
+            await progress_log(progress_callback, "⚠️  No valid JSON-LD data found")
 
     # ========================================================================
     # STRATEGY 3: Custom Content Extraction with Scoring
     # ========================================================================
     if not result['success']:
-        await progress_log("🔍 Strategy 3: Custom content extraction...", progress_callback)
+        await progress_log(progress_callback, "🔍 Strategy 3: Custom content extraction...")
 
-        await progress_log("🧹 Removing ads and noise...", progress_callback)
-        remove_ads_and_noise(soup)
+        with span("scrape.extract", method="custom"):
+            await progress_log(progress_callback, "🧹 Removing ads and noise...")
+            remove_ads_and_noise(soup)
 
-        await progress_log("🎯 Finding main content area...", progress_callback)
-        main_content = find_main_content(soup)
+            await progress_log(progress_callback, "🎯 Finding main content area...")
+            main_content = find_main_content(soup)
 
         if main_content:
             content = main_content.get_text(separator=' ', strip=True)
@@ -804,53 +858,53 @@ async def scrape_webpage(
                 result['content'] = content
                 result['method'] = 'custom'
                 result['success'] = True
-                await progress_log(f"✅ Custom extraction success: {len(content)} chars", progress_callback)
+                await progress_log(progress_callback, "✅ Custom extraction success: %d chars", len(content))
             else:
-                await progress_log(f"⚠️  Custom extraction insufficient: {len(content)} chars", progress_callback)
+                await progress_log(progress_callback, "⚠️  Custom extraction insufficient: %d chars", len(content))
         else:
-            await progress_log("⚠️  Could not identify main content", progress_callback)
+            await progress_log(progress_callback, "⚠️  Could not identify main content")
 
     # ========================================================================
     # FALLBACK: Get all remaining text
     # ========================================================================
     if not result['success']:
-        await progress_log("🔍 Fallback: Extracting all remaining text...", progress_callback)
+        await progress_log(progress_callback, "🔍 Fallback: Extracting all remaining text...")
         content = soup.get_text(separator=' ', strip=True)
 
         if len(content) >= min_content_length:
             result['content'] = content
             result['method'] = 'fallback'
             result['success'] = True
-            await progress_log(f"✅ Fallback successful: {len(content)} chars", progress_callback)
+            await progress_log(progress_callback, "✅ Fallback successful: %d chars", len(content))
         else:
             result['error'] = f'Insufficient content ({len(content)} chars)'
-            await progress_log(f"❌ {result['error']}", progress_callback)
+            await progress_log(progress_callback, "❌ %s", result['error'])
             return result
 
     # ========================================================================
     # POST-PROCESSING
     # ========================================================================
     if result['success']:
-        await progress_log("🧼 Cleaning text...", progress_callback)
+        await progress_log(progress_callback, "🧼 Cleaning text...")
         result['content'] = clean_text(result['content'])
 
         if len(result['content']) < min_content_length:
             result['success'] = False
             result['error'] = f'Insufficient content after cleaning ({len(result["content"])} chars)'
-            await progress_log(f"❌ {result['error']}", progress_callback)
+            await progress_log(progress_callback, "❌ %s", result['error'])
             return result
 
         if extract_sentences_flag and result['method'] != 'trafilatura':
-            await progress_log("📝 Extracting meaningful sentences...", progress_callback)
+            await progress_log(progress_callback, "📝 Extracting meaningful sentences...")
             sentences = extract_sentences(result['content'])
             if sentences:
                 result['content'] = ' '.join(sentences)
-                await progress_log(f"✅ Extracted {len(sentences)} clean sentences", progress_callback)
+                await progress_log(progress_callback, "✅ Extracted %d clean sentences", len(sentences))
             else:
-                await progress_log(f"⚠️  No valid sentences found, keeping cleaned content", progress_callback)
+                await progress_log(progress_callback, "⚠️  No valid sentences found, keeping cleaned content")
 
         if extract_sentences_flag:
-            await progress_log("🔄 Removing duplicate sentences...", progress_callback)
+            await progress_log(progress_callback, "🔄 Removing duplicate sentences...")
             sentences = result['content'].split('. ')
             seen = set()
             unique_sentences = []
@@ -866,7 +920,7 @@ async def scrape_webpage(
                     result['content'] += '.'
 
         if max_content_length > 0 and len(result['content']) > max_content_length:
-            await progress_log(f"✂️  Truncating content to {max_content_length} chars...", progress_callback)
+            await progress_log(progress_callback, "✂️  Truncating content to %d chars...", max_content_length)
             truncated = result['content'][:max_content_length]
             last_period = truncated.rfind('.')
             if last_period > max_content_length * 0.8:
@@ -879,17 +933,15 @@ async def scrape_webpage(
         if len(result['content']) < 500 and any(sign in content_lower for sign in error_signs):
             result['success'] = False
             result['error'] = 'Content appears to be an error page'
-            await progress_log(f"❌ {result['error']}", progress_callback)
+            await progress_log(progress_callback, "❌ %s", result['error'])
             return result
 
-        await progress_log(f"\n{'='*60}", progress_callback)
-        await progress_log(f"✅ SCRAPING COMPLETE", progress_callback)
-        await progress_log(f"{'='*60}", progress_callback)
-        await progress_log(f"Method: {result['method']}", progress_callback)
-        await progress_log(f"Title: {result['title'][:60]}..." if len(result['title']) > 60 else f"Title: {result['title']}", progress_callback)
-        await progress_log(f"Content length: {len(result['content'])} chars", progress_callback)
-        await progress_log(f"Status: ✅ Success", progress_callback)
-        await progress_log(f"{'='*60}\n", progress_callback)
+        await progress_log(progress_callback,
+                           "\n%s\n✅ SCRAPING COMPLETE\n%s\nMethod: %s\nTitle: %s\nContent length: %d chars\n"
+                           "Status: ✅ Success\n%s\n",
+                           BANNER, BANNER, result['method'],
+                           result['title'] if len(result['title']) <= 60 else result['title'][:60] + "...",
+                           len(result['content']), BANNER)
 
     return result
 
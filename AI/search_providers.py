@@ -0,0 +1,276 @@
+"""
+Search providers for the web search pipeline.
+
+search_and_extract only needs "query -> list of URLs" (and, for offline use,
+"URL -> page"). Providers implement that contract:
+
+- GoogleSearchProvider: Google Programmable Search Engine (Custom Search JSON API)
+- LocalSearchProvider: answers from a DiskJsonCache index or a fixture corpus,
+  with no network access, for offline runs and throughput benchmarks
+
+The provider is selected with SEARCH_PROVIDER=google|local (default: google).
+LOCAL_SEARCH_CORPUS points the local provider at a cache directory, a JSONL file
+or a directory of JSON page records (e.g. cache/cold).
+"""
+
+import os
+import re
+import math
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from collections import Counter
+from typing import Dict, List, Optional
+
+import requests
+
+# Handle optional dependencies
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json as orjson
+    ORJSON_AVAILABLE = False
+
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+GOOGLE_PSE_ENDPOINT = "https://www.googleapis.com/customsearch/v1"
+
+
+class SearchProvider(ABC):
+    """Interface for search backends used by search_and_extract."""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        """
+        Search for a query.
+
+        Args:
+            query: Search query
+            num_results: Maximum number of URLs to return
+
+        Returns:
+            List of result URLs, best first
+        """
+
+    def get_page(self, url: str) -> Optional[Dict]:
+        """
+        Return a page record (url, title, content, ...) for a result URL if the
+        provider can serve it without scraping, otherwise None.
+        """
+        return None
+
+
+class GoogleSearchProvider(SearchProvider):
+    """Google Programmable Search Engine (Custom Search JSON API)."""
+
+    name = "google"
+
+    def __init__(self, api_key: Optional[str] = None, cx: Optional[str] = None,
+                 endpoint: Optional[str] = None, max_retries: int = 3):
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.cx = cx or os.getenv("GOOGLE_CX")  # Search Engine ID
+        self.endpoint = endpoint or os.getenv("GOOGLE_PSE_ENDPOINT", GOOGLE_PSE_ENDPOINT)
+        self.max_retries = max_retries
+
+        # Validate required credentials
+        if not self.api_key or not self.cx:
+            raise EnvironmentError(
+                "Missing GOOGLE_API_KEY or GOOGLE_CX in .env file. "
+                "Please check your .env configuration."
+            )
+
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        """Search Google PSE and return the list of result URLs."""
+        if num_results > 10:
+            logger.warning("Google API limits num to 10. Requested %d, using 10.", num_results)
+            num_results = 10
+
+        params = {
+            "key": self.api_key,
+            "cx": self.cx,
+            "q": query,
+            "num": num_results
+        }
+
+        # Retry logic for rate limiting and transient errors
+        max_retries = self.max_retries
+        for attempt in range(max_retries):
+            try:
+                logger.debug("Searching Google PSE: '%s' (max %d results)", query, num_results)
+                response = requests.get(self.endpoint, params=params, timeout=10)
+
+                # Handle rate limiting
+                if response.status_code == 429:
+                    if attempt < max_retries - 1:
+                        # Exponential backoff
+                        wait_time = 2 ** attempt
+                        logger.warning("Rate limited. Waiting %d seconds before retry...", wait_time)
+                        time.sleep(wait_time)
+                        continue
+                    else:
+                        logger.error("Google API Error: Rate limit exceeded. Max retries reached.")
+                        return []
+
+                response.raise_for_status()
+                data = response.json()
+
+                items = data.get("items", [])
+                urls = []
+                for item in items:
+                    link = item.get("link")
+                    if link and link.startswith("http"):
+                        urls.append(link)
+
+                if not urls:
+                    logger.info("No valid URLs returned from Google PSE for '%s'.", query)
+                else:
+                    logger.debug("Found %d valid URLs from Google PSE.", len(urls))
+
+                return urls
+
+            except requests.exceptions.HTTPError as e:
+                if response.status_code == 403:
+                    logger.error("Google API Error: Quota exceeded or invalid API key.")
+                    # Don't retry on auth errors
+                    break
+                elif response.status_code == 400:
+                    logger.error("Google API Error: Bad request (check query or CX).")
+                    # Don't retry on bad requests
+                    break
+                elif response.status_code == 429:
+                    # Already handled above
+                    pass
+                else:
+                    logger.error("Google API HTTP Error: %d - %s", response.status_code, e)
+                    if attempt < max_retries - 1:
+                        # Wait before retry
+                        wait_time = 2 ** attempt
+                        logger.warning("Waiting %d seconds before retry...", wait_time)
+                        time.sleep(wait_time)
+                        continue
+            except requests.exceptions.RequestException as e:
+                logger.error("Network error during Google search: %s", e)
+                if attempt < max_retries - 1:
+                    # Wait before retry
+                    wait_time = 2 ** attempt
+                    logger.warning("Waiting %d seconds before retry...", wait_time)
+                    time.sleep(wait_time)
+                    continue
+            except Exception as e:
+                logger.error("Unexpected error in search_web(): %s", e)
+                if attempt < max_retries - 1:
+                    # Wait before retry
+                    wait_time = 2 ** attempt
+                    logger.warning("Waiting %d seconds before retry...", wait_time)
+                    time.sleep(wait_time)
+                    continue
+
+        return []
+
+
+class LocalSearchProvider(SearchProvider):
+    """
+    Offline provider backed by a local corpus of page records.
+
+    The corpus can be a DiskJsonCache directory (pages are read from its
+    bm25_index/documents.jsonl), a JSONL file with one page per line, or a
+    directory of JSON page records such as cache/cold. Pages are ranked with
+    a small TF-IDF score over lowercase word tokens and served by get_page,
+    so search_and_extract never touches the network.
+    """
+
+    name = "local"
+
+    def __init__(self, corpus_path: str = "cache"):
+        self.corpus_path = Path(corpus_path)
+        self.pages: Dict[str, Dict] = {}
+        self._term_counts: Dict[str, Counter] = {}
+        self._doc_freqs: Counter = Counter()
+        self._load()
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return re.findall(r'\w+', text.lower())
+
+    def _iter_records(self):
+        path = self.corpus_path
+        if path.is_dir() and (path / "bm25_index" / "documents.jsonl").exists():
+            path = path / "bm25_index" / "documents.jsonl"
+
+        if path.is_file():
+            with open(path, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        yield orjson.loads(line)
+        elif path.is_dir():
+            for file_path in sorted(path.glob("*.json")):
+                with open(file_path, 'rb') as f:
+                    yield orjson.loads(f.read())
+        else:
+            raise FileNotFoundError(f"Local search corpus not found: {self.corpus_path}")
+
+    def _load(self) -> None:
+        for record in self._iter_records():
+            url = record.get('url')
+            content = record.get('content') or ''
+            if not url or not content or url in self.pages:
+                continue
+
+            self.pages[url] = {
+                'url': url,
+                'title': record.get('title') or 'No title',
+                'content': content,
+                'method': 'local',
+                'success': True,
+                'error': None
+            }
+            counts = Counter(self._tokenize(f"{record.get('title', '')} {content}"))
+            self._term_counts[url] = counts
+            self._doc_freqs.update(counts.keys())
+
+        logger.info("Local search corpus loaded: %d pages from %s", len(self.pages), self.corpus_path)
+
+    def search(self, query: str, num_results: int = 10) -> List[str]:
+        """Rank corpus pages for the query and return the best URLs."""
+        terms = set(self._tokenize(query))
+        total = len(self.pages)
+        if not terms or not total:
+            return []
+
+        scored = []
+        for url, counts in self._term_counts.items():
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += (1 + math.log(tf)) * math.log(1 + total / self._doc_freqs[term])
+            if score > 0:
+                scored.append((score, url))
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [url for _, url in scored[:num_results]]
+
+    def get_page(self, url: str) -> Optional[Dict]:
+        page = self.pages.get(url)
+        return dict(page) if page else None
+
+
+def get_search_provider(name: Optional[str] = None) -> SearchProvider:
+    """
+    Build the search provider selected by name or the SEARCH_PROVIDER env variable.
+
+    Raises:
+        EnvironmentError: For the Google provider when credentials are missing
+        ValueError: For an unknown provider name
+    """
+    name = (name or os.getenv("SEARCH_PROVIDER", "google")).lower()
+    if name == "google":
+        return GoogleSearchProvider()
+    if name == "local":
+        return LocalSearchProvider(os.getenv("LOCAL_SEARCH_CORPUS", "cache"))
+    raise ValueError(f"Unknown SEARCH_PROVIDER '{name}' (expected 'google' or 'local')")
@@ -1,91 +1,223 @@
+import os
 import re
-from typing import List, Tuple, Dict
-from rank_bm25 import BM25Okapi
-
-# Initialize NLTK with proper error handling
-NLTK_READY = False
-wordnet = None
-word_tokenize = None
-stopwords = None
-
-try:
-    import nltk
-
-    # Download required data first
-    print("📦 Checking NLTK data...")
-    nltk.download('wordnet', quiet=True)
-    nltk.download('omw-1.4', quiet=True)
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
+import json
+import math
+import time
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import List, Tuple, Dict, Optional, Set, Callable
+import numpy as np
+
+from tracing import traced
+from log_config import get_logger
+
+logger = get_logger(__name__)
+
+# NLP backends this process loads (KHOJ_NLP_PROFILE):
+#   minimal - regex tokenization only, no NLTK or spaCy
+#   nltk    - NLTK tokenizer, stopwords and WordNet expansion
+#   full    - NLTK plus spaCy NER (default)
+NLP_PROFILES = ("minimal", "nltk", "full")
+NLP_PROFILE = os.getenv("KHOJ_NLP_PROFILE", "full").lower()
+if NLP_PROFILE not in NLP_PROFILES:
+    logger.warning("Unknown KHOJ_NLP_PROFILE '%s', using 'full'", NLP_PROFILE)
+    NLP_PROFILE = "full"
+
+# Missing NLTK data is downloaded once unless KHOJ_NLTK_DOWNLOAD=0
+NLTK_DOWNLOAD = os.getenv("KHOJ_NLTK_DOWNLOAD", "1") != "0"
+
+# (nltk.data resource, download package) of the NLTK data used here
+NLTK_RESOURCES = [
+    ("corpora/wordnet", "wordnet"),
+    ("corpora/omw-1.4", "omw-1.4"),
+    ("tokenizers/punkt", "punkt"),
+    ("tokenizers/punkt_tab", "punkt_tab"),  # For newer NLTK versions
+    ("corpora/stopwords", "stopwords"),
+]
+
+# ------------------------------------------------------------
+# Lazy-loaded NLP backends (nothing is loaded at import time)
+# ------------------------------------------------------------
+_nltk_lock = threading.Lock()
+_spacy_lock = threading.Lock()
+_nltk_loaded = False
+_wordnet = None
+_word_tokenize = None
+_stopwords = None
+_spacy_loaded = False
+_nlp = None
+
+
+def _load_nltk() -> bool:
+    """Import NLTK, downloading only the data that is not available locally."""
+    global _wordnet, _word_tokenize, _stopwords
     try:
-        nltk.download('punkt_tab', quiet=True)  # For newer NLTK versions
-    except:
-        pass
+        import nltk
+
+        missing = []
+        for resource, package in NLTK_RESOURCES:
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                missing.append(package)
+        if missing and NLTK_DOWNLOAD:
+            logger.info("Downloading NLTK data: %s", ", ".join(missing))
+            for package in missing:
+                nltk.download(package, quiet=True)
+
+        from nltk.corpus import wordnet, stopwords
+        from nltk.tokenize import word_tokenize
+
+        # Test if it works
+        wordnet.synsets('test')
+        word_tokenize('test')
+        stopwords.words('english')
+
+        _wordnet, _word_tokenize, _stopwords = wordnet, word_tokenize, stopwords
+        logger.info("NLTK initialized successfully")
+        return True
+    except Exception as e:
+        logger.warning("NLTK not available, falling back to basic tokenization: %s", e)
+        return False
+
+
+def nltk_ready() -> bool:
+    """Whether NLTK is usable, loading it on first call (False for the minimal profile)."""
+    global _nltk_loaded
+    if not _nltk_loaded:
+        with _nltk_lock:
+            if not _nltk_loaded:
+                if NLP_PROFILE != "minimal":
+                    _load_nltk()
+                _nltk_loaded = True
+    return _word_tokenize is not None
+
+
+def get_spacy_nlp():
+    """The spaCy pipeline, loaded on first call; None unless the profile is full and the model is installed."""
+    global _spacy_loaded, _nlp
+    if not _spacy_loaded:
+        with _spacy_lock:
+            if not _spacy_loaded:
+                if NLP_PROFILE == "full":
+                    try:
+                        import spacy
+
+                        _nlp = spacy.load("en_core_web_sm")
+                        logger.info("spaCy loaded successfully")
+                    except (ImportError, OSError):
+                        logger.warning("spaCy not available")
+                _spacy_loaded = True
+    return _nlp
+
+
+def spacy_available() -> bool:
+    """Whether spaCy NER is usable, loading it on first call."""
+    return get_spacy_nlp() is not None
+
+
+def warm_up() -> None:
+    """Load the NLP backends of the active profile."""
+    try:
+        nltk_ready()
+        spacy_available()
+    except Exception as e:
+        logger.warning("NLP warm-up failed: %s", e)
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> None:
+    """Block until the background warm-up has finished."""
+    if _warm_up_thread is not None:
+        _warm_up_thread.join(timeout)
 
-    # Now import after downloads
-    from nltk.corpus import wordnet
-    from nltk.tokenize import word_tokenize
-    from nltk.corpus import stopwords
 
-    # Test if it works
-    wordnet.synsets('test')
-    word_tokenize('test')
-    stopwords.words('english')
+# Warm-up in background (won't block startup)
+_warm_up_thread = None
+if NLP_PROFILE != "minimal":
+    _warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+    _warm_up_thread.start()
 
-    NLTK_READY = True
-    print("✅ NLTK initialized successfully")
 
-except Exception as e:
-    print(f"⚠️  NLTK not available: {e}")
-    print("   Falling back to basic tokenization")
-    NLTK_READY = False
+# Optional precomputed synonym table, JSON {"keyword": ["synonym", ...]} with the
+# synonyms in WordNet order; consulted before WordNet and usable without NLTK.
+# Build one with `python cache/maintenance.py synonyms`.
+SYNONYM_TABLE_PATH = os.getenv("KHOJ_SYNONYM_TABLE")
+_synonym_table = None
 
-# Optional: Load spaCy only if available
-SPACY_AVAILABLE = False
-nlp = None
-try:
-    import spacy
 
-    nlp = spacy.load("en_core_web_sm")
-    SPACY_AVAILABLE = True
-    print("✅ spaCy loaded successfully")
-except (ImportError, OSError):
-    print("⚠️  spaCy not available")
+def load_synonym_table() -> Dict[str, List[str]]:
+    """The synonym table at KHOJ_SYNONYM_TABLE, loaded once (empty if unset or unreadable)."""
+    global _synonym_table
+    if _synonym_table is None:
+        table = {}
+        if SYNONYM_TABLE_PATH:
+            try:
+                with open(SYNONYM_TABLE_PATH, 'r', encoding='utf-8') as f:
+                    table = json.load(f)
+                logger.info("Loaded %d synonym table entries", len(table))
+            except (OSError, ValueError) as e:
+                logger.warning("Could not load synonym table %s: %s", SYNONYM_TABLE_PATH, e)
+        _synonym_table = table
+    return _synonym_table
+
+
+def synonyms_available() -> bool:
+    """Whether keyword expansion can run (synonym table or WordNet)."""
+    return bool(load_synonym_table()) or nltk_ready()
+
+
+def wordnet_synonyms(keyword: str, limit: int) -> List[str]:
+    """
+    The first `limit` WordNet synonyms of a lowercased keyword: lemma names of its
+    synsets, in WordNet order, other than the keyword and at most two words long.
+    """
+    synonyms = []
+    if limit <= 0:
+        return synonyms
+    for syn in _wordnet.synsets(keyword):
+        for lemma in syn.lemmas():
+            lemma_name = lemma.name().replace('_', ' ').lower()
+            if lemma_name != keyword and len(lemma_name.split()) <= 2:
+                synonyms.append(lemma_name)
+                if len(synonyms) >= limit:
+                    return synonyms
+    return synonyms
+
+
+@lru_cache(maxsize=4096)
+def keyword_synonyms(keyword: str, max_synonyms: int = 2) -> Tuple[str, ...]:
+    """Memoized synonyms of a lowercased keyword, from the synonym table or WordNet."""
+    table = load_synonym_table()
+    if keyword in table:
+        return tuple(table[keyword][:max_synonyms])
+    if not nltk_ready():
+        return ()
+    return tuple(wordnet_synonyms(keyword, max_synonyms))
 
 
 def expand_keywords_wordnet(keywords: List[str], max_synonyms: int = 2) -> List[str]:
     """
     Expand keywords using WordNet synonyms.
-    Falls back to original keywords if NLTK unavailable.
+    Falls back to original keywords if neither a synonym table nor NLTK is available.
+    Expand once per query and pass the result to extract_relevant_information.
     """
-    if not NLTK_READY or wordnet is None:
+    if not synonyms_available():
         return keywords
 
     expanded = set(kw.lower() for kw in keywords)
 
     try:
         for keyword in keywords:
-            synonym_count = 0
-            for syn in wordnet.synsets(keyword.lower()):
-                if synonym_count >= max_synonyms:
-                    break
-
-                for lemma in syn.lemmas():
-                    lemma_name = lemma.name().replace('_', ' ').lower()
-
-                    if lemma_name != keyword.lower() and len(lemma_name.split()) <= 2:
-                        expanded.add(lemma_name)
-                        synonym_count += 1
-
-                        if synonym_count >= max_synonyms:
-                            break
+            expanded.update(keyword_synonyms(keyword.lower(), max_synonyms))
     except Exception as e:
-        print(f"⚠️  WordNet expansion failed: {e}")
+        logger.warning("WordNet expansion failed: %s", e)
         return keywords
 
     expanded_list = list(expanded)
     if len(expanded_list) > len(keywords):
-        print(f"📝 Expanded {len(keywords)} keywords to {len(expanded_list)} terms")
+        logger.debug("Expanded %d keywords to %d terms", len(keywords), len(expanded_list))
     return expanded_list
 
 
@@ -94,7 +226,8 @@ def extract_entities_from_keywords(keywords: List[str]) -> List[str]:
     Extract named entities and key terms from keywords using spaCy NER.
     Falls back to original keywords if spaCy unavailable.
     """
-    if not SPACY_AVAILABLE or nlp is None:
+    nlp = get_spacy_nlp()
+    if nlp is None:
         return keywords
 
     try:
@@ -108,20 +241,137 @@ def extract_entities_from_keywords(keywords: List[str]) -> List[str]:
                      and len(token.text) > 2]
 
         all_terms = list(set(entities + key_terms + [kw.lower() for kw in keywords]))
-        print(f"🔍 Extracted {len(all_terms)} key terms using NER")
+        logger.debug("Extracted %d key terms using NER", len(all_terms))
         return all_terms
     except Exception as e:
-        print(f"⚠️  NER extraction failed: {e}")
+        logger.warning("NER extraction failed: %s", e)
         return keywords
 
 
+def extract_keyword_entities(keywords: List[str]) -> Set[str]:
+    """
+    Named entities found in the joined keywords (lowercased).
+    Compute once per query and pass to extract_relevant_information.
+    Returns an empty set if spaCy unavailable.
+    """
+    if not spacy_available():
+        return set()
+
+    try:
+        return set(_ner_pipe([" ".join(keywords)])[0])
+    except Exception as e:
+        logger.warning("Keyword NER failed: %s", e)
+        return set()
+
+
+def extract_sentence_entities(sentences: List[str], batch_size: int = 64) -> List[List[str]]:
+    """
+    Named entities (lowercased) of every sentence, in one batched NER-only pass.
+    Returns empty lists if spaCy unavailable.
+    """
+    if not spacy_available():
+        return [[] for _ in sentences]
+
+    try:
+        return _ner_pipe(sentences, batch_size)
+    except Exception as e:
+        logger.warning("Sentence NER failed: %s", e)
+        return [[] for _ in sentences]
+
+
+def _ner_pipe(texts: List[str], batch_size: int = 64) -> List[List[str]]:
+    """Run only the NER component over texts with nlp.pipe."""
+    nlp = get_spacy_nlp()
+    disabled = [name for name in nlp.pipe_names if name != "ner"]
+    return [
+        [ent.text.lower() for ent in doc.ents]
+        for doc in nlp.pipe(texts, batch_size=batch_size, disable=disabled)
+    ]
+
+
+# Bump when the format or the content of analyze_page() output changes,
+# cached analyses with another version are ignored
+ANALYSIS_VERSION = 2
+
+
+def tokenizer_name() -> str:
+    """Name of the active tokenize_text() flavour, stored with page analyses."""
+    return "nltk" if nltk_ready() else "basic"
+
+
+def analyze_page(content: str) -> Optional[Dict]:
+    """
+    Query-independent analysis of a page, stored with the cached page
+    (DiskJsonCache analyzer hook) so cached pages are never re-parsed.
+
+    The sentences are kept as (start, end) offsets into clean_content(content)
+    and their tokens as ids into a per-page vocabulary, together with the
+    sentence lengths and document frequencies BM25 needs. Sentence entities
+    are only included when spaCy is available.
+
+    Returns:
+        {"version", "tokenizer", "sentence_count", "sentence_offsets", "vocab",
+        "token_ids", "sentence_lengths", "doc_freqs"[, "sentence_entities"]}
+        or None when the page has no sentences
+    """
+    cleaned = clean_content(content)
+    offsets = sentence_offsets(cleaned)
+    if not offsets:
+        return None
+
+    sentences = [cleaned[start:end] for start, end in offsets]
+    stats = SentenceTermStats.from_tokens([tokenize_text(sent) for sent in sentences])
+
+    analysis = {
+        "version": ANALYSIS_VERSION,
+        "tokenizer": tokenizer_name(),
+        "sentence_count": len(sentences),
+        "sentence_offsets": [list(offset) for offset in offsets],
+        **stats.to_analysis()
+    }
+    if spacy_available():
+        analysis["sentence_entities"] = extract_sentence_entities(sentences)
+    return analysis
+
+
+def _cached_analysis(analysis: Optional[Dict]) -> Optional[Dict]:
+    """Return the stored page analysis if it is current and was made with the active tokenizer."""
+    if (analysis and analysis.get("version") == ANALYSIS_VERSION
+            and analysis.get("tokenizer") == tokenizer_name()):
+        return analysis
+    return None
+
+
+def clean_content(content: str) -> str:
+    """Strip HTML tags and collapse whitespace."""
+    content = re.sub(r'<[^>]*>', ' ', content)
+    return re.sub(r'\s+', ' ', content).strip()
+
+
+def sentence_offsets(cleaned: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the sentences of already cleaned content."""
+    offsets = []
+    position = 0
+    # The pieces are separated by exactly one whitespace character
+    for piece in re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s', cleaned):
+        stripped = piece.strip()
+        if len(stripped) >= 5:
+            start = position + len(piece) - len(piece.lstrip())
+            offsets.append((start, start + len(stripped)))
+        position += len(piece) + 1
+    return offsets
+
+
 def split_sentences(content: str) -> List[str]:
     """Split content into sentences."""
-    content = re.sub(r'<[^>]*>', ' ', content)
-    content = re.sub(r'\s+', ' ', content).strip()
+    cleaned = clean_content(content)
+    return [cleaned[start:end] for start, end in sentence_offsets(cleaned)]
 
-    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|\!)\s', content)
-    return [s.strip() for s in sentences if len(s.strip()) >= 5]
+
+@lru_cache(maxsize=1)
+def _english_stopwords() -> frozenset:
+    """NLTK English stopwords, loaded once."""
+    return frozenset(_stopwords.words('english'))
 
 
 def tokenize_text(text: str, remove_stopwords_flag: bool = True) -> List[str]:
@@ -129,7 +379,7 @@ def tokenize_text(text: str, remove_stopwords_flag: bool = True) -> List[str]:
     Tokenize text and optionally remove stopwords.
     Falls back to simple split if NLTK unavailable.
     """
-    if not NLTK_READY or word_tokenize is None:
+    if not nltk_ready():
         # Fallback: simple tokenization
         tokens = re.findall(r'\b\w+\b', text.lower())
         if remove_stopwords_flag:
@@ -140,41 +390,366 @@ def tokenize_text(text: str, remove_stopwords_flag: bool = True) -> List[str]:
         return tokens
 
     try:
-        tokens = word_tokenize(text.lower())
+        tokens = _word_tokenize(text.lower())
 
         if remove_stopwords_flag:
-            stop_words = set(stopwords.words('english'))
+            stop_words = _english_stopwords()
             tokens = [t for t in tokens if t.isalnum() and t not in stop_words]
         else:
             tokens = [t for t in tokens if t.isalnum()]
 
         return tokens
     except Exception as e:
-        print(f"⚠️  Tokenization failed, using fallback: {e}")
+        logger.warning("Tokenization failed, using fallback: %s", e)
         tokens = re.findall(r'\b\w+\b', text.lower())
         return tokens
 
 
-def calculate_entity_overlap(sentence: str, keywords: List[str]) -> int:
+class SentenceTermStats:
     """
-    Calculate overlap between sentence entities and keyword entities.
-    Returns 0 if spaCy unavailable.
+    Query-independent BM25 statistics of a page's sentences.
+
+    Tokens are stored as ids into a vocabulary ordered by first appearance
+    (the order BM25Okapi sums IDFs in), flattened over the sentences, with the
+    sentence lengths and per-term document frequencies. The same statistics
+    are serialized into the page analysis, so a cached page can be scored for
+    any query without tokenizing it again.
     """
-    if not SPACY_AVAILABLE or nlp is None:
-        return 0
 
-    try:
-        sent_doc = nlp(sentence)
-        keyword_doc = nlp(" ".join(keywords))
+    def __init__(self, vocab: List[str], token_ids: np.ndarray,
+                 sentence_lengths: np.ndarray, doc_freq: np.ndarray):
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.token_ids = token_ids
+        self.sentence_lengths = sentence_lengths
+        self.doc_freq = doc_freq
+
+    @classmethod
+    def from_tokens(cls, tokenized_sentences: List[List[str]]) -> "SentenceTermStats":
+        """Build the statistics from tokenized sentences."""
+        n_sentences = len(tokenized_sentences)
+        sentence_lengths = np.fromiter((len(tokens) for tokens in tokenized_sentences),
+                                       dtype=np.int64, count=n_sentences)
+        flat_tokens = [token for tokens in tokenized_sentences for token in tokens]
+
+        term_ids = {term: i for i, term in enumerate(dict.fromkeys(flat_tokens))}
+        n_terms = len(term_ids)
+        token_ids = np.fromiter(map(term_ids.__getitem__, flat_tokens), dtype=np.int64, count=len(flat_tokens))
+
+        # Document frequency: number of distinct (sentence, term) pairs per term
+        sentence_ids = np.repeat(np.arange(n_sentences), sentence_lengths)
+        pairs = np.unique(sentence_ids * n_terms + token_ids)
+        doc_freq = np.bincount(pairs % n_terms, minlength=n_terms) if n_terms else np.zeros(0, dtype=np.int64)
+
+        return cls(list(term_ids), token_ids, sentence_lengths, doc_freq)
+
+    @classmethod
+    def from_analysis(cls, analysis: Dict) -> "SentenceTermStats":
+        """Load the statistics stored by analyze_page()."""
+        return cls(
+            analysis["vocab"],
+            np.asarray(analysis["token_ids"], dtype=np.int64),
+            np.asarray(analysis["sentence_lengths"], dtype=np.int64),
+            np.asarray(analysis["doc_freqs"], dtype=np.int64)
+        )
+
+    def to_analysis(self) -> Dict:
+        """JSON-serializable form, merged into the analyze_page() output."""
+        return {
+            "vocab": self.vocab,
+            "token_ids": self.token_ids.tolist(),
+            "sentence_lengths": self.sentence_lengths.tolist(),
+            "doc_freqs": self.doc_freq.tolist()
+        }
 
-        sent_entities = {ent.text.lower() for ent in sent_doc.ents}
-        keyword_entities = {ent.text.lower() for ent in keyword_doc.ents}
+    def bm25(self, tokenized_query: List[str], k1: float = 1.5, b: float = 0.75,
+             epsilon: float = 0.25) -> np.ndarray:
+        """
+        BM25 (Okapi) scores of every sentence for a tokenized query.
+
+        Raises:
+            ValueError: If the sentences contain no tokens at all
+        """
+        if not len(self.token_ids):
+            raise ValueError("no tokens to score")
+
+        n_sentences = len(self.sentence_lengths)
+        n_terms = len(self.vocab)
+        token_ids = self.token_ids
+        sentence_ids = np.repeat(np.arange(n_sentences), self.sentence_lengths)
+
+        # IDF only depends on the document frequency, use math.log per distinct value
+        idf_by_df = np.array([0.0] + [math.log(n_sentences - df + 0.5) - math.log(df + 0.5)
+                                      for df in range(1, n_sentences + 1)])
+        idf = idf_by_df[self.doc_freq]
+        average_idf = np.add.accumulate(idf)[-1] / n_terms
+        idf[idf < 0] = epsilon * average_idf
+
+        avgdl = int(self.sentence_lengths.sum()) / n_sentences
+        length_norm = k1 * (1 - b + b * self.sentence_lengths / avgdl)
+
+        # Sparse term frequencies restricted to the query terms
+        query_ids = [self.term_ids[q] for q in tokenized_query if q in self.term_ids]
+        scores = np.zeros(n_sentences)
+        if not query_ids:
+            return scores
+
+        unique_query_ids = np.unique(query_ids)
+        column = np.full(n_terms, -1, dtype=np.int64)
+        column[unique_query_ids] = np.arange(len(unique_query_ids))
+        mask = column[token_ids] >= 0
+        tf = np.zeros((n_sentences, len(unique_query_ids)))
+        np.add.at(tf, (sentence_ids[mask], column[token_ids[mask]]), 1)
+
+        contributions = idf[unique_query_ids] * (tf * (k1 + 1) / (tf + length_norm[:, None]))
+        for term_id in query_ids:
+            scores += contributions[:, column[term_id]]
+        return scores
+
+
+def bm25_scores(
+        tokenized_sentences: List[List[str]],
+        tokenized_query: List[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25
+) -> np.ndarray:
+    """
+    Vectorized BM25 (Okapi) scores of every sentence for a tokenized query.
 
-        return len(sent_entities.intersection(keyword_entities))
-    except Exception as e:
-        return 0
+    Produces exactly the same floats as rank_bm25.BM25Okapi(tokenized_sentences)
+    .get_scores(tokenized_query): same IDF floor (epsilon * average IDF), same
+    order of floating point operations. Term frequencies are kept as a sparse
+    (sentence, term) list and only densified for the query terms.
+
+    Raises:
+        ValueError: If the sentences contain no tokens at all
+    """
+    return SentenceTermStats.from_tokens(tokenized_sentences).bm25(tokenized_query, k1, b, epsilon)
 
 
+class KeywordMatcher:
+    """
+    Substring matcher for the keyword terms of a query, compiled once.
+
+    Terms are given in groups (e.g. original and expanded keywords). The
+    sentences of a page are joined with newlines, which no cleaned sentence
+    contains, and each distinct term is located with str.find, jumping to the
+    next sentence after every hit, so a term costs one search per sentence
+    that contains it instead of one per sentence of the page.
+    """
+
+    def __init__(self, groups: List[List[str]]):
+        self.terms = list(dict.fromkeys(term for group in groups for term in group))
+        index = {term: i for i, term in enumerate(self.terms)}
+
+        # Per group, how many times each term occurs in it
+        self._weights = np.zeros((len(groups), len(self.terms)), dtype=np.int64)
+        for g, group in enumerate(groups):
+            for term in group:
+                self._weights[g, index[term]] += 1
+
+    def count(self, lowered_sentences: List[str]) -> np.ndarray:
+        """
+        Number of terms of each group found in each sentence, the same as
+        sum(1 for term in group if term in sentence).
+
+        Returns:
+            int array of shape (groups, sentences)
+        """
+        n_sentences = len(lowered_sentences)
+        hits = np.zeros((len(self.terms), n_sentences), dtype=np.int64)
+        if n_sentences:
+            joined = "\n".join(lowered_sentences)
+            starts = list(accumulate((len(sentence) + 1 for sentence in lowered_sentences[:-1]), initial=0))
+            for t, term in enumerate(self.terms):
+                if not term:
+                    hits[t] = 1
+                    continue
+                if '\n' in term:
+                    continue
+                position = joined.find(term)
+                while position >= 0:
+                    i = bisect_right(starts, position) - 1
+                    hits[t, i] = 1
+                    if i + 1 == n_sentences:
+                        break
+                    position = joined.find(term, starts[i + 1])
+        return self._weights @ hits
+
+
+# Optional semantic rerank (RERANK_ENABLED=1): the best lexical candidates of a
+# page get a boost of RERANK_WEIGHT * cosine similarity * the page's top lexical
+# score, with at most RERANK_BUDGET_MS of encoding per query
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_WEIGHT = float(os.getenv("RERANK_WEIGHT", "0.5"))
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+
+# Sentence-transformer loaded by prompt_analyzer_llm.get_keybert()
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def keybert_encoder(texts: List[str]) -> np.ndarray:
+    """Encode texts on CPU with the KeyBERT sentence-transformer (loaded on first use)."""
+    from prompt_analyzer_llm import get_keybert
+
+    model = get_keybert().model.embedding_model
+    return model.encode(texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, device="cpu")
+
+
+def semantic_boost(lexical_scores: np.ndarray, similarities: np.ndarray, weight: float = RERANK_WEIGHT) -> np.ndarray:
+    """Score added to lexical scores for cosine similarities (negative similarities add nothing)."""
+    return weight * float(lexical_scores.max(initial=0.0)) * np.clip(similarities, 0.0, None)
+
+
+class SemanticReranker:
+    """
+    Cosine similarity between the query and candidate sentences, for blending
+    with the lexical scores of extract_relevant_information.
+
+    Sentence embeddings are cached per page content as float16 in an optional
+    store (DiskJsonCache.get/set_sentence_embeddings), so a page is encoded
+    once. Encoding time is tracked per sentence: when the missing embeddings
+    of a page would not fit in what is left of the query's RERANK_BUDGET_MS,
+    the page keeps its lexical order, so the stage backs off when the CPU is
+    busy. Encoder errors disable the reranker.
+    """
+
+    def __init__(self, encoder: Callable[[List[str]], np.ndarray] = keybert_encoder,
+                 model_name: str = EMBEDDING_MODEL, store=None,
+                 candidates: int = RERANK_CANDIDATES, budget_ms: float = RERANK_BUDGET_MS):
+        self.encoder = encoder
+        self.model_name = model_name
+        self.store = store
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.enabled = True
+        self.ms_per_sentence = 0.0  # moving average of the measured encoding time
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized float32 embeddings of texts."""
+        start = time.perf_counter()
+        vectors = np.asarray(self.encoder(texts), dtype=np.float32)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        per_sentence = elapsed_ms / max(len(texts), 1)
+        self.ms_per_sentence = per_sentence if not self.ms_per_sentence else (
+            0.8 * self.ms_per_sentence + 0.2 * per_sentence)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @traced("relevance.rerank")
+    def similarities(self, query: "RelevanceQuery", content: str, sentences: List[str],
+                     candidates: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Cosine similarity of the candidate sentences (indices into sentences)
+        to the query, or None when the page is skipped.
+        """
+        if not self.enabled or not len(candidates):
+            return None
+
+        cached = self.store.get_sentence_embeddings(content, self.model_name) if self.store else {}
+        missing = [int(i) for i in candidates if int(i) not in cached]
+        needed = len(missing) + (query.embedding is None)
+        remaining_ms = self.budget_ms - query.rerank_ms
+        if needed and self.ms_per_sentence * needed > remaining_ms:
+            logger.debug("Semantic rerank skipped (%d sentences, %.0f ms of budget left)", needed, remaining_ms)
+            return None
+
+        start = time.perf_counter()
+        try:
+            if query.embedding is None:
+                query.embedding = self.encode([" ".join(query.keywords)])[0]
+            if missing:
+                vectors = self.encode([sentences[i] for i in missing])
+                new_embeddings = dict(zip(missing, vectors))
+                cached.update(new_embeddings)
+                if self.store:
+                    self.store.set_sentence_embeddings(content, self.model_name, new_embeddings)
+        except Exception as e:
+            logger.warning("Semantic rerank disabled: %s", e)
+            self.enabled = False
+            return None
+        finally:
+            query.rerank_ms += (time.perf_counter() - start) * 1000
+
+        matrix = np.stack([cached[int(i)] for i in candidates]).astype(np.float32)
+        return matrix @ query.embedding
+
+
+class RelevanceQuery:
+    """
+    Query-side state of extract_relevant_information: keyword sets, WordNet
+    expansion, NER key terms and entities, the tokenized BM25 query and the
+    keyword matcher. Compile it once per search_and_extract call (or once per
+    prompt) and pass it for every page of the query.
+
+    It also accumulates corpus-level statistics of the pages scored against
+    it (sentence and token counts, document frequencies of the query terms),
+    which the passage ranker uses to compare sentences across pages.
+    """
+
+    def __init__(self, keywords: List[str], use_expansion: bool = True, use_ner: bool = True,
+                 keyword_entities: Optional[Set[str]] = None,
+                 expanded_keywords: Optional[List[str]] = None,
+                 reranker: Optional[SemanticReranker] = None):
+        self.keywords = keywords
+        self.reranker = reranker
+        self.embedding = None  # query embedding, computed by the reranker on first use
+        self.rerank_ms = 0.0
+        self.original_terms = set(kw.lower() for kw in keywords)
+
+        # Expand keywords using WordNet (unless the caller already expanded them)
+        if not use_expansion:
+            expanded_keywords = keywords.copy()
+        elif expanded_keywords is None:
+            if synonyms_available():
+                expanded_keywords = expand_keywords_wordnet(keywords, max_synonyms=2)
+            else:
+                logger.debug("Keyword expansion skipped (NLTK not available)")
+                expanded_keywords = keywords.copy()
+        self.expanded_keywords = expanded_keywords
+
+        # Extract entities from keywords using NER
+        key_terms = keywords
+        self.keyword_entities: Set[str] = set()
+        if use_ner and spacy_available():
+            key_terms = extract_entities_from_keywords(keywords)
+            self.keyword_entities = (keyword_entities if keyword_entities is not None
+                                     else extract_keyword_entities(keywords))
+        elif use_ner:
+            logger.debug("NER skipped (spaCy not available)")
+        self.key_terms = key_terms
+
+        # Combine all search terms
+        all_search_terms = list(set(
+            [kw.lower() for kw in keywords] +
+            [kw.lower() for kw in expanded_keywords] +
+            [term.lower() for term in key_terms]
+        ))
+        self.tokenized_query = tokenize_text(" ".join(all_search_terms))
+
+        self.expanded_terms = [kw.lower() for kw in expanded_keywords if kw.lower() not in self.original_terms]
+        self.matcher = KeywordMatcher([list(self.original_terms), self.expanded_terms])
+
+        self.corpus_sentences = 0
+        self.corpus_tokens = 0
+        self.corpus_doc_freqs = dict.fromkeys(self.tokenized_query, 0)
+
+        logger.debug("Searching with %d query terms", len(self.tokenized_query))
+
+    def observe(self, term_stats: SentenceTermStats) -> None:
+        """Add the sentence statistics of a scored page to the corpus-level counts."""
+        self.corpus_sentences += len(term_stats.sentence_lengths)
+        self.corpus_tokens += int(term_stats.sentence_lengths.sum())
+        for term in self.corpus_doc_freqs:
+            term_id = term_stats.term_ids.get(term)
+            if term_id is not None:
+                self.corpus_doc_freqs[term] += int(term_stats.doc_freq[term_id])
+
+
+@traced("relevance.extract")
 def extract_relevant_information(
         content: str,
         keywords: List[str],
@@ -184,7 +759,11 @@ def extract_relevant_information(
         expansion_weight: float = 0.5,
         bm25_weight: float = 1.0,
         keyword_weight: float = 2.0,
-        entity_weight: float = 1.5
+        entity_weight: float = 1.5,
+        keyword_entities: Optional[Set[str]] = None,
+        analysis: Optional[Dict] = None,
+        expanded_keywords: Optional[List[str]] = None,
+        query: Optional[RelevanceQuery] = None
 ) -> List[Tuple[str, float, Dict]]:
     """
     Extract most relevant sentences using BM25, WordNet expansion, and optional NER.
@@ -199,99 +778,101 @@ def extract_relevant_information(
         bm25_weight: Weight for BM25 score
         keyword_weight: Weight for original keyword matches
         entity_weight: Weight for entity matches
+        keyword_entities: Precomputed extract_keyword_entities(keywords)
+        analysis: Stored analyze_page(content) output of a cached page, its
+            sentences, term statistics and entities are reused
+        expanded_keywords: Precomputed expand_keywords_wordnet(keywords)
+        query: RelevanceQuery compiled for the keywords, pass it when scoring
+            several pages for the same query (keywords, use_expansion, use_ner,
+            keyword_entities and expanded_keywords are then taken from it); its
+            reranker, if any, blends in embedding similarity of the top candidates
 
     Returns:
         List of (sentence, score, metadata) tuples
     """
-    # Split content into sentences
-    sentences = split_sentences(content)
-    print(f"📄 Split content into {len(sentences)} sentences")
+    # Reuse the sentences and term statistics of an analyzed page, otherwise split and tokenize
+    stored = _cached_analysis(analysis)
+    if stored:
+        cleaned = clean_content(content)
+        sentences = [cleaned[start:end] for start, end in stored["sentence_offsets"]]
+        logger.debug("Loaded %d analyzed sentences", len(sentences))
+    else:
+        sentences = split_sentences(content)
+        logger.debug("Split content into %d sentences", len(sentences))
 
     if not sentences:
         return []
 
-    # Prepare keywords
-    original_keywords_set = set(kw.lower() for kw in keywords)
-    expanded_keywords = keywords.copy()
-
-    # Expand keywords using WordNet
-    if use_expansion and NLTK_READY:
-        expanded_keywords = expand_keywords_wordnet(keywords, max_synonyms=2)
-    elif use_expansion and not NLTK_READY:
-        print("⚠️  Keyword expansion skipped (NLTK not available)")
-
-    # Extract entities from keywords using NER
-    key_terms = keywords
-    if use_ner and SPACY_AVAILABLE:
-        key_terms = extract_entities_from_keywords(keywords)
-    elif use_ner and not SPACY_AVAILABLE:
-        print("⚠️  NER skipped (spaCy not available)")
-
-    # Tokenize sentences for BM25
-    tokenized_sentences = [tokenize_text(sent) for sent in sentences]
-
-    # Combine all search terms
-    all_search_terms = list(set(
-        [kw.lower() for kw in keywords] +
-        [kw.lower() for kw in expanded_keywords] +
-        [term.lower() for term in key_terms]
-    ))
-    tokenized_query = tokenize_text(" ".join(all_search_terms))
-
-    print(f"🔎 Searching with {len(tokenized_query)} query terms")
+    if query is None:
+        query = RelevanceQuery(keywords, use_expansion, use_ner, keyword_entities, expanded_keywords)
 
     # Calculate BM25 scores
     try:
-        bm25 = BM25Okapi(tokenized_sentences)
-        bm25_scores = bm25.get_scores(tokenized_query)
+        if stored:
+            term_stats = SentenceTermStats.from_analysis(stored)
+        else:
+            term_stats = SentenceTermStats.from_tokens([tokenize_text(sent) for sent in sentences])
+        scores = term_stats.bm25(query.tokenized_query)
     except Exception as e:
-        print(f"⚠️  BM25 scoring failed: {e}")
+        logger.warning("BM25 scoring failed: %s", e)
         return []
+    query.observe(term_stats)
 
-    # Calculate combined scores
-    results = []
-    for i, (sentence, bm25_score) in enumerate(zip(sentences, bm25_scores)):
-        sentence_lower = sentence.lower()
+    # Count original and expanded keyword matches for all sentences in one pass
+    original_matches, expanded_matches = query.matcher.count([sentence.lower() for sentence in sentences])
 
-        # Count original keyword matches
-        original_matches = sum(1 for kw in original_keywords_set if kw in sentence_lower)
+    # Calculate entity overlap with one batched NER pass per page (or none for analyzed pages)
+    entity_overlap = np.zeros(len(sentences), dtype=np.int64)
+    if query.keyword_entities:
+        if stored and "sentence_entities" in stored:
+            sentence_entities = stored["sentence_entities"]
+        else:
+            sentence_entities = extract_sentence_entities(sentences)
+        entity_overlap = np.array([len(query.keyword_entities.intersection(ents)) for ents in sentence_entities],
+                                  dtype=np.int64)
+
+    # Combine scores
+    final_scores = (
+            scores * bm25_weight +
+            original_matches * keyword_weight +
+            expanded_matches * expansion_weight +
+            entity_overlap * entity_weight
+    )
 
-        # Count expanded keyword matches
-        expanded_matches = sum(
-            1 for kw in expanded_keywords
-            if kw.lower() not in original_keywords_set and kw.lower() in sentence_lower
-        )
+    # Sort (stable, like list.sort(reverse=True)) and filter
+    order = np.argsort(-final_scores, kind='stable')
+    relevant = order[final_scores[order] > 0]
 
-        # Calculate entity overlap
-        entity_overlap = 0
-        if use_ner and SPACY_AVAILABLE:
-            entity_overlap = calculate_entity_overlap(sentence, keywords)
-
-        # Combine scores
-        final_score = (
-                bm25_score * bm25_weight +
-                original_matches * keyword_weight +
-                expanded_matches * expansion_weight +
-                entity_overlap * entity_weight
-        )
+    # Optional semantic rerank of the best lexical candidates
+    similarities = {}
+    if query.reranker is not None:
+        candidates = relevant[:query.reranker.candidates]
+        cosine = query.reranker.similarities(query, content, sentences, candidates)
+        if cosine is not None:
+            final_scores = final_scores.copy()
+            final_scores[candidates] += semantic_boost(final_scores[candidates], cosine)
+            similarities = dict(zip(candidates.tolist(), cosine.tolist()))
+            order = np.argsort(-final_scores, kind='stable')
+            relevant = order[final_scores[order] > 0]
+
+    logger.debug("Found %d relevant sentences (returning top %d)", len(relevant), top_n)
 
+    results = []
+    for i in relevant[:top_n]:
         metadata = {
-            'bm25_score': round(bm25_score, 3),
-            'original_matches': original_matches,
-            'expanded_matches': expanded_matches,
-            'entity_overlap': entity_overlap,
-            'sentence_length': len(sentence.split())
+            'bm25_score': round(scores[i], 3),
+            'original_matches': int(original_matches[i]),
+            'expanded_matches': int(expanded_matches[i]),
+            'entity_overlap': int(entity_overlap[i]),
+            'sentence_length': len(sentences[i].split())
         }
+        if i in similarities:
+            metadata['semantic_score'] = round(similarities[i], 3)
+        results.append((sentences[i], final_scores[i], metadata))
 
-        results.append((sentence, final_score, metadata))
-
-    # Sort and filter
-    results.sort(key=lambda x: x[1], reverse=True)
-    filtered_results = [(s, score, meta) for s, score, meta in results if score > 0]
+    return results
 
-    print(f"✅ Found {len(filtered_results)} relevant sentences (returning top {top_n})")
 
-    return filtered_results[:top_n]
 # Example usage
 if __name__ == "__main__":
     content = """
@@ -312,8 +893,9 @@ if __name__ == "__main__":
     print("\n" + "=" * 80)
     print("TESTING RELEVANCE EXTRACTION")
     print("=" * 80)
-    print(f"NLTK Ready: {NLTK_READY}")
-    print(f"spaCy Available: {SPACY_AVAILABLE}")
+    print(f"NLP Profile: {NLP_PROFILE}")
+    print(f"NLTK Ready: {nltk_ready()}")
+    print(f"spaCy Available: {spacy_available()}")
     print("=" * 80)
 
     # Try full-featured version
@@ -0,0 +1,45 @@
+"""
+Request coalescing for the async pipeline.
+
+Concurrent callers asking for the same key share one in-flight task and its
+result instead of each doing the same work (e.g. several users scraping the
+same URL at the same moment).
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single in-flight task."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) unless a call for key is already in flight.
+
+        Args:
+            key: Coalescing key, callers with equal keys share one call
+            func: Coroutine function to run
+            *args, **kwargs: Arguments for func (ignored when joining a call)
+
+        Returns:
+            The result of the shared call. Exceptions are raised to every caller.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so a cancelled caller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def in_flight(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._inflight)
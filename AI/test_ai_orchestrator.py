@@ -0,0 +1,185 @@
+"""
+Tests for the orchestrator's search fan-out and speculative generation.
+"""
+
+import json
+import asyncio
+
+import pytest
+
+import web_search
+import ai_orchestrator
+from answer_cache import AnswerCache
+from llm_scheduler import LLMQueueFull
+from tracing import current_span
+from unified_stream import EVENT_TYPES
+from cache.disk_cache import DiskJsonCache
+from search_providers import LocalSearchProvider
+
+PAGES = [
+    ("https://a.example/solar", "Solar panel efficiency",
+     "Solar panel efficiency measures how much sunlight a panel turns into electricity. "
+     "Modern solar panels reach an efficiency of about 22 percent. "
+     "Panel efficiency drops slightly as the solar cells get hotter."),
+    ("https://b.example/solar", "How efficient are solar panels",
+     "Monocrystalline solar panels have the highest efficiency of common panels. "
+     "The efficiency of solar panels has doubled since the 1990s. "
+     "Dust on a panel lowers its efficiency until it is cleaned."),
+    ("https://c.example/solar", "Solar efficiency records",
+     "Laboratory solar cells have passed 47 percent efficiency. "
+     "Record efficiency solar panels use several layers of cells. "
+     "Such panels are too expensive for rooftops."),
+]
+
+
+@pytest.fixture(autouse=True)
+def local_search(tmp_path, monkeypatch):
+    """Search an empty local corpus, whatever SEARCH_PROVIDER is set to."""
+    monkeypatch.setattr(web_search, "search_provider", LocalSearchProvider(str(tmp_path)))
+
+
+def test_warm_cache_answers_every_query_without_web_search(tmp_path, monkeypatch):
+    """Three queries of a prompt answered from the cache never search the web or scrape."""
+    cache = DiskJsonCache(str(tmp_path / "cache"))
+    searched = []
+    monkeypatch.setattr(web_search, "cache", cache)
+    monkeypatch.setattr(web_search, "search_web", lambda query, num_results=10: searched.append(query) or [])
+    monkeypatch.setattr(web_search, "VECTOR_INDEX_ENABLED", False)
+    monkeypatch.setattr(web_search, "CACHE_MIN_SCORE", 0.2)
+
+    async def run():
+        for url, title, content in PAGES:
+            await cache.set(url, {"url": url, "title": title, "content": content})
+        queries = ["solar panel efficiency", "how efficient are solar panels", "solar efficiency records"]
+        return [information async for _, information in ai_orchestrator.search_queries_concurrently(
+            queries, ["solar", "panel", "efficiency"])]
+
+    results = asyncio.run(run())
+
+    assert searched == []
+    urls = [info["url"] for information in results for info in information]
+    assert sorted(urls) == sorted(url for url, _, _ in PAGES)
+    assert all(info["retrieval"] == "cache" for information in results for info in information)
+
+
+def passages(query, count, start=0):
+    """A search_and_extract result with `count` distinct keyword-matching passages."""
+    sentences = [(f"Solar fact {i} from {query}: panels number {i} convert {i * 7} units of light.",
+                  1.0, {"original_matches": 1}) for i in range(start, start + count)]
+    return [{"url": f"https://{query}.example", "title": query, "relevant_sentences": sentences,
+             "retrieval": "web"}]
+
+
+class SpeculativePipeline:
+    """
+    Stubs the analysis, the per-query search and the token stream around the real
+    fan-out and speculative generation: "q1" answers at once, "q2" and "q3" only
+    once an answer has started streaming.
+    """
+
+    def __init__(self, monkeypatch, mode, late_passages=2):
+        self.late_passages = late_passages
+        self.cancelled = []
+        self.answers = []
+        self.answer_spans = []
+        self.answering = asyncio.Event()
+        self.cache = AnswerCache(ttl=60)
+        monkeypatch.setattr(ai_orchestrator, "SPECULATIVE_GENERATION", mode)
+        monkeypatch.setattr(ai_orchestrator, "SPECULATIVE_MIN_PASSAGES", 4)
+        monkeypatch.setattr(ai_orchestrator, "SPECULATIVE_REFINE_MIN_NEW", 2)
+        monkeypatch.setattr(ai_orchestrator, "answer_cache", self.cache)
+        monkeypatch.setattr(ai_orchestrator, "analyze_prompt_async", self.analyze)
+        monkeypatch.setattr(ai_orchestrator, "retrieve_from_cache", self.retrieve_from_cache)
+        monkeypatch.setattr(ai_orchestrator, "search_and_extract", self.search_and_extract)
+        monkeypatch.setattr(ai_orchestrator, "generate_coherent_response_stream", self.answer)
+
+    async def analyze(self, prompt, debug=False):
+        return {"intents": ["question_answering"], "keywords": [{"term": "solar", "score": 1.0}],
+                "search_queries": ["q1", "q2", "q3"]}
+
+    async def retrieve_from_cache(self, keywords):
+        return []
+
+    async def search_and_extract(self, query, keywords, **kwargs):
+        if query == "q1":
+            return passages(query, 4)
+        try:
+            await self.answering.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(query)
+            raise
+        return passages(query, self.late_passages if query == "q2" else 0)
+
+    async def answer(self, prompt, context):
+        self.answers.append(context)
+        self.answer_spans.append(current_span().name)
+        self.answering.set()
+        yield f"answer {len(self.answers)}"
+
+    def run(self, prompt="How efficient are solar panels?"):
+        async def collect():
+            return [json.loads(chunk[len("data: "):])
+                    async for chunk in ai_orchestrator.generate_unified_stream(prompt)]
+        return asyncio.run(collect())
+
+
+def events_of(events, event_type):
+    return [event["data"] for event in events if event["type"] == EVENT_TYPES[event_type]]
+
+
+def test_speculative_ignore_cancels_pending_queries(monkeypatch):
+    """In ignore mode the answer starts after the first query and the others are cancelled."""
+    pipeline = SpeculativePipeline(monkeypatch, "ignore")
+    events = pipeline.run()
+
+    assert sorted(pipeline.cancelled) == ["q2", "q3"]
+    assert [data["pending_queries"] for data in events_of(events, "SEARCH_COMPLETED")] == [2]
+    assert len(events_of(events, "RESPONSE_STARTED")) == 1
+    assert [data["token"] for data in events_of(events, "RESPONSE_TOKEN")] == ["answer 1"]
+    assert pipeline.answer_spans == ["generate_unified_stream"]
+
+
+def test_speculative_refine_answers_again_with_new_passages(monkeypatch):
+    """In refine mode late queries adding enough passages trigger a refined answer, the one cached."""
+    pipeline = SpeculativePipeline(monkeypatch, "refine", late_passages=2)
+    events = pipeline.run()
+
+    assert pipeline.cancelled == []
+    completed = events_of(events, "SEARCH_COMPLETED")
+    assert [data.get("refined", False) for data in completed] == [False, True]
+    assert [data.get("refined", False) for data in events_of(events, "RESPONSE_STARTED")] == [False, True]
+    assert [data["current"] for data in events_of(events, "SEARCH_PROGRESS") if data.get("late")] == [2, 3]
+    assert "q2" in pipeline.answers[1] and "q2" not in pipeline.answers[0]
+    # The answer spans are not nested under the search span
+    assert pipeline.answer_spans == ["generate_unified_stream", "generate_unified_stream"]
+
+    cached = asyncio.run(pipeline.cache.get("How efficient are solar panels?", streamed=True))
+    assert cached.tokens == ["answer 2"]
+
+
+def test_speculative_refine_keeps_answer_without_enough_new_passages(monkeypatch):
+    """In refine mode fewer than SPECULATIVE_REFINE_MIN_NEW new passages keep the speculative answer."""
+    pipeline = SpeculativePipeline(monkeypatch, "refine", late_passages=1)
+    events = pipeline.run()
+
+    assert len(events_of(events, "SEARCH_COMPLETED")) == 1
+    assert len(events_of(events, "RESPONSE_STARTED")) == 1
+    assert len(pipeline.answers) == 1
+    cached = asyncio.run(pipeline.cache.get("How efficient are solar panels?", streamed=True))
+    assert cached.tokens == ["answer 1"]
+
+
+def test_speculative_refine_closes_late_queries_when_llm_queue_is_full(monkeypatch):
+    """A full LLM queue ends the stream with an error and cancels the queries still running."""
+    pipeline = SpeculativePipeline(monkeypatch, "refine")
+
+    def submit(priority):
+        raise LLMQueueFull("queue full")
+    monkeypatch.setattr(ai_orchestrator.llm_scheduler, "submit", submit)
+    events = pipeline.run()
+
+    assert sorted(pipeline.cancelled) == ["q2", "q3"]
+    assert [data["message"] for data in events_of(events, "PROCESSING_ERROR")] == [ai_orchestrator.LLM_BUSY_MESSAGE]
+    assert events[-1]["type"] == EVENT_TYPES["STREAM_COMPLETE"]
+    assert pipeline.answers == []
+    assert len(pipeline.cache) == 0
@@ -0,0 +1,59 @@
+"""
+Tests for the answer cache.
+"""
+
+import asyncio
+
+import numpy as np
+
+from answer_cache import AnswerCache, normalize_prompt
+
+
+def test_normalize_prompt():
+    """Case, punctuation and whitespace do not change the key."""
+    assert normalize_prompt("  What is   Python?? ") == normalize_prompt("what is python") == "what is python"
+    assert normalize_prompt("Ｐｙｔｈｏｎ 3.12") == "python 3 12"
+
+
+def test_exact_hit_and_ttl():
+    """A normalized prompt hits until the TTL expires; streams only get replayable entries."""
+    async def run():
+        cache = AnswerCache(ttl=60)
+        await cache.put("What is Python?", "A language.")
+        assert (await cache.get("what is python")).answer == "A language."
+        assert await cache.get("what is python", streamed=True) is None
+
+        events = [{"type": "intent_detected", "data": {"status": "started"}}]
+        await cache.put("What is Python?", "A language.", events, ["A ", "language."])
+        assert (await cache.get("What is python", streamed=True)).tokens == ["A ", "language."]
+        # A later non-streamed answer does not replace the replayable one
+        await cache.put("What is Python?", "Other.")
+        assert (await cache.get("What is python")).events == events
+
+        cache._entries["what is python"].created_at -= 61
+        assert await cache.get("What is Python?") is None
+        assert len(cache) == 0
+        assert cache.stats == {"exact_hits": 3, "semantic_hits": 0, "misses": 2}
+
+    asyncio.run(run())
+
+
+def test_semantic_hit_and_lru():
+    """Similar prompts hit through the encoder unless their numbers differ; old entries are evicted."""
+    def encoder(texts):
+        # Fake embedding: "iphone" prompts point one way, everything else another
+        return np.array([[1.0, 0.0] if "iphone" in text else [0.0, 1.0] for text in texts])
+
+    async def run():
+        cache = AnswerCache(ttl=60, max_entries=2, encoder=encoder, similarity=0.99)
+        await cache.put("iPhone 15 camera review", "Good camera.")
+        assert (await cache.get("review of the iphone 15 camera")).answer == "Good camera."
+        assert await cache.get("iPhone 14 camera review") is None
+        assert cache.stats["semantic_hits"] == 1
+
+        await cache.put("weather today", "Sunny.")
+        await cache.put("news today", "Nothing new.")
+        assert len(cache) == 2
+        assert await cache.get("iPhone 15 camera review") is None
+
+    asyncio.run(run())
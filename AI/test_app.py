@@ -0,0 +1,113 @@
+"""
+Tests for the /generate-response admission control, with the pipeline stubbed.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from llm_scheduler import LLMQueueFull
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A client with 1 generation slot, no waiting requests and a fresh semaphore."""
+    monkeypatch.setattr(app, "MAX_CONCURRENT_GENERATIONS", 1)
+    monkeypatch.setattr(app, "MAX_PENDING_GENERATIONS", 0)
+    monkeypatch.setattr(app, "_generation_slots", asyncio.Semaphore(1))
+    with TestClient(app.app) as test_client:
+        yield test_client
+    assert app._generations_in_progress == 0
+
+
+def stub_pipeline(monkeypatch, pipeline):
+    monkeypatch.setattr(app, "generate_response_with_web_search", pipeline)
+
+
+def test_generate_response(client, monkeypatch):
+    """The pipeline's answer is returned as the message."""
+    async def pipeline(prompt):
+        return f"answer to {prompt}"
+    stub_pipeline(monkeypatch, pipeline)
+
+    response = client.post("/generate-response", json={"prompt": "solar panels"})
+
+    assert response.status_code == 200
+    assert response.json() == {"message": "answer to solar panels"}
+    assert app._generations_in_progress == 0
+
+
+def test_empty_prompt_is_rejected(client, monkeypatch):
+    """A blank prompt gets 400 without running the pipeline."""
+    calls = []
+
+    async def pipeline(prompt):
+        calls.append(prompt)
+        return ""
+    stub_pipeline(monkeypatch, pipeline)
+
+    response = client.post("/generate-response", json={"prompt": "   "})
+
+    assert response.status_code == 400
+    assert calls == []
+    assert app._generations_in_progress == 0
+
+
+def test_overload_beyond_max_pending(client, monkeypatch):
+    """With the only slot taken and no room to wait, a second request gets 503."""
+    started = threading.Event()
+    release = threading.Event()
+
+    async def pipeline(prompt):
+        started.set()
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return "done"
+    stub_pipeline(monkeypatch, pipeline)
+
+    first = {}
+    worker = threading.Thread(
+        target=lambda: first.update(response=client.post("/generate-response", json={"prompt": "first"})))
+    worker.start()
+    assert started.wait(5)
+
+    response = client.post("/generate-response", json={"prompt": "second"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert app._generations_in_progress == 1
+
+    release.set()
+    worker.join(5)
+    assert first["response"].status_code == 200
+    assert app._generations_in_progress == 0
+
+
+def test_llm_queue_full(client, monkeypatch):
+    """A full LLM queue is reported as 503."""
+    async def pipeline(prompt):
+        raise LLMQueueFull("queue full")
+    stub_pipeline(monkeypatch, pipeline)
+
+    response = client.post("/generate-response", json={"prompt": "solar panels"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert app._generations_in_progress == 0
+
+
+def test_timeout(client, monkeypatch):
+    """A request not answered within GENERATE_TIMEOUT_SECONDS gets 504."""
+    monkeypatch.setattr(app, "GENERATE_TIMEOUT_SECONDS", 0.05)
+
+    async def pipeline(prompt):
+        await asyncio.sleep(10)
+        return "too late"
+    stub_pipeline(monkeypatch, pipeline)
+
+    response = client.post("/generate-response", json={"prompt": "solar panels"})
+
+    assert response.status_code == 504
+    assert app._generations_in_progress == 0
@@ -0,0 +1,76 @@
+"""
+Tests for the LLM scheduler.
+"""
+
+import asyncio
+
+import pytest
+
+from llm_scheduler import (
+    LLMScheduler, LLMQueueFull, PRIORITY_STREAM, PRIORITY_RESPONSE, PRIORITY_QUERY_GENERATION
+)
+
+
+def test_slots_and_priority_order():
+    """At most `slots` calls run; waiting calls are granted by priority, then arrival."""
+    async def run():
+        scheduler = LLMScheduler(slots=2, max_queue=10)
+        order = []
+
+        async def call(name, priority, gate):
+            async with scheduler.slot(priority):
+                order.append(name)
+                assert scheduler.active <= 2
+                await gate.wait()
+
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(call(name, priority, gate)) for name, priority in [
+            ("first", PRIORITY_QUERY_GENERATION), ("second", PRIORITY_QUERY_GENERATION),
+            ("queries", PRIORITY_QUERY_GENERATION), ("response", PRIORITY_RESPONSE),
+            ("stream", PRIORITY_STREAM)]]
+        await asyncio.sleep(0.01)
+        assert order == ["first", "second"]
+        assert scheduler.stats()["queued"] == 3
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order == ["first", "second", "stream", "response", "queries"]
+        assert scheduler.stats()["completed"] == 5 and scheduler.active == 0
+
+    asyncio.run(run())
+
+
+def test_positions_rejection_and_cancel():
+    """Waiting tickets report their position; a full queue rejects; released tickets leave the queue."""
+    async def run():
+        scheduler = LLMScheduler(slots=1, max_queue=2)
+        running = scheduler.submit(PRIORITY_STREAM)
+        assert running.granted
+
+        low = scheduler.submit(PRIORITY_QUERY_GENERATION)
+        high = scheduler.submit(PRIORITY_STREAM)
+        assert (scheduler.position(high), scheduler.position(low)) == (1, 2)
+        assert scheduler.is_full()
+        with pytest.raises(LLMQueueFull):
+            scheduler.submit(PRIORITY_STREAM)
+        assert scheduler.stats()["rejected"] == 1
+
+        positions = []
+
+        async def follow():
+            async for position in low.positions():
+                positions.append(position)
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0)
+        high.release()  # leaves the queue without running
+        await asyncio.sleep(0)
+        running.release()
+        await follower
+        assert positions == [2, 1]
+        assert low.granted and scheduler.queued == 0
+        low.release()
+        low.release()
+        assert scheduler.active == 0
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+"""
+Tests for structured logging and lazy progress messages.
+"""
+
+import io
+import json
+import queue
+import asyncio
+import logging
+
+from log_config import setup_logging, flush_logging, get_logger, parse_levels, NonBlockingQueueHandler
+from tracing import span
+import scrape_util
+
+
+class Expensive:
+    """An argument that records whether it was ever formatted."""
+
+    def __init__(self):
+        self.formatted = False
+
+    def __str__(self):
+        self.formatted = True
+        return "expensive"
+
+
+def test_levels_json_fields_and_lazy_formatting():
+    """Per-module levels gate records before formatting; records carry extra fields and the trace id."""
+    assert parse_levels("scrape_util=DEBUG, web_search=warning,bad=LOUD,=INFO") == {
+        "scrape_util": 10, "web_search": 30}
+    stream = io.StringIO()
+    setup_logging("INFO", "test.quiet=WARNING,test.verbose=DEBUG", "json", stream)
+    try:
+        quiet = Expensive()
+        get_logger("test.quiet").info("dropped %s", quiet)
+        get_logger("test.verbose").debug("kept %s", Expensive(), extra={"url": "https://a.example"})
+        with span("request") as root:
+            get_logger("test.other").info("in a span")
+        get_logger("test.other").debug("below the default level")
+    finally:
+        flush_logging()
+        setup_logging()
+        get_logger("test.quiet").setLevel(0)
+        get_logger("test.verbose").setLevel(0)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["message"] for r in records] == ["kept expensive", "in a span"]
+    assert not quiet.formatted
+    assert records[0]["logger"] == "test.verbose"
+    assert records[0]["level"] == "DEBUG"
+    assert records[0]["url"] == "https://a.example"
+    assert records[1]["trace_id"] == root.trace.trace_id
+
+
+def test_progress_log_skips_formatting_and_full_queue_drops():
+    """Without a callback and with DEBUG off nothing is formatted; a full queue drops records."""
+    scrape_util.logger.setLevel("INFO")
+    unused = Expensive()
+    messages = []
+    try:
+        asyncio.run(scrape_util.progress_log(None, "Fetched %s", unused))
+        assert not unused.formatted
+
+        asyncio.run(scrape_util.progress_log(messages.append, "Fetched %d bytes from %s", 512, "a.example"))
+    finally:
+        scrape_util.logger.setLevel(0)
+    assert messages == ["Fetched 512 bytes from a.example"]
+
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        handler.handle(logging.LogRecord("test.flood", logging.WARNING, __file__, 0, "flood", (), None))
+    assert handler.dropped == 2
+    assert handler.queue.qsize() == 1
@@ -0,0 +1,53 @@
+"""
+Tests for the in-process metrics registry.
+"""
+
+import time
+import asyncio
+
+from metrics import MetricsRegistry, monitor_event_loop_lag, EVENT_LOOP_LAG
+
+
+def test_render_prometheus_text():
+    """Counters, histograms (cumulative buckets) and collector samples render in the text format."""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("status",))
+    assert registry.counter("requests_total", "Requests", ("status",)) is requests
+    requests.inc(status=200)
+    requests.inc(2, status=200)
+    latency = registry.histogram("latency_seconds", "Latency", ("method",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, method="custom")
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Waiting calls", [({"pool": 'a"b'}, 4)])])
+    registry.add_collector(lambda: 1 / 0)  # failing collectors are skipped
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 3' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{method="custom",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{method="custom",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{method="custom",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{method="custom"} 3.65' in lines
+    assert 'latency_seconds_count{method="custom"} 4' in lines
+    assert 'queue_depth{pool="a\\"b"} 4' in lines
+
+
+def test_event_loop_lag_monitor():
+    """A callback blocking the loop shows up as lag."""
+    async def run():
+        stop = asyncio.Event()
+        before = EVENT_LOOP_LAG._values.get((), [None, 0.0, 0])[2]
+        monitor = asyncio.create_task(monitor_event_loop_lag(0.01, stop))
+        await asyncio.sleep(0.005)
+        time.sleep(0.05)  # blocks the loop
+        await asyncio.sleep(0.02)
+        stop.set()
+        await monitor
+        return before
+
+    before = asyncio.run(run())
+    _, total, count = EVENT_LOOP_LAG._values[()]
+    assert count > before
+    assert total >= 0.03
@@ -0,0 +1,95 @@
+"""
+Tests for cross-page passage ranking.
+"""
+
+from passage_ranker import (rank_passages, build_context, minhash_signature, estimated_jaccard, estimate_tokens,
+                            SOURCE_SEPARATOR)
+from search_utils import RelevanceQuery, extract_relevant_information
+
+
+PAGE_A = """
+Solar panels convert sunlight into electricity using photovoltaic cells.
+Home battery storage lets households keep solar energy for the night.
+The company was founded in 1998 and has offices in three countries.
+"""
+
+PAGE_B = """
+A home battery stores solar power and releases it when panels stop producing.
+Home battery storage lets households keep solar energy for the night!
+Our newsletter covers gardening, cooking and travel tips every week.
+"""
+
+
+def _information(query):
+    information = []
+    for url, content in (("https://a.example", PAGE_A), ("https://b.example", PAGE_B)):
+        relevant = extract_relevant_information(content, query.keywords, top_n=8, query=query)
+        information.append({"url": url, "title": url, "relevant_sentences": relevant, "retrieval": "web"})
+    return information
+
+
+def test_minhash_estimates_similarity():
+    """Identical passages have similarity 1, unrelated ones close to 0."""
+    a = minhash_signature("Home battery storage lets households keep solar energy for the night.")
+    b = minhash_signature("home battery storage lets households keep solar energy for the night!")
+    c = minhash_signature("Our newsletter covers gardening, cooking and travel tips every week.")
+    assert estimated_jaccard(a, b) == 1.0
+    assert estimated_jaccard(a, c) < 0.2
+
+
+def test_rank_passages_pools_and_dedupes_across_pages():
+    """Passages from both pages are ranked together and the near-duplicate is dropped."""
+    query = RelevanceQuery(["solar", "battery"], use_expansion=False, use_ner=False)
+    information = _information(query)
+    assert query.corpus_sentences == 6
+
+    ranked, stats = rank_passages(information, query)
+
+    sentences = [s for info in ranked for s, _, _ in info["relevant_sentences"]]
+    assert stats["duplicates"] == 1
+    assert stats["passages"] == len(sentences) == stats["candidates"] - 1
+    assert sum("keep solar energy" in s for s in sentences) == 1
+    assert {info["url"] for info in ranked} == {"https://a.example", "https://b.example"}
+    scores = [score for info in ranked for _, score, _ in info["relevant_sentences"]]
+    assert max(scores) == ranked[0]["relevant_sentences"][0][1]
+
+
+def test_rank_passages_respects_token_budget():
+    """Only passages whose text, source lines and separators fit the budget are kept, the rest reported."""
+    query = RelevanceQuery(["solar", "battery"], use_expansion=False, use_ner=False)
+    information = _information(query)
+
+    ranked, stats = rank_passages(information, query, token_budget=40)
+
+    used = sum(estimate_tokens(f"Source: {info['title']} ({info['url']})") +
+               sum(estimate_tokens(s) for s, _, _ in info["relevant_sentences"]) for info in ranked)
+    used += estimate_tokens(SOURCE_SEPARATOR) * (len(ranked) - 1)
+    assert 0 < stats["tokens"] == used <= stats["budget"] == 40
+    assert stats["trimmed_sentences"] > 0
+    assert stats["passages"] + stats["duplicates"] + stats["trimmed_sentences"] == stats["candidates"]
+
+
+def test_build_context_renders_ranked_sources():
+    """The context is the kept passages per source, in rank order, within the budget."""
+    information = [
+        {"url": "https://a.example", "title": "A", "relevant_sentences": [
+            ("Home battery storage lets households keep solar energy for the night.", 0.9, {}),
+            ("The company was founded in 1998 and has offices in three countries.", 0.1, {})]},
+        {"url": "https://b.example", "title": "B", "relevant_sentences": [
+            ("A home battery stores solar power and releases it when panels stop producing.", 0.8, {}),
+            ("home battery storage lets households keep solar energy for the night!", 0.7, {})]},
+    ]
+    query = RelevanceQuery(["solar", "battery"], use_expansion=False, use_ner=False)
+
+    ranked, stats = rank_passages(information, query, token_budget=1000)
+    context = build_context(ranked)
+    assert context.count("keep solar energy") == 1
+    assert stats["duplicates"] == 1 and stats["trimmed_sentences"] == 0
+    assert context.startswith(f"Source: {ranked[0]['title']} ({ranked[0]['url']})\n")
+    assert "\n---\nSource: " in context
+
+    ranked, stats = rank_passages(information, query, token_budget=60)
+    context = build_context(ranked)
+    assert 0 < estimate_tokens(context) <= stats["tokens"] <= 60
+    assert "1998" not in context
+    assert stats["trimmed_tokens"] >= estimate_tokens(information[0]["relevant_sentences"][1][0])
@@ -0,0 +1,46 @@
+"""
+Tests for the answer-generation prompt layout.
+"""
+
+from datetime import datetime
+
+from prompt_builder import (grounded_messages, assistant_messages, today,
+                            GROUNDED_SYSTEM_PROMPT, ASSISTANT_SYSTEM_PROMPT)
+
+
+def test_system_prompt_is_identical_across_requests():
+    """Different questions, contexts and dates share a byte-identical system message."""
+    first = grounded_messages("How efficient are solar panels?", "[1] Panels reach 22 percent.",
+                              now=datetime(2024, 1, 1, 9, 30))
+    second = grounded_messages("Who won the 2022 World Cup?", "[1] Argentina won the final.",
+                               now=datetime(2025, 6, 30, 23, 59))
+
+    assert first[0] == second[0] == {"role": "system", "content": GROUNDED_SYSTEM_PROMPT}
+    assert first[0]["content"].encode() == second[0]["content"].encode()
+    for value in ("2024", "2025", "solar", "Argentina"):
+        assert value not in GROUNDED_SYSTEM_PROMPT
+
+
+def test_variable_data_goes_in_the_user_message():
+    """The date, the context and the question are in the user message, the question last."""
+    prompt = "How efficient are solar panels?"
+    context = "[1] Modern solar panels reach an efficiency of about 22 percent."
+    now = datetime(2024, 3, 15)
+
+    system, user = grounded_messages(prompt, context, now=now)
+
+    assert user["role"] == "user"
+    assert today(now) == "2024-03-15"
+    for value in (today(now), context, prompt):
+        assert value in user["content"]
+        assert value not in system["content"]
+    assert user["content"].index(today(now)) < user["content"].index(context) < user["content"].index(prompt)
+    assert user["content"].endswith(prompt)
+
+
+def test_assistant_messages():
+    """Without context the prompt is the whole user message after a fixed system message."""
+    assert assistant_messages("tell me a joke") == [
+        {"role": "system", "content": ASSISTANT_SYSTEM_PROMPT},
+        {"role": "user", "content": "tell me a joke"},
+    ]
@@ -0,0 +1,56 @@
+"""
+Tests for search-query routing and the deterministic query generator.
+"""
+
+import query_router
+from query_router import (route_prompt, record_route, route_hit_rates, generate_search_queries,
+                          ROUTE_SKIP, ROUTE_DETERMINISTIC, ROUTE_LLM)
+from metrics import registry
+
+KEYWORDS = [{"term": "capital", "score": 0.6}, {"term": "france", "score": 0.5}]
+
+
+def test_routes_by_search_intent_and_confidence():
+    """No search intent skips, confident search prompts are deterministic, the rest go to the LLM."""
+    assert route_prompt("thanks a lot!", ["casual_chat"], []) == (ROUTE_SKIP, 1.0)
+    assert route_prompt("write a poem about the sea", ["creative"], KEYWORDS)[0] == ROUTE_SKIP
+
+    assert route_prompt("what is the capital of france", ["explanation", "question_answering"],
+                        KEYWORDS) == (ROUTE_DETERMINISTIC, 1.0)
+    # No keywords to build queries from
+    assert route_prompt("what is it", ["explanation"], [])[0] == ROUTE_LLM
+
+    # Planning is searched by /generate-response only, but still gets queries
+    assert route_prompt("plan a trip to japan", ["planning"], KEYWORDS)[0] != ROUTE_SKIP
+
+    # Mixed intents: half are search intents
+    route, confidence = route_prompt("write python code to sort a list", ["classification", "planning"], KEYWORDS)
+    assert (route, confidence) == (ROUTE_LLM, 0.5)
+
+    # Long compound prompt: 24 words scale the confidence by 12/24
+    long_prompt = " ".join(["word"] * 24)
+    assert route_prompt(long_prompt, ["question_answering"], KEYWORDS) == (ROUTE_LLM, 0.5)
+
+
+def test_router_disabled_and_hit_rates(monkeypatch):
+    """With the router disabled every prompt goes to the LLM; routes are counted."""
+    monkeypatch.setattr(query_router, "QUERY_ROUTER_ENABLED", False)
+    assert route_prompt("thanks", ["casual_chat"], []) == (ROUTE_LLM, 0.0)
+
+    monkeypatch.setattr(query_router, "route_stats", {ROUTE_SKIP: 0, ROUTE_DETERMINISTIC: 0, ROUTE_LLM: 0})
+    assert route_hit_rates() == {ROUTE_SKIP: 0.0, ROUTE_DETERMINISTIC: 0.0, ROUTE_LLM: 0.0}
+    for route in (ROUTE_SKIP, ROUTE_SKIP, ROUTE_DETERMINISTIC, ROUTE_LLM):
+        record_route(route)
+    assert route_hit_rates() == {ROUTE_SKIP: 0.5, ROUTE_DETERMINISTIC: 0.25, ROUTE_LLM: 0.25}
+    assert 'khoj_query_routes_total{route="skip"}' in registry.render()
+
+
+def test_generate_search_queries():
+    """Question answering gets keyword combinations, other intents lead with the prompt."""
+    assert generate_search_queries("Tell me the capital of France", ["question_answering"], KEYWORDS) == [
+        "capital france", "who is capital france", "the capital of France"]
+    assert generate_search_queries("search python tutorials", ["web_search"],
+                                   [{"term": "python tutorials", "score": 1.0}]) == [
+        "search python tutorials", "python tutorials", "web_search python tutorials"]
+    assert len(generate_search_queries("q", ["question_answering"], [{"term": str(i), "score": 1.0}
+                                                                    for i in range(10)], max_queries=3)) == 3
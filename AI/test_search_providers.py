@@ -0,0 +1,80 @@
+"""
+Tests for the search provider abstraction.
+"""
+
+import json
+import pytest
+
+from search_providers import SearchProvider, GoogleSearchProvider, LocalSearchProvider, get_search_provider
+
+
+@pytest.fixture
+def corpus_file(tmp_path):
+    """Write a small JSONL fixture corpus."""
+    pages = [
+        {"url": "https://example.com/python", "title": "Python", "content": "Python is a programming language. Python is popular."},
+        {"url": "https://example.com/java", "title": "Java", "content": "Java is a programming language used for enterprise software."},
+        {"url": "https://example.com/empty", "title": "Empty", "content": ""},
+    ]
+    path = tmp_path / "corpus.jsonl"
+    path.write_text("\n".join(json.dumps(p) for p in pages) + "\n")
+    return path
+
+
+def test_local_provider_ranks_pages(corpus_file):
+    """Pages mentioning more query terms rank first; empty pages are skipped."""
+    provider = LocalSearchProvider(str(corpus_file))
+
+    assert len(provider.pages) == 2
+    assert provider.search("python language", num_results=5) == [
+        "https://example.com/python",
+        "https://example.com/java",
+    ]
+    assert provider.search("enterprise", num_results=5) == ["https://example.com/java"]
+    assert provider.search("nothing matches", num_results=5) == []
+
+
+def test_local_provider_serves_pages(corpus_file):
+    """Local pages are served without scraping."""
+    provider = LocalSearchProvider(str(corpus_file))
+
+    page = provider.get_page("https://example.com/python")
+    assert page["title"] == "Python"
+    assert page["success"] is True
+    assert provider.get_page("https://example.com/unknown") is None
+
+
+def test_local_provider_reads_record_directory(tmp_path):
+    """A directory of JSON page records (like cache/cold) is a valid corpus."""
+    (tmp_path / "a.json").write_text(json.dumps({"url": "https://a.com", "title": "A", "content": "alpha beta"}))
+    provider = LocalSearchProvider(str(tmp_path))
+
+    assert provider.search("alpha") == ["https://a.com"]
+
+
+def test_google_provider_requires_credentials(monkeypatch):
+    """The Google provider fails fast without credentials."""
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    monkeypatch.delenv("GOOGLE_CX", raising=False)
+
+    with pytest.raises(EnvironmentError):
+        GoogleSearchProvider()
+
+
+def test_get_search_provider(monkeypatch, corpus_file):
+    """The provider is selected by name or SEARCH_PROVIDER."""
+    monkeypatch.setenv("SEARCH_PROVIDER", "local")
+    monkeypatch.setenv("LOCAL_SEARCH_CORPUS", str(corpus_file))
+    assert isinstance(get_search_provider(), LocalSearchProvider)
+
+    with pytest.raises(ValueError):
+        get_search_provider("bing")
+
+
+def test_provider_must_implement_search():
+    """A provider without search() fails when created, not during a request."""
+    class Incomplete(SearchProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,170 @@
+"""
+Tests for the sentence relevance scoring in search_utils.
+"""
+
+import json
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+import search_utils
+from search_utils import (
+    analyze_page, bm25_scores, expand_keywords_wordnet, extract_relevant_information,
+    keyword_synonyms, split_sentences, KeywordMatcher, RelevanceQuery, SemanticReranker
+)
+
+
+CONTENT = """
+Apple Inc. released the iPhone 15 in September 2023. The device features an advanced camera system.
+The new model has improved battery life compared to previous versions.
+Tim Cook, CEO of Apple, announced the product at a special event in Cupertino, California.
+The iPhone 15 Pro Max offers the best camera capabilities in the lineup.
+Android phones from Samsung continue to be popular alternatives.
+"""
+
+
+def test_bm25_scores_match_bm25okapi():
+    """The vectorized scorer returns exactly the BM25Okapi scores."""
+    corpus = [
+        ["apple", "iphone", "camera"],
+        ["camera", "camera", "battery"],
+        ["samsung", "android", "phones", "popular"],
+        ["apple", "event", "cupertino"],
+        [],
+    ]
+    for query in (["camera"], ["apple", "camera", "apple"], ["unknown"], ["camera", "popular", "iphone"]):
+        assert np.array_equal(bm25_scores(corpus, query), BM25Okapi(corpus).get_scores(query))
+
+
+def test_bm25_scores_rejects_empty_corpus():
+    """A corpus without tokens cannot be scored."""
+    try:
+        bm25_scores([[], []], ["camera"])
+    except ValueError:
+        return
+    raise AssertionError("expected ValueError")
+
+
+def test_keyword_matcher_counts_like_substring_loop():
+    """Overlapping, nested, repeated and empty terms are counted like `term in sentence`."""
+    sentences = ["the iphone 15 camera", "phones and iphones", "battery life", "ab c", "iphone"]
+    groups = [["iphone", "iphone 15", "phone", "camera"], ["bc", "b c", "", "iphone", "iphone"]]
+
+    counts = KeywordMatcher(groups).count(sentences)
+
+    expected = [[sum(1 for term in group if term in sentence) for sentence in sentences] for group in groups]
+    assert counts.tolist() == expected
+
+
+def test_extract_relevant_information_ranks_keyword_sentences():
+    """Sentences mentioning the keywords come first and carry scoring metadata."""
+    results = extract_relevant_information(CONTENT, ["iPhone 15", "camera"], top_n=3, use_expansion=False, use_ner=False)
+
+    assert len(results) == 3
+    sentence, score, metadata = results[0]
+    assert "iPhone 15" in sentence and "camera" in sentence
+    assert metadata["original_matches"] == 2
+    assert [r[1] for r in results] == sorted((r[1] for r in results), reverse=True)
+
+
+def test_analyzed_page_scores_like_raw_content():
+    """A stored page analysis reproduces the sentences and the results of a fresh run."""
+    analysis = analyze_page(CONTENT)
+    offsets = analysis["sentence_offsets"]
+    assert len(offsets) == analysis["sentence_count"] == len(analysis["sentence_lengths"])
+    assert sum(analysis["sentence_lengths"]) == len(analysis["token_ids"])
+    assert len(analysis["vocab"]) == len(analysis["doc_freqs"])
+
+    sentences = split_sentences(CONTENT)
+    cleaned = " ".join(CONTENT.split())
+    assert [cleaned[start:end] for start, end in offsets] == sentences
+
+    for keywords in (["iPhone 15", "camera"], ["Samsung", "battery"], ["unrelated"]):
+        fresh = extract_relevant_information(CONTENT, keywords, top_n=5, use_expansion=False, use_ner=False)
+        cached = extract_relevant_information(CONTENT, keywords, top_n=5, use_expansion=False, use_ner=False,
+                                              analysis=analysis)
+        assert cached == fresh
+
+
+def test_keyword_expansion_uses_synonym_table_and_memoizes(tmp_path, monkeypatch):
+    """Synonyms come from the table, truncated to max_synonyms, and repeated lookups hit the LRU cache."""
+    table_path = tmp_path / "synonyms.json"
+    table_path.write_text(json.dumps({"camera": ["photographic camera", "tv camera", "lens"], "battery": []}))
+    monkeypatch.setattr(search_utils, "SYNONYM_TABLE_PATH", str(table_path))
+    monkeypatch.setattr(search_utils, "_synonym_table", None)
+    keyword_synonyms.cache_clear()
+
+    try:
+        expanded = expand_keywords_wordnet(["Camera", "battery"], max_synonyms=2)
+        assert sorted(expanded) == ["battery", "camera", "photographic camera", "tv camera"]
+
+        expand_keywords_wordnet(["Camera", "battery"], max_synonyms=2)
+        assert keyword_synonyms.cache_info().hits == 2
+    finally:
+        keyword_synonyms.cache_clear()
+
+
+def test_compiled_query_gives_same_results():
+    """Scoring with a precompiled RelevanceQuery matches deriving the query per page."""
+    keywords = ["iPhone 15", "camera", "Apple"]
+    query = RelevanceQuery(keywords, use_expansion=False, use_ner=False)
+
+    assert query.original_terms == {"iphone 15", "camera", "apple"}
+    assert (extract_relevant_information(CONTENT, keywords, top_n=5, query=query) ==
+            extract_relevant_information(CONTENT, keywords, top_n=5, use_expansion=False, use_ner=False))
+
+
+class _EmbeddingStore:
+    """In-memory stand-in for DiskJsonCache sentence embeddings."""
+
+    def __init__(self):
+        self.pages = {}
+
+    def get_sentence_embeddings(self, content, model_name):
+        return dict(self.pages.get((content, model_name), {}))
+
+    def set_sentence_embeddings(self, content, model_name, embeddings):
+        self.pages.setdefault((content, model_name), {}).update(embeddings)
+
+
+def _word_encoder(calls):
+    vocabulary = ["iphone", "camera", "battery", "samsung", "apple"]
+
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(word in text.lower()) for word in vocabulary] for text in texts])
+    return encode
+
+
+def test_semantic_rerank_blends_similarity_and_caches_embeddings():
+    """Candidates get a semantic score, and a second pass reuses the stored embeddings."""
+    calls = []
+    store = _EmbeddingStore()
+    reranker = SemanticReranker(encoder=_word_encoder(calls), store=store)
+    query = RelevanceQuery(["iPhone", "camera"], use_expansion=False, use_ner=False, reranker=reranker)
+
+    results = extract_relevant_information(CONTENT, query.keywords, top_n=5, query=query)
+
+    assert all("semantic_score" in metadata for _, _, metadata in results)
+    assert results[0][2]["semantic_score"] == 1.0
+    assert len(calls) == 2  # query, then the candidate sentences
+    (stored,) = store.pages.values()
+    assert len(stored) == len(results)
+
+    again = extract_relevant_information(CONTENT, query.keywords, top_n=5, query=query)
+    assert again == results
+    assert len(calls) == 2
+
+
+def test_semantic_rerank_respects_latency_budget():
+    """A page whose embeddings would not fit in the budget keeps its lexical order."""
+    calls = []
+    reranker = SemanticReranker(encoder=_word_encoder(calls), budget_ms=10)
+    reranker.ms_per_sentence = 50.0
+    query = RelevanceQuery(["iPhone", "camera"], use_expansion=False, use_ner=False, reranker=reranker)
+
+    results = extract_relevant_information(CONTENT, query.keywords, top_n=5, query=query)
+
+    assert calls == []
+    assert results == extract_relevant_information(CONTENT, query.keywords, top_n=5,
+                                                   use_expansion=False, use_ner=False)
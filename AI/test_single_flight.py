@@ -0,0 +1,77 @@
+"""
+Tests for the request coalescing layer.
+"""
+
+import asyncio
+import pytest
+
+from single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_task():
+    """Concurrent callers with the same key run the function once."""
+    flights = SingleFlight()
+    calls = []
+
+    async def scrape(url):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return {"url": url}
+
+    results = await asyncio.gather(*[flights.do("k", scrape, "https://example.com") for _ in range(5)])
+
+    assert calls == ["https://example.com"]
+    assert all(r is results[0] for r in results)
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    """Calls with different keys are not coalesced."""
+    flights = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    assert await asyncio.gather(flights.do("a", work, "a"), flights.do("b", work, "b")) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_caller_and_is_not_cached():
+    """A failing call raises for all waiters and the next call runs again."""
+    flights = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    with pytest.raises(RuntimeError):
+        await flights.do("k", fail)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    """Cancelling one waiter leaves the shared call running for the others."""
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    first = asyncio.ensure_future(flights.do("k", slow))
+    second = asyncio.ensure_future(flights.do("k", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
@@ -0,0 +1,71 @@
+"""
+Tests for pipeline tracing.
+"""
+
+import json
+import asyncio
+
+import tracing
+from tracing import span, traced, start_span, current_span, trace_summary, JsonLinesExporter
+
+
+def test_spans_nest_across_tasks_and_threads(tmp_path, monkeypatch):
+    """Tasks and threads started inside a span attach to it; the root exports OTLP/JSON."""
+    target = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "exporter", JsonLinesExporter(str(target)))
+
+    @traced("work.sync")
+    def sync_work():
+        current_span().set_attribute("rows", 3)
+
+    @traced()
+    async def async_work():
+        await asyncio.to_thread(sync_work)
+
+    async def run():
+        with span("request", user="a") as root:
+            with span("stage"):
+                await asyncio.gather(async_work(), async_work())
+            phase = start_span("phase")
+            phase.end()
+            summary = trace_summary()
+        return root, summary
+
+    root, summary = asyncio.run(run())
+
+    assert summary["trace_id"] == root.trace.trace_id
+    assert summary["stages"]["work.sync"]["count"] == 2
+    assert summary["stages"]["test_spans_nest_across_tasks_and_threads.<locals>.async_work"]["count"] == 2
+    assert set(summary["stages"]) >= {"stage", "phase"}
+
+    lines = target.read_text().splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    by_id = {s["spanId"]: s for s in spans}
+    names = {s["name"]: s for s in spans}
+    assert "parentSpanId" not in names["request"]
+    assert by_id[names["stage"]["parentSpanId"]]["name"] == "request"
+    assert by_id[names["phase"]["parentSpanId"]]["name"] == "request"
+    for work in (s for s in spans if s["name"] == "work.sync"):
+        assert by_id[by_id[work["parentSpanId"]]["parentSpanId"]]["name"] == "stage"
+        assert work["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+    assert all(s["traceId"] == root.trace.trace_id for s in spans)
+    assert int(names["request"]["endTimeUnixNano"]) >= int(names["stage"]["endTimeUnixNano"])
+
+
+def test_errors_and_disabled_tracing(monkeypatch):
+    """Exceptions mark the span as failed; disabled tracing hands out no-op spans."""
+    try:
+        with span("failing") as failing:
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert failing.status == tracing.STATUS_ERROR
+    assert failing.status_message == "ValueError: boom"
+    assert trace_summary() == {}
+
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    with span("ignored") as ignored:
+        ignored.set_attribute("key", "value")
+        assert current_span() is tracing.NOOP_SPAN
+    assert ignored is tracing.NOOP_SPAN
@@ -0,0 +1,273 @@
+"""
+Lightweight tracing of the request pipeline.
+
+Spans are opened with `with span("name", key=value):` (sync or async code) or
+the @traced decorator and nest through a contextvar, so tasks created inside a
+span (asyncio.create_task, asyncio.to_thread) attach their spans to it. A span
+opened outside any other span starts a trace; when it ends, the trace is
+written as one line of OTLP/JSON (the OpenTelemetry collector's file format) to
+TRACE_EXPORT ("stdout" or a file path, unset for no export). trace_summary()
+gives the stage timings of the current trace, e.g. for the stream_complete
+event. TRACING_ENABLED=0 turns every span into a no-op.
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "khojai")
+# Spans kept per trace, later ones are counted as dropped
+MAX_SPANS_PER_TRACE = 2000
+
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """The finished spans of one request, exported when its root span ends."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.root: Optional["Span"] = None
+
+    def add(self, finished: "Span") -> None:
+        if len(self.spans) < MAX_SPANS_PER_TRACE:
+            self.spans.append(finished)
+        else:
+            self.dropped += 1
+
+    def stage_timings(self) -> Dict[str, Dict[str, float]]:
+        """Count and summed duration (ms) of the finished spans per name. Concurrent spans add up."""
+        stages = {}
+        for finished in self.spans:
+            if finished is self.root:
+                continue
+            stage = stages.setdefault(finished.name, {"count": 0, "ms": 0.0})
+            stage["count"] += 1
+            stage["ms"] += finished.duration_ms
+        for stage in stages.values():
+            stage["ms"] = round(stage["ms"], 1)
+        return stages
+
+
+class Span:
+    """A timed operation with attributes, part of a Trace."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, **attributes):
+        self.name = name
+        self.trace = parent.trace if parent else Trace()
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = os.urandom(8).hex()
+        self.attributes: Dict[str, Any] = attributes
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        if parent is None:
+            self.trace.root = self
+
+    @property
+    def duration_ms(self) -> float:
+        end = self._end_perf if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self._start_perf) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, error: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        """Finish the span (idempotent); ending the root span exports the trace."""
+        if self.end_ns is not None:
+            return
+        self._end_perf = time.perf_counter_ns()
+        self.end_ns = self.start_ns + (self._end_perf - self._start_perf)
+        self.trace.add(self)
+        if self.trace.root is self:
+            exporter.export(self.trace)
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled or no span is active; accepts and ignores everything."""
+    name = ""
+    trace = None
+    duration_ms = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes) -> None:
+        pass
+
+    def record_exception(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """The active span, or NOOP_SPAN (safe to set attributes on) outside any span."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def start_span(name: str, **attributes):
+    """A child of the active span (or a new trace) that is not made active; call .end() on it."""
+    if not TRACING_ENABLED:
+        return NOOP_SPAN
+    return Span(name, _current_span.get(), **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Open a span and make it the active one until the block exits."""
+    if not TRACING_ENABLED:
+        yield NOOP_SPAN
+        return
+    new_span = Span(name, _current_span.get(), **attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_exception(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned async generator)
+            pass
+        new_span.end()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator running a sync or async function inside a span (named after the function by default)."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_summary() -> Dict[str, Any]:
+    """
+    Trace id, elapsed time and stage timings of the current trace so far.
+
+    Returns:
+        {"trace_id", "total_ms", "stages": {name: {"count", "ms"}}}, or {} outside a trace
+    """
+    active = _current_span.get()
+    if active is None:
+        return {}
+    trace = active.trace
+    return {
+        "trace_id": trace.trace_id,
+        "total_ms": round(trace.root.duration_ms, 1),
+        "stages": trace.stage_timings(),
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+    spans = []
+    for finished in trace.spans:
+        record = {
+            "traceId": trace.trace_id,
+            "spanId": finished.span_id,
+            "name": finished.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(finished.start_ns),
+            "endTimeUnixNano": str(finished.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in finished.attributes.items()],
+            "status": {"code": finished.status, "message": finished.status_message} if finished.status_message
+            else {"code": finished.status},
+        }
+        if finished.parent_id:
+            record["parentSpanId"] = finished.parent_id
+        spans.append(record)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "khojai.tracing"}, "spans": spans}],
+    }]}
+
+
+class JsonLinesExporter:
+    """
+    Writes each finished trace as one line of OTLP/JSON.
+
+    Args:
+        target: "stdout", a file path (appended to), or "" to discard traces
+    """
+
+    def __init__(self, target: str = TRACE_EXPORT):
+        self.target = target
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        if not self.target:
+            return
+        line = json.dumps(to_otlp(trace), separators=(",", ":"))
+        try:
+            with self._lock:
+                if self.target == "stdout":
+                    sys.stdout.write(line + "\n")
+                else:
+                    with open(self.target, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+        except OSError as e:
+            # Imported here: log_config imports tracing
+            from log_config import get_logger
+            get_logger(__name__).error("Trace export failed: %s", e)
+
+
+exporter = JsonLinesExporter()
+
+
+def set_exporter(new_exporter: JsonLinesExporter) -> None:
+    """Replace the exporter (e.g. to write traces to another file)."""
+    global exporter
+    exporter = new_exporter
@@ -28,6 +28,7 @@ EVENT_TYPES = {
     "SEARCH_PROGRESS": "search_progress",
     "SEARCH_RESULT": "search_result",
     "SEARCH_COMPLETED": "search_completed",
+    "QUEUE_POSITION": "queue_position",
     "RESPONSE_STARTED": "response_started",
     "RESPONSE_TOKEN": "response_token",
     "RESPONSE_COMPLETED": "response_completed",
@@ -1,13 +1,23 @@
 # web_search.py
 import os
-import requests
-from typing import List, Dict
+from typing import List, Dict, Optional, Set
 import time
-import random
 import asyncio
+import logging
+import threading
 from dotenv import load_dotenv
-from search_utils import extract_relevant_information
+from search_utils import (
+    extract_relevant_information, analyze_page, RelevanceQuery, SemanticReranker, RERANK_ENABLED,
+    keybert_encoder, EMBEDDING_MODEL
+)
 from scrape_util import scrape_webpage
+from single_flight import SingleFlight
+from search_providers import SearchProvider, get_search_provider
+from tracing import span, traced, current_span
+from metrics import registry
+from log_config import get_logger
+
+logger = get_logger(__name__)
 
 # Load environment variables from .env
 load_dotenv()
@@ -16,190 +26,263 @@ load_dotenv()
 from cache.disk_cache import DiskJsonCache
 
 # === CONFIGURATION FROM .env ===
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GOOGLE_CX = os.getenv("GOOGLE_CX")  # Search Engine ID
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "10"))
 MAX_CONCURRENT_SCRAPES = int(os.getenv("MAX_CONCURRENT_SCRAPES", "3"))
+# Candidate sentences kept per page for the cross-page passage ranker
+SENTENCES_PER_PAGE = int(os.getenv("SENTENCES_PER_PAGE", "8"))
+
+# Cache-first retrieval: the web search is skipped only when at least
+# CACHE_MIN_HITS of the CACHE_TOP_K best cached pages score CACHE_MIN_SCORE
+# (normalized BM25, 0-1) and were fetched within CACHE_MAX_AGE_HOURS
+CACHE_TOP_K = int(os.getenv("CACHE_TOP_K", "5"))
+CACHE_MIN_HITS = int(os.getenv("CACHE_MIN_HITS", "2"))
+CACHE_MIN_SCORE = float(os.getenv("CACHE_MIN_SCORE", "0.5"))
+CACHE_MAX_AGE_HOURS = float(os.getenv("CACHE_MAX_AGE_HOURS", "168"))
+# With the vector index (VECTOR_INDEX_ENABLED=1) cached pages are ranked by
+# reciprocal rank fusion of BM25 and embedding similarity, and a page also
+# passes when its cosine similarity to the keywords reaches CACHE_MIN_SIMILARITY
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "0") == "1"
+CACHE_MIN_SIMILARITY = float(os.getenv("CACHE_MIN_SIMILARITY", "0.6"))
+
+# Initialize cache (new pages are stored with their analyze_page() output and,
+# with the vector index, their page embedding)
+cache = DiskJsonCache("cache", analyzer=analyze_page,
+                      embedder=keybert_encoder if VECTOR_INDEX_ENABLED else None,
+                      embedding_model=EMBEDDING_MODEL)
+
+# Optional embedding rerank (RERANK_ENABLED=1), sentence embeddings are cached with the pages
+semantic_reranker = SemanticReranker(store=cache) if RERANK_ENABLED else None
+
+# Coalesces concurrent fetches of the same normalized URL
+_page_flights = SingleFlight()
 
-# Initialize cache
-cache = DiskJsonCache("cache")
+CACHE_RETRIEVALS = registry.counter("khoj_cache_retrievals_total",
+                                    "Cache-first retrieval stages answered from the cache (hit) or not (miss)",
+                                    ("result",))
 
-# Validate required credentials
-if not GOOGLE_API_KEY or not GOOGLE_CX:
-    raise EnvironmentError(
-        "Missing GOOGLE_API_KEY or GOOGLE_CX in .env file. "
-        "Please check your .env configuration."
-    )
+# Search backend (SEARCH_PROVIDER=google|local), created on first use so the
+# module imports without credentials; Google raises EnvironmentError then
+# when GOOGLE_API_KEY / GOOGLE_CX are missing
+search_provider: Optional[SearchProvider] = None
+_provider_lock = threading.Lock()
 
 # === CORE FUNCTIONS ===
 
+def get_provider() -> SearchProvider:
+    """The configured search backend, created on first use."""
+    global search_provider
+    if search_provider is None:
+        with _provider_lock:
+            if search_provider is None:
+                search_provider = get_search_provider()
+    return search_provider
+
+def set_search_provider(provider: SearchProvider) -> None:
+    """Replace the search backend (e.g. with a LocalSearchProvider for offline runs)."""
+    global search_provider
+    search_provider = provider
+
 def search_web(query: str, num_results: int = MAX_SEARCH_RESULTS) -> List[str]:
     """
-    Search using Google Programmable Search Engine (Custom Search JSON API).
+    Search using the configured search provider.
     Returns list of URLs.
     """
-    if num_results > 10:
-        print(f"Warning: Google API limits num to 10. Requested {num_results}, using 10.")
-        num_results = 10
-
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        "key": GOOGLE_API_KEY,
-        "cx": GOOGLE_CX,
-        "q": query,
-        "num": num_results
-    }
-
-    # Retry logic for rate limiting and transient errors
-    max_retries = 3
-    for attempt in range(max_retries):
+    return get_provider().search(query, num_results)
+
+async def _load_or_scrape(url: str) -> Dict:
+    """Return the cached page for url, scraping and caching it on a miss."""
+    cached_page = await cache.get(url)
+    if cached_page:
+        logger.debug("Using cached content for %s", url)
+        return cached_page
+
+    # Offline providers serve their own pages
+    provider_page = get_provider().get_page(url)
+    if provider_page:
+        return provider_page
+
+    page = await scrape_webpage(url)
+    # Cache the scraped page
+    await cache.set(url, page, success=bool(page.get("content")))
+    return page
+
+async def fetch_page_coalesced(url: str) -> Dict:
+    """
+    Fetch a page through the cache, sharing one in-flight scrape per normalized URL.
+
+    Concurrent requests for the same page (from parallel queries or parallel users)
+    wait on the same scrape_webpage/DiskJsonCache.set call instead of repeating it.
+    """
+    return await _page_flights.do(cache._normalize_url(url), _load_or_scrape, url)
+
+@traced("cache.retrieve")
+async def retrieve_from_cache(keywords: List[str]) -> List[Dict]:
+    """
+    Cache-first retrieval stage.
+
+    Ranks cached pages with BM25 over the keywords (fused with vector search
+    when the vector index is enabled) and returns the pages that pass the
+    relevance and freshness thresholds, or an empty list when too few pass and
+    the caller should search the web instead.
+    """
+    query_vector = None
+    if VECTOR_INDEX_ENABLED:
         try:
-            print(f"Searching Google PSE: '{query}' (max {num_results} results)")
-            response = requests.get(url, params=params, timeout=10)
-            
-            # Handle rate limiting
-            if response.status_code == 429:
-                if attempt < max_retries - 1:
-                    # Exponential backoff
-                    wait_time = 2 ** attempt
-                    print(f"Rate limited. Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print("Google API Error: Rate limit exceeded. Max retries reached.")
-                    return []
-            
-            response.raise_for_status()
-            data = response.json()
-
-            items = data.get("items", [])
-            urls = []
-            for item in items:
-                link = item.get("link")
-                if link and link.startswith("http"):
-                    urls.append(link)
-
-            if not urls:
-                print("No valid URLs returned from Google PSE.")
-            else:
-                print(f"Found {len(urls)} valid URLs from Google PSE.")
-
-            return urls
-
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 403:
-                print("Google API Error: Quota exceeded or invalid API key.")
-                # Don't retry on auth errors
-                break
-            elif response.status_code == 400:
-                print("Google API Error: Bad request (check query or CX).")
-                # Don't retry on bad requests
-                break
-            elif response.status_code == 429:
-                # Already handled above
-                pass
-            else:
-                print(f"Google API HTTP Error: {response.status_code} - {e}")
-                if attempt < max_retries - 1:
-                    # Wait before retry
-                    wait_time = 2 ** attempt
-                    print(f"Waiting {wait_time} seconds before retry...")
-                    time.sleep(wait_time)
-                    continue
-        except requests.exceptions.RequestException as e:
-            print(f"Network error during Google search: {e}")
-            if attempt < max_retries - 1:
-                # Wait before retry
-                wait_time = 2 ** attempt
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                continue
+            query_vector = (await asyncio.to_thread(keybert_encoder, [" ".join(keywords)]))[0]
         except Exception as e:
-            print(f"Unexpected error in search_web(): {e}")
-            if attempt < max_retries - 1:
-                # Wait before retry
-                wait_time = 2 ** attempt
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
-                continue
+            logger.warning("Query embedding failed, using BM25 only: %s", e)
+
+    ranked = await cache.search_hybrid(" ".join(keywords), query_vector, limit=CACHE_TOP_K)
+    max_age = CACHE_MAX_AGE_HOURS * 3600
+    now = time.time()
+
+    passing = []
+    for page, scores in ranked:
+        fetched_at = page.get("timestamps", {}).get("fetched_at", 0)
+        relevant = scores["bm25"] >= CACHE_MIN_SCORE or (
+            query_vector is not None and scores["cosine"] >= CACHE_MIN_SIMILARITY)
+        if relevant and now - fetched_at <= max_age:
+            passing.append(page)
+
+    hit = len(passing) >= CACHE_MIN_HITS
+    current_span().set_attributes(candidates=len(ranked), passing=len(passing), hit=hit)
+    CACHE_RETRIEVALS.inc(result="hit" if hit else "miss")
+    if logger.isEnabledFor(logging.DEBUG):
+        if query_vector is not None:
+            top_scores = [(round(scores["bm25"], 3), round(scores["cosine"], 3)) for _, scores in ranked]
+        else:
+            top_scores = [round(scores["bm25"], 3) for _, scores in ranked]
+        logger.debug("Cache %s: %d/%d cached pages pass (scores %s), need %d", "hit" if hit else "miss",
+                     len(passing), len(ranked), top_scores, CACHE_MIN_HITS)
+    return passing if hit else []
 
-    return []
+def compile_relevance_query(keywords: List[str]) -> RelevanceQuery:
+    """RelevanceQuery for the keywords, with the configured semantic reranker."""
+    return RelevanceQuery(keywords, reranker=semantic_reranker)
 
-async def search_and_extract(query: str, keywords: List[str]) -> List[Dict[str, str]]:
-    """Main function: search → scrape → extract relevant info with improved concurrency."""
-    print(f"\nStarting search_and_extract: '{query}'")
+@traced("search_and_extract")
+async def search_and_extract(
+    query: str,
+    keywords: List[str],
+    semaphore: Optional[asyncio.Semaphore] = None,
+    seen_urls: Optional[Set[str]] = None,
+    relevance_query: Optional[RelevanceQuery] = None,
+    cached_pages: Optional[List[Dict]] = None
+) -> List[Dict[str, str]]:
+    """
+    Main function: cache → search → scrape → extract relevant info with improved concurrency.
+
+    Each result carries "retrieval": "cache" or "web" to report which path served it.
+
+    Args:
+        query: Search query
+        keywords: Keywords used to rank sentences
+        semaphore: Scrape budget shared with other concurrent queries
+            (a private one sized MAX_CONCURRENT_SCRAPES is used if omitted)
+        seen_urls: Normalized URLs already claimed by other concurrent queries;
+            URLs found here are added to it so each page is scraped only once
+            (cached pages only once they produced relevant sentences)
+        relevance_query: RelevanceQuery for the keywords shared with the other
+            queries of a prompt, so it collects corpus statistics of all their
+            pages for rank_passages (compiled here if omitted)
+        cached_pages: retrieve_from_cache result shared by the queries of a
+            prompt (retrieved here if omitted). When a sibling query already
+            claimed these pages, this query returns [] without searching the web.
+    """
+    logger.debug("Starting search_and_extract: '%s'", query)
+    current_span().set_attribute("query", query)
     
-    # First, try to get results from cache
-    cached_results = await cache.search(query, limit=5)
-    if cached_results:
-        print(f"Found {len(cached_results)} results in cache")
-        # Process cached results
+    if seen_urls is None:
+        seen_urls = set()
+
+    # Query-side relevance work (expansion, NER, tokenized query), shared by every page
+    if relevance_query is None:
+        relevance_query = compile_relevance_query(keywords)
+
+    # First, try to answer from cache
+    if cached_pages is None:
+        cached_pages = await retrieve_from_cache(keywords or [query])
+    if cached_pages:
         results = []
-        for cached_page in cached_results:
-            relevant = extract_relevant_information(cached_page["content"], keywords, top_n=5)
+        claimed_by_siblings = 0
+        for cached_page in cached_pages:
+            key = cache._normalize_url(cached_page["url"])
+            if key in seen_urls:
+                claimed_by_siblings += 1
+                continue
+            relevant = extract_relevant_information(cached_page["content"], keywords, top_n=SENTENCES_PER_PAGE,
+                                                    query=relevance_query,
+                                                    analysis=cached_page.get("analysis"))
             if relevant:
-                # Convert the new format (sentence, score, metadata) to the old format for compatibility
-                relevant_sentences = [(sentence, score, metadata) for sentence, score, metadata in relevant]
+                seen_urls.add(key)
                 results.append({
                     "url": cached_page["url"],
                     "title": cached_page["title"],
-                    "relevant_sentences": relevant_sentences
+                    "relevant_sentences": relevant,
+                    "retrieval": "cache"
                 })
-        if results:
-            print(f"Using {len(results)} cached results")
+        # Sibling queries share the keywords, so pages they did not claim have
+        # no relevant sentences for this query either: the cache answered
+        if results or claimed_by_siblings:
+            logger.info("Retrieval path: cache (%d results)", len(results),
+                        extra={"query": query, "retrieval": "cache", "sources": len(results)})
+            current_span().set_attributes(retrieval="cache", sources=len(results))
             return results
 
-    urls = search_web(query, num_results=MAX_SEARCH_RESULTS)
+    # search_web blocks on HTTP, run it off the event loop so queries overlap
+    with span("search.provider", provider=get_provider().name) as provider_span:
+        urls = await asyncio.to_thread(search_web, query, MAX_SEARCH_RESULTS)
+        provider_span.set_attribute("urls", len(urls))
 
     if not urls:
-        print("No URLs found. Returning empty results.")
+        logger.info("No URLs found for '%s'. Returning empty results.", query)
         return []
 
-    # Deduplicate
-    seen = set()
-    urls = [u for u in urls if u not in seen and not seen.add(u)]
-    print(f"Processing {len(urls)} unique URLs...")
+    # Deduplicate, also against URLs claimed by concurrent queries
+    claimed = []
+    for u in urls:
+        key = cache._normalize_url(u)
+        if key not in seen_urls:
+            seen_urls.add(key)
+            claimed.append(u)
+            if len(claimed) == 5:  # Limit to top 5
+                break
+    urls = claimed
+    logger.debug("Processing %d unique URLs...", len(urls))
 
     # Process URLs concurrently with a semaphore to limit concurrency
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)  # Configurable concurrency limit
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)  # Configurable concurrency limit
     
     async def process_url(url):
         async with semaphore:
-            print(f"Processing: {url}")
-            
-            # Check if page is already cached
-            cached_page = await cache.get(url)
-            if cached_page:
-                print(f"Using cached content for {url}")
-                page = cached_page
-            else:
-                page = await scrape_webpage(url)
-                # Cache the scraped page
-                await cache.set(url, page, success=bool(page.get("content")))
+            logger.debug("Processing: %s", url)
+            page = await fetch_page_coalesced(url)
 
             if not page["content"] or len(page["content"]) < 100:
-                print(f"Skipping {url}: too short or failed.")
+                logger.debug("Skipping %s: too short or failed.", url)
                 return None
 
             if "failed" in page["content"].lower() or "blocked" in page["content"].lower():
                 return None
 
             # Updated to use the new extract_relevant_information function
-            relevant = extract_relevant_information(page["content"], keywords, top_n=5)
+            relevant = extract_relevant_information(page["content"], keywords, top_n=SENTENCES_PER_PAGE,
+                                                    query=relevance_query,
+                                                    analysis=page.get("analysis"))
             if relevant:
-                # Convert the new format (sentence, score, metadata) to the old format for compatibility
-                relevant_sentences = [(sentence, score, metadata) for sentence, score, metadata in relevant]
                 result = {
                     "url": page["url"],
                     "title": page["title"],
-                    "relevant_sentences": relevant_sentences
+                    "relevant_sentences": relevant,
+                    "retrieval": "web"
                 }
-                print(f"Added {len(relevant)} relevant sentences from {url}")
+                logger.debug("Added %d relevant sentences from %s", len(relevant), url)
                 return result
             return None
     
     # Create tasks for all URLs
-    tasks = [process_url(url) for url in urls[:5]]  # Limit to top 5
+    tasks = [process_url(url) for url in urls]
     
     # Wait for all tasks to complete
     results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -207,14 +290,16 @@ async def search_and_extract(query: str, keywords: List[str]) -> List[Dict[str,
     # Filter out None results and exceptions
     results = [r for r in results if r is not None and not isinstance(r, Exception)]
     
-    print(f"Completed. Found {len(results)} useful sources.\n")
+    logger.info("Retrieval path: web. Completed. Found %d useful sources.", len(results),
+                extra={"query": query, "retrieval": "web", "sources": len(results)})
+    current_span().set_attributes(retrieval="web", sources=len(results))
     return results
 
 
 # === TEST FUNCTION ===
 def main():
     print("=" * 60)
-    print("Google Programmable Search Engine + Scraper Test")
+    print(f"Search ({get_provider().name}) + Scraper Test")
     print("=" * 60)
 
     test_query = "Who is the current President of the United States in 2025"